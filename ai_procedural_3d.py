@@ -14,7 +14,9 @@ import torch
 ISOL_PATH = Path("/home/belikan/Isol")
 sys.path.insert(0, str(ISOL_PATH / "kibali-IA"))
 
-from transformers import AutoModelForCausalLM, AutoTokenizer
+sys.path.insert(0, str(Path(__file__).parent))
+from kibali_models import model_registry, causal_lm_key, cpu_quantization, load_causal_lm
+from kibali_batching import batcher_for
 
 class AIProceduralGenerator:
     """L'IA génère du CODE avec CodeLlama-7B ou Qwen2.5-Coder"""
@@ -26,6 +28,7 @@ class AIProceduralGenerator:
         self.available_models = [
             {
                 'name': 'CodeLlama-7b',
+                'quantization_name': 'codellama',  # KIBALI_CPU_INT8=codellama
                 'path': '/home/belikan/Isol/kibali-IA/kibali_data/models/huggingface_cache/models--codellama--CodeLlama-7b-hf/snapshots/6c284d1468fe6c413cf56183e69b194dcfa27fe6',
                 'priority': 1  # Préféré: plus gros, meilleur pour code
             }
@@ -34,16 +37,18 @@ class AIProceduralGenerator:
         print(f"🚀 Initialisation Générateur Code IA...")
         print(f"   Device: {self.device}")
         
-        # Charge le premier modèle disponible
-        self.model = None
-        self.tokenizer = None
+        # Charge le premier modèle disponible (registre partagé: CodeLlama
+        # n'est chargé qu'une fois même si hybrid_ai_generator l'utilise aussi)
+        self.model_key = None
+        self.model_path = None
         self.model_name = None
+        self.quantize = None
         
         for model_info in self.available_models:
             if self._try_load_model(model_info):
                 break
         
-        if self.model is None:
+        if self.model_key is None:
             print("⚠️  Aucun modèle local disponible, fallback vers API HuggingFace")
             from huggingface_hub import InferenceClient
             self.client = InferenceClient(token=os.getenv("HF_TOKEN"))
@@ -61,38 +66,39 @@ class AIProceduralGenerator:
                 print(f"⚠️  {model_info['name']}: modèle introuvable à {model_path}")
                 return False
             
-            print(f"📦 Chargement de {model_info['name']}...")
+            quantize = cpu_quantization(model_info['quantization_name'], self.device)
+            print(f"📦 Chargement de {model_info['name']}{f' ({quantize})' if quantize else ''}...")
+            key = causal_lm_key(model_path, self.device, quantize)
+            model_registry.get(key, self._model_loader(model_path, quantize))
             
-            # Charge le tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                str(model_path),
-                trust_remote_code=True,
-                local_files_only=True
-            )
-            
-            # Charge le modèle avec optimisations
-            self.model = AutoModelForCausalLM.from_pretrained(
-                str(model_path),
-                trust_remote_code=True,
-                local_files_only=True,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                device_map="auto" if self.device == "cuda" else None,
-                low_cpu_mem_usage=True
-            )
-            
-            if self.device == "cpu":
-                self.model = self.model.to(self.device)
-            
-            self.model.eval()
+            self.model_key = key
+            self.model_path = model_path
             self.model_name = model_info['name']
+            self.quantize = quantize
             
-            print(f"✅ {model_info['name']} chargé sur {self.device}")
+            print(f"✅ {model_info['name']} chargé sur {self.device}{f' ({quantize})' if quantize else ''}")
             return True
             
         except Exception as e:
             print(f"❌ Erreur chargement {model_info['name']}: {e}")
             return False
     
+    def _model_loader(self, model_path=None, quantize=None):
+        model_path = model_path or self.model_path
+        quantize = quantize or self.quantize
+        return lambda: load_causal_lm(model_path, self.device, quantize)
+    
+    @property
+    def model(self):
+        """Modèle local s'il est résident (le registre peut l'avoir libéré)"""
+        resident = model_registry.peek(self.model_key)
+        return resident['model'] if resident else None
+    
+    @property
+    def tokenizer(self):
+        resident = model_registry.peek(self.model_key)
+        return resident['tokenizer'] if resident else None
+    
     def generate_3d_code(self, prompt, object_type='character'):
         """Génère du CODE JavaScript Three.js avec le modèle chargé"""
         
@@ -129,8 +135,10 @@ return tree; // ILLEGAL IN EVAL!
         print(f"🤖 [{self.model_name or 'API'}] Génération: {prompt}")
         
         try:
-            # Si modèle local disponible
-            if self.model is not None:
+            # Si modèle local disponible (épinglé pendant la génération, rechargé s'il a été libéré)
+            if self.model_key is not None:
+                tokenizer = model_registry.get(self.model_key, self._model_loader())['tokenizer']
+                
                 # Format prompt selon le modèle
                 if 'CodeLlama' in self.model_name:
                     # CodeLlama préfère un format simple
@@ -141,29 +149,20 @@ return tree; // ILLEGAL IN EVAL!
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": user_prompt}
                     ]
-                    text = self.tokenizer.apply_chat_template(
+                    text = tokenizer.apply_chat_template(
                         messages,
                         tokenize=False,
                         add_generation_prompt=True
                     )
                 
-                inputs = self.tokenizer([text], return_tensors="pt").to(self.device)
-                
-                # Génère avec paramètres optimisés
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        **inputs,
-                        max_new_tokens=1024,
-                        temperature=0.2,  # Très bas pour code précis
-                        top_p=0.9,
-                        do_sample=True,
-                        pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id,
-                        eos_token_id=self.tokenizer.eos_token_id
-                    )
-                
-                response = self.tokenizer.decode(
-                    outputs[0][inputs['input_ids'].shape[1]:], 
-                    skip_special_tokens=True
+                # Génère avec paramètres optimisés, en lot avec les demandes concurrentes
+                response = batcher_for(self.model_key, self._model_loader(), self.device).generate(
+                    text,
+                    max_new_tokens=1024,
+                    temperature=0.2,  # Très bas pour code précis
+                    top_p=0.9,
+                    do_sample=True,
+                    eos_token_id=tokenizer.eos_token_id
                 )
                 
                 print(f"   Réponse brute: {len(response)} chars")
@@ -191,7 +190,8 @@ return tree; // ILLEGAL IN EVAL!
             code = self.extract_javascript_code(response)
             
             # Valide le code
-            if not self.validate_code(code):
+            fallback = not self.validate_code(code)
+            if fallback:
                 print(f"⚠️  Code invalide, utilisation fallback")
                 code = self.get_fallback_code(object_type)
             
@@ -200,7 +200,9 @@ return tree; // ILLEGAL IN EVAL!
             return {
                 'success': True,
                 'code': code,
-                'raw_response': response
+                'raw_response': response,
+                # Code de secours: jamais mis en cache
+                'fallback': fallback
             }
             
         except Exception as e:
@@ -210,7 +212,8 @@ return tree; // ILLEGAL IN EVAL!
             return {
                 'success': False,
                 'error': str(e),
-                'code': self.get_fallback_code(object_type)
+                'code': self.get_fallback_code(object_type),
+                'fallback': True
             }
     
     def validate_code(self, code):
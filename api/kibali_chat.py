@@ -1,6 +1,8 @@
 """API Chat Kibali IA"""
 from flask import Blueprint, jsonify, request
 import requests
+from kibali_http import http_client
+from kibali_code_cache import code_cache
 import logging
 from config import Config
 import sys
@@ -36,6 +38,7 @@ def generate_model():
         prompt = data.get('prompt', '')
         object_type = data.get('type', 'object')
         scene_context = data.get('scene_context', None)
+        regenerate = bool(data.get('regenerate'))
         
         if not prompt:
             return jsonify({'error': 'Prompt required'}), 400
@@ -47,7 +50,12 @@ def generate_model():
         # 🔥 STRATÉGIE: Essaie Mistral, sinon fallback sur générateur simple
         if HYBRID_AVAILABLE:
             try:
-                result = hybrid_generator.generate(prompt, object_type, scene_context)
+                # Même prompt/type/scène (à la grille près) ou quasi-doublon: code servi par le cache
+                result, cached = code_cache.generate(
+                    prompt, object_type, 'hybrid',
+                    lambda: hybrid_generator.generate(prompt, object_type, scene_context),
+                    scene_context, regenerate
+                )
                 
                 if result.get('success'):
                     return jsonify({
@@ -57,7 +65,9 @@ def generate_model():
                             'type': result.get('type', 'javascript')
                         },
                         'analysis': result.get('analysis', {}),
-                        'method': 'hybrid-ai'
+                        'method': 'hybrid-ai',
+                        'cached': cached,
+                        'semantic_match': result.get('semantic_match')
                     })
             except Exception as e:
                 logger.warning(f"⚠️ Mistral failed, using simple generator: {e}")
@@ -132,7 +142,7 @@ def send_message():
             return jsonify({'error': 'Message required'}), 400
         
         # Appel API Kibali
-        response = requests.post(
+        response = http_client.post(
             f'{Config.KIBALI_API_URL}/api/chat',
             json={'message': message, 'context': context},
             timeout=30
@@ -1,6 +1,8 @@
 """API Reconstruction 3D MiDaS"""
 from flask import Blueprint, jsonify, request, send_file
 import requests
+from kibali_http import http_client
+from kibali_deadline import DeadlineExceeded
 import logging
 import os
 import uuid
@@ -84,7 +86,7 @@ def reconstruct():
         
         # Appel à l'API MiDaS
         try:
-            response = requests.post(
+            response = http_client.post(
                 f'{Config.MIDAS_API_URL}/api/generate_mesh',
                 json={'session_id': session_id},
                 timeout=300
@@ -98,6 +100,14 @@ def reconstruct():
             else:
                 return jsonify({'error': 'MiDaS API error'}), 500
                 
+        except DeadlineExceeded:
+            # Sous-classe de Timeout: à intercepter avant le mode simulation (session inchangée)
+            logger.warning('MiDaS reconstruction: deadline exceeded')
+            return jsonify({
+                'success': False,
+                'error': 'Échéance de la requête dépassée'
+            }), 504
+            
         except requests.exceptions.RequestException:
             # Mode local: simulation
             logger.warning('MiDaS API offline, simulation mode')
@@ -1,6 +1,7 @@
 """API TripoSR - Image vers 3D"""
 from flask import Blueprint, jsonify, request
 import requests
+from kibali_http import http_client
 import logging
 from config import Config
 
@@ -19,7 +20,7 @@ def generate_3d():
         
         # Appel API TripoSR
         try:
-            response = requests.post(
+            response = http_client.post(
                 f'{Config.TRIPOSR_API_URL}/api/generate',
                 json={'prompt': prompt},
                 timeout=60
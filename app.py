@@ -14,6 +14,14 @@ app = Flask(__name__,
 app.config.from_object(Config)
 CORS(app)
 
+# 📈 Métriques Prometheus (GET /metrics)
+from kibali_metrics import instrument_app
+instrument_app(app, 'kibalone-studio')
+
+# ⏳ Échéance transmise par l'appelant (X-Kibali-Deadline-Ms)
+from kibali_deadline import install_deadline
+install_deadline(app)
+
 # Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,8 +13,9 @@ USAGE: Kibali recherche automatiquement les meilleurs assets pour chaque demande
 
 import requests
 import json
+import math
 import os
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from pathlib import Path
 import urllib.parse
 
@@ -277,7 +278,7 @@ def generate_procedural_asset(asset_type: str, params: Dict) -> Dict:
                     'type': 'PlaneGeometry',
                     'width': 105,
                     'height': 68,
-                    'rotation': [-Math.PI/2, 0, 0],
+                    'rotation': [-math.pi / 2, 0, 0],
                     'material': {'color': '#4a8c2a', 'roughness': 0.9}
                 },
                 # Lignes blanches (à implémenter avec des BoxGeometry fins)
@@ -300,6 +301,21 @@ def generate_procedural_asset(asset_type: str, params: Dict) -> Dict:
 # ANALYSEUR INTELLIGENT DE REQUÊTES
 # ============================================
 
+# Détection de types d'assets (mot-clé du prompt → recherches)
+ASSET_KEYWORDS = {
+    'colonne': {'model': 'column', 'texture': 'marble', 'procedural': 'column'},
+    'column': {'model': 'column', 'texture': 'marble', 'procedural': 'column'},
+    'terrain': {'model': 'terrain', 'texture': 'grass', 'procedural': 'terrain'},
+    'football': {'model': 'football field', 'texture': 'grass', 'procedural': 'football_field'},
+    'stade': {'model': 'stadium', 'texture': 'concrete', 'procedural': 'building'},
+    'bâtiment': {'model': 'building', 'texture': 'concrete', 'procedural': 'building'},
+    'building': {'model': 'building', 'texture': 'concrete', 'procedural': 'building'},
+    'arbre': {'model': 'tree', 'texture': 'bark', 'procedural': 'tree'},
+    'tree': {'model': 'tree', 'texture': 'bark', 'procedural': 'tree'},
+    'maison': {'model': 'house', 'texture': 'brick', 'procedural': 'building'},
+    'house': {'model': 'house', 'texture': 'brick', 'procedural': 'building'},
+}
+
 def analyze_asset_request(prompt: str) -> Dict:
     """
     Analyse une demande complexe et détermine quels assets chercher
@@ -316,22 +332,7 @@ def analyze_asset_request(prompt: str) -> Dict:
         'procedural_fallback': None
     }
     
-    # Détection de types d'assets
-    asset_keywords = {
-        'colonne': {'model': 'column', 'texture': 'marble', 'procedural': 'column'},
-        'column': {'model': 'column', 'texture': 'marble', 'procedural': 'column'},
-        'terrain': {'model': 'terrain', 'texture': 'grass', 'procedural': 'terrain'},
-        'football': {'model': 'football field', 'texture': 'grass', 'procedural': 'football_field'},
-        'stade': {'model': 'stadium', 'texture': 'concrete', 'procedural': 'building'},
-        'bâtiment': {'model': 'building', 'texture': 'concrete', 'procedural': 'building'},
-        'building': {'model': 'building', 'texture': 'concrete', 'procedural': 'building'},
-        'arbre': {'model': 'tree', 'texture': 'bark', 'procedural': 'tree'},
-        'tree': {'model': 'tree', 'texture': 'bark', 'procedural': 'tree'},
-        'maison': {'model': 'house', 'texture': 'brick', 'procedural': 'building'},
-        'house': {'model': 'house', 'texture': 'brick', 'procedural': 'building'},
-    }
-    
-    for keyword, config in asset_keywords.items():
+    for keyword, config in ASSET_KEYWORDS.items():
         if keyword in prompt_lower:
             result['assets_needed'].append({
                 'type': keyword,
@@ -361,7 +362,8 @@ def analyze_asset_request(prompt: str) -> Dict:
 # API UNIFIÉE POUR KIBALI
 # ============================================
 
-def fetch_asset_for_prompt(prompt: str, prefer_procedural: bool = False) -> Dict:
+def fetch_asset_for_prompt(prompt: str, prefer_procedural: bool = False,
+                           should_stop: Optional[Callable[[], bool]] = None) -> Dict:
     """
     Point d'entrée unique: analyse le prompt et retourne le meilleur asset
     
@@ -370,6 +372,9 @@ def fetch_asset_for_prompt(prompt: str, prefer_procedural: bool = False) -> Dict
     2. Cherche sur Sketchfab (si !prefer_procedural)
     3. Cherche textures Poly Haven
     4. Fallback sur génération procédurale
+    
+    `should_stop` (préchargement spéculatif) est consulté entre les phases:
+    s'il retourne True, le résultat partiel est rendu avec 'cancelled': True.
     """
     analysis = analyze_asset_request(prompt)
     
@@ -384,18 +389,30 @@ def fetch_asset_for_prompt(prompt: str, prefer_procedural: bool = False) -> Dict
         'recommended': None
     }
     
+    def stopped():
+        if should_stop is not None and should_stop():
+            results['cancelled'] = True
+            return True
+        return False
+    
     # 1. Recherche modèles 3D
     if not prefer_procedural and analysis['search_queries']:
         for query in analysis['search_queries'][:1]:  # Premier query seulement
             models = search_sketchfab_models(query, limit=3)
             results['models_found'].extend(models)
     
+    if stopped():
+        return results
+    
     # 2. Recherche textures
     if analysis['assets_needed']:
         texture_query = analysis['assets_needed'][0]['texture_query']
         textures = search_poly_haven_textures(texture_query, limit=3)
         results['textures_found'] = textures
     
+    if stopped():
+        return results
+    
     # 3. Génération procédurale (fallback)
     if analysis['procedural_fallback']:
         procedural = generate_procedural_asset(
@@ -8,6 +8,7 @@ Génération réelle: mesh, rigging, animation, export
 
 import bpy
 import os
+import sys
 import json
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -16,6 +17,21 @@ from pathlib import Path
 app = Flask(__name__)
 CORS(app)
 
+# 📈 Métriques Prometheus (GET /metrics) - optionnel sous le Python de Blender
+sys.path.insert(0, str(Path(__file__).parent))
+try:
+    from kibali_metrics import instrument_app
+    instrument_app(app, 'blender-backend')
+except ImportError as e:
+    print(f"⚠️ Métriques non disponibles: {e}")
+
+# ⏳ Échéance transmise par l'appelant (X-Kibali-Deadline-Ms): requêtes expirées refusées
+try:
+    from kibali_deadline import install_deadline
+    install_deadline(app)
+except ImportError as e:
+    print(f"⚠️ Échéances non appliquées: {e}")
+
 # Répertoire de sortie
 OUTPUT_DIR = Path("/tmp/kibalone_models")
 OUTPUT_DIR.mkdir(exist_ok=True)
@@ -40,12 +56,31 @@ class BlenderBackend:
     # GÉNÉRATION 3D
     # ============================================
     
-    def realistic_generate(self, prompt: str, obj_type: str = 'character'):
-        """Génère un personnage réaliste avec armature"""
-        print(f"🎨 RealisticGenerate: {prompt} (type: {obj_type})")
+    def realistic_generate(self, prompt: str, obj_type: str = 'character', types=None):
+        """
+        Génère un personnage réaliste avec armature
+        
+        types: plusieurs types dans la même scène en un seul appel
+        (ex: ['character', 'environment']), la scène n'est vidée qu'une fois
+        """
+        types = types or [obj_type]
+        print(f"🎨 RealisticGenerate: {prompt} (types: {', '.join(types)})")
         
         self.clear_scene()
         
+        if len(types) == 1:
+            return self._create_by_type(prompt, types[0])
+        
+        results = [dict(self._create_by_type(prompt, t), type_requested=t) for t in types]
+        return {
+            'success': all(r.get('success') for r in results),
+            'results': results,
+            'model_path': results[-1].get('model_path'),
+            'model_url': results[-1].get('model_url'),
+            'message': f"✅ {len(results)} générations Blender ({', '.join(types)})"
+        }
+    
+    def _create_by_type(self, prompt: str, obj_type: str):
         if obj_type == 'character':
             # Crée un personnage humanoid basique
             return self._create_humanoid_character(prompt)
@@ -284,7 +319,8 @@ def realistic_generate():
     data = request.json
     result = backend.realistic_generate(
         data.get('prompt', ''),
-        data.get('type', 'character')
+        data.get('type', 'character'),
+        types=data.get('types')
     )
     return jsonify(result)
 
@@ -15,8 +15,12 @@ import numpy as np
 import base64
 from io import BytesIO
 import json
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from kibali_models import model_registry, sdxl_key
+
 app = Flask(__name__)
 CORS(app)
 
@@ -27,25 +31,30 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 
 print("🎨 Chargement des modèles IA pour Grease Pencil...")
 
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Registre partagé (kibali_models): chaque modèle chargé une fois par process,
+# épinglé pour toute la durée de vie du backend
+
 # ControlNet pour le contrôle des traits
-controlnet_canny = ControlNetModel.from_pretrained(
+controlnet_canny = model_registry.acquire('controlnet:control_v11p_sd15_canny', lambda: ControlNetModel.from_pretrained(
     "lllyasviel/control_v11p_sd15_canny",
     torch_dtype=torch.float16,
     cache_dir=MODEL_CACHE
-)
+))
 
-controlnet_scribble = ControlNetModel.from_pretrained(
+controlnet_scribble = model_registry.acquire('controlnet:sd-controlnet-scribble', lambda: ControlNetModel.from_pretrained(
     "lllyasviel/sd-controlnet-scribble",
     torch_dtype=torch.float16,
     cache_dir=MODEL_CACHE
-)
+))
 
 # Pipeline SDXL pour qualité artistique
-pipe_sdxl = StableDiffusionXLPipeline.from_pretrained(
+pipe_sdxl = model_registry.acquire(sdxl_key(DEVICE), lambda: StableDiffusionXLPipeline.from_pretrained(
     "stabilityai/stable-diffusion-xl-base-1.0",
     torch_dtype=torch.float16,
     cache_dir=MODEL_CACHE
-).to("cuda" if torch.cuda.is_available() else "cpu")
+).to(DEVICE))
 
 print("✅ Modèles chargés!")
 
@@ -10,11 +10,110 @@ import sys
 import os
 from pathlib import Path
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 from huggingface_hub import InferenceClient
 
 ISOL_PATH = Path("/home/belikan/Isol")
 sys.path.insert(0, str(ISOL_PATH / "kibali-IA"))
+sys.path.insert(0, str(Path(__file__).parent))
+from kibali_prompts import prompts
+from kibali_models import model_registry, causal_lm_key, cpu_quantization, load_causal_lm
+from kibali_batching import batcher_for
+
+# ============================================
+# TEMPLATES DE PROMPTS (compilés une fois)
+# Instructions statiques en tête, requête et contexte à la fin
+# ============================================
+
+prompts.register('hybrid.analysis', '''Analyse cette requête 3D et fournis une analyse technique détaillée en JSON.
+
+Analyse technique professionnelle:
+- object_type: character/vehicle/building/furniture/animal/plant/environment/props/mechanical/water/terrain
+- style: realistic/stylized/cartoon/anime/cyberpunk/fantasy/medieval/modern/abstract/minimalist
+- complexity: simple/medium/complex/very_complex (basé sur nombre de parties et détails)
+- key_features: liste détaillée des caractéristiques techniques (dimensions, matériaux, fonctionnalités)
+- geometry_hints: géométries Three.js optimales (BoxGeometry, CylinderGeometry, SphereGeometry, ConeGeometry, TorusGeometry, PlaneGeometry, etc.)
+- color_palette: couleurs hexadécimales réalistes pour matériaux PBR
+- material_properties: {{"metalness": float, "roughness": float, "transmission": float, "transparent": bool}} par partie
+- scale_reference: échelle réaliste en mètres (ex: character=1.8, vehicle=4.5, water_plane=100)
+- position_hint: position suggérée basée sur le contexte (ex: {{"y": -0.5}} pour eau sous bateau)
+- animation_potential: parties animables (joints, portes, roues, vagues, etc.)
+- lighting_requirements: besoins en éclairage spécifiques
+- contextual_adaptation: comment s'intégrer dans la scène existante
+
+Réponds UNIQUEMENT en JSON valide et détaillé.{context_info}
+
+REQUÊTE: "{prompt}"''')
+
+prompts.register('hybrid.code', """RULES:
+- NO import/require/export
+- Use THREE (global)
+- Use studio.scene.add()
+- ASCII characters only
+
+EXAMPLE CODE:
+{example_code}
+
+Create Three.js code for: {prompt}
+
+Type: {object_type}
+Colors: {colors}
+Scale: {scale}m
+Position Y: {position_hint}
+
+NOW CREATE CODE FOR: {prompt}
+
+CODE:""")
+
+# Prompt de complétion: la structure du code doit rester en fin de prompt
+prompts.register('hybrid.codellama', """// Three.js Expert Code Generator
+// Task: Create {object_type}
+// Style: {style}
+// Complexity: {complexity}
+// Features: {features}
+
+// Generate THREE.js code for: {prompt}
+// Use geometries: {geometries}
+// Color palette: {palette}
+
+const createModel = () => {{
+    const group = new THREE.Group();
+    
+    // Materials
+    const materials = {{
+        main: new THREE.MeshStandardMaterial({{
+            color: {main_color},
+            roughness: 0.7,
+            metalness: 0.2
+        }})
+    }};
+    
+    // Geometry
+""")
+
+prompts.register('hybrid.fix', """Tu es un expert JavaScript/Three.js. Corrige ce code qui génère une erreur.
+
+⚠️ RÈGLES CRITIQUES:
+- ❌ INTERDICTION: import, require, export, module.exports
+- ✅ CODE NAVIGATEUR UNIQUEMENT (THREE déjà disponible)
+- ✅ Utilise studio.scene pour ajouter les objets
+
+INSTRUCTIONS:
+1. Retire TOUS les import/require/export si présents
+2. Utilise uniquement THREE.* (déjà disponible globalement)
+3. Corrige les erreurs de syntaxe (parenthèses, virgules, etc.)
+4. Retourne UNIQUEMENT le code corrigé complet et fonctionnel
+5. Le code doit utiliser THREE.js et studio.scene
+6. PAS de markdown, PAS de commentaires explicatifs
+
+ERREUR JAVASCRIPT:
+{error_message}
+
+CODE PROBLÉMATIQUE:
+{broken_code}...
+
+CONTEXTE: Le code devait créer "{original_prompt}" en Three.js
+
+CODE CORRIGÉ:""")
 
 class HybridAIGenerator:
     """Système hybride: Mistral (pensée) + CodeLlama (exécution)"""
@@ -29,13 +128,14 @@ class HybridAIGenerator:
         self.mistral_model = "mistralai/Mistral-7B-Instruct-v0.2"
         print(f"✅ Mistral chargé (API HF) - Raisonnement")
         
-        # 2️⃣ CODELLAMA - Génération de code
-        self.codellama = None
-        self.codellama_tokenizer = None
+        # 2️⃣ CODELLAMA - Génération de code (registre partagé avec ai_procedural_3d)
+        self.codellama_key = None
+        self.codellama_path = None
+        self.codellama_quantize = cpu_quantization('codellama', self.device)  # KIBALI_CPU_INT8
         self._load_codellama()
     
     def _load_codellama(self):
-        """Charge CodeLlama localement"""
+        """Charge CodeLlama localement (une seule fois par process, via kibali_models)"""
         try:
             codellama_path = Path("/home/belikan/Isol/kibali-IA/kibali_data/models/huggingface_cache/models--codellama--CodeLlama-7b-hf/snapshots/6c284d1468fe6c413cf56183e69b194dcfa27fe6")
             
@@ -43,32 +143,17 @@ class HybridAIGenerator:
                 print("⚠️  CodeLlama: fallback vers API HF")
                 return
             
-            print(f"📦 Chargement CodeLlama-7b...")
-            
-            self.codellama_tokenizer = AutoTokenizer.from_pretrained(
-                str(codellama_path),
-                trust_remote_code=True,
-                local_files_only=True
-            )
-            
-            self.codellama = AutoModelForCausalLM.from_pretrained(
-                str(codellama_path),
-                trust_remote_code=True,
-                local_files_only=True,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                device_map="auto" if self.device == "cuda" else None,
-                low_cpu_mem_usage=True
-            )
-            
-            if self.device == "cpu":
-                self.codellama = self.codellama.to(self.device)
-            
-            self.codellama.eval()
+            quantize = self.codellama_quantize
+            print(f"📦 Chargement CodeLlama-7b{f' ({quantize})' if quantize else ''}...")
+            key = causal_lm_key(codellama_path, self.device, quantize)
+            model_registry.get(key, lambda: load_causal_lm(codellama_path, self.device, quantize))
+            self.codellama_key = key
+            self.codellama_path = codellama_path
             print(f"✅ CodeLlama chargé sur {self.device} - Génération code")
             
         except Exception as e:
             print(f"⚠️  CodeLlama fallback API: {e}")
-            self.codellama = None
+            self.codellama_key = None
     
     def analyze_with_mistral(self, prompt, scene_context=None):
         """PHASE 1: Mistral analyse et décompose la requête avec contexte scène"""
@@ -92,25 +177,7 @@ IMPORTANT: Tiens compte du contexte pour adapter ta génération!
 - Adapte la position, l'échelle et l'orientation selon les objets existants
 - Si demande de "mettre X sur Y", utilise les positions des objets existants pour calculer la nouvelle position"""
         
-        analysis_prompt = f"""Analyse cette requête 3D et fournis une analyse technique détaillée en JSON:{context_info}
-
-REQUÊTE: "{prompt}"
-
-Analyse technique professionnelle:
-- object_type: character/vehicle/building/furniture/animal/plant/environment/props/mechanical/water/terrain
-- style: realistic/stylized/cartoon/anime/cyberpunk/fantasy/medieval/modern/abstract/minimalist
-- complexity: simple/medium/complex/very_complex (basé sur nombre de parties et détails)
-- key_features: liste détaillée des caractéristiques techniques (dimensions, matériaux, fonctionnalités)
-- geometry_hints: géométries Three.js optimales (BoxGeometry, CylinderGeometry, SphereGeometry, ConeGeometry, TorusGeometry, PlaneGeometry, etc.)
-- color_palette: couleurs hexadécimales réalistes pour matériaux PBR
-- material_properties: {{"metalness": float, "roughness": float, "transmission": float, "transparent": bool}} par partie
-- scale_reference: échelle réaliste en mètres (ex: character=1.8, vehicle=4.5, water_plane=100)
-- position_hint: position suggérée basée sur le contexte (ex: {{"y": -0.5}} pour eau sous bateau)
-- animation_potential: parties animables (joints, portes, roues, vagues, etc.)
-- lighting_requirements: besoins en éclairage spécifiques
-- contextual_adaptation: comment s'intégrer dans la scène existante
-
-Réponds UNIQUEMENT en JSON valide et détaillé."""
+        analysis_prompt = prompts.render('hybrid.analysis', prompt=prompt, context_info=context_info)
 
         try:
             # Utilise chat_completion au lieu de text_generation
@@ -275,25 +342,15 @@ Adaptation contextuelle: {analysis.get('contextual_adaptation', 'intégration in
             elif 'ground' in prompt.lower() or 'sol' in prompt.lower() or 'floor' in prompt.lower():
                 position_hint = "-0.5"  # Sous les objets
         
-        code_prompt = f"""Create Three.js code for: {prompt}
-
-Type: {analysis.get('object_type')}
-Colors: {', '.join(analysis.get('color_palette', ['0x888888'])[:2])}
-Scale: {analysis.get('scale_reference', 1.0)}m
-Position Y: {position_hint}
-
-RULES:
-- NO import/require/export
-- Use THREE (global)
-- Use studio.scene.add()
-- ASCII characters only
-
-EXAMPLE CODE:
-{example_code}
-
-NOW CREATE CODE FOR: {prompt}
-
-CODE:"""
+        code_prompt = prompts.render(
+            'hybrid.code',
+            prompt=prompt,
+            example_code=example_code,
+            object_type=analysis.get('object_type'),
+            colors=', '.join(analysis.get('color_palette', ['0x888888'])[:2]),
+            scale=analysis.get('scale_reference', 1.0),
+            position_hint=position_hint
+        )
 
         try:
             # Utilise chat_completion au lieu de text_generation pour Mistral
@@ -382,7 +439,7 @@ CODE:"""
         except Exception as e:
             print(f"⚠️  Mistral API error: {e}")
             # Essaie CodeLlama local si disponible
-            if self.codellama is not None:
+            if self.codellama_key is not None:
                 return self._generate_with_local_codellama(prompt, analysis)
             return self._generate_fallback_code(prompt, analysis)
     
@@ -390,50 +447,34 @@ CODE:"""
         """Utilise CodeLlama local"""
         
         # Construit un prompt enrichi avec l'analyse
-        code_prompt = f"""// Three.js Expert Code Generator
-// Task: Create {analysis.get('object_type', 'object')}
-// Style: {analysis.get('style', 'realistic')}
-// Complexity: {analysis.get('complexity', 'medium')}
-// Features: {', '.join(analysis.get('key_features', []))}
-
-// Generate THREE.js code for: {prompt}
-// Use geometries: {', '.join(analysis.get('geometry_hints', []))}
-// Color palette: {', '.join(str(c) for c in analysis.get('color_palette', []))}
-
-const createModel = () => {{
-    const group = new THREE.Group();
-    
-    // Materials
-    const materials = {{
-        main: new THREE.MeshStandardMaterial({{
-            color: {analysis.get('color_palette', ['0x888888'])[0]},
-            roughness: 0.7,
-            metalness: 0.2
-        }})
-    }};
-    
-    // Geometry
-"""
+        code_prompt = prompts.render(
+            'hybrid.codellama',
+            prompt=prompt,
+            object_type=analysis.get('object_type', 'object'),
+            style=analysis.get('style', 'realistic'),
+            complexity=analysis.get('complexity', 'medium'),
+            features=', '.join(analysis.get('key_features', [])),
+            geometries=', '.join(analysis.get('geometry_hints', [])),
+            palette=', '.join(str(c) for c in analysis.get('color_palette', [])),
+            main_color=analysis.get('color_palette', ['0x888888'])[0]
+        )
         
-        if self.codellama is not None:
-            # Utilise CodeLlama local
+        if self.codellama_key is not None:
+            # Utilise CodeLlama local (épinglé pendant la génération, rechargé s'il a été libéré),
+            # en lot avec les générations concurrentes (kibali_batching)
             try:
-                inputs = self.codellama_tokenizer(code_prompt, return_tensors="pt").to(self.device)
-                
-                with torch.no_grad():
-                    outputs = self.codellama.generate(
-                        **inputs,
-                        max_new_tokens=1024,  # Code long et complexe
-                        temperature=0.4,
-                        do_sample=True,
-                        top_p=0.95,
-                        repetition_penalty=1.1
-                    )
+                loader = lambda: load_causal_lm(self.codellama_path, self.device, self.codellama_quantize)
+                generated = batcher_for(self.codellama_key, loader, self.device).generate(
+                    code_prompt,
+                    max_new_tokens=1024,  # Code long et complexe
+                    temperature=0.4,
+                    do_sample=True,
+                    top_p=0.95,
+                    repetition_penalty=1.1
+                )
                 
-                generated = self.codellama_tokenizer.decode(outputs[0], skip_special_tokens=True)
-                
-                # Extrait seulement le code généré (après le prompt)
-                code = generated[len(code_prompt):].strip()
+                # Le batcher ne renvoie que le code généré (après le prompt)
+                code = generated.strip()
                 
                 # Complète le code s'il manque la fin
                 if not code.endswith('};'):
@@ -496,7 +537,9 @@ addLog('✅ {prompt} créé');
             'success': True,
             'code': code,
             'type': 'javascript',
-            'analysis': analysis
+            'analysis': analysis,
+            # Cube de secours (Mistral/CodeLlama en échec): jamais mis en cache
+            'fallback': code == self._generate_fallback_code(prompt, analysis)
         }
     
     def fix_code_with_mistral(self, broken_code, error_message, original_prompt):
@@ -521,30 +564,12 @@ addLog('✅ {prompt} créé');
                 print("   ✅ Code nettoyé automatiquement")
                 return cleaned_code
         
-        fix_prompt = f"""Tu es un expert JavaScript/Three.js. Corrige ce code qui génère une erreur.
-
-⚠️ RÈGLES CRITIQUES:
-- ❌ INTERDICTION: import, require, export, module.exports
-- ✅ CODE NAVIGATEUR UNIQUEMENT (THREE déjà disponible)
-- ✅ Utilise studio.scene pour ajouter les objets
-
-ERREUR JAVASCRIPT:
-{error_message}
-
-CODE PROBLÉMATIQUE:
-{broken_code[:500]}...
-
-CONTEXTE: Le code devait créer "{original_prompt}" en Three.js
-
-INSTRUCTIONS:
-1. Retire TOUS les import/require/export si présents
-2. Utilise uniquement THREE.* (déjà disponible globalement)
-3. Corrige les erreurs de syntaxe (parenthèses, virgules, etc.)
-4. Retourne UNIQUEMENT le code corrigé complet et fonctionnel
-5. Le code doit utiliser THREE.js et studio.scene
-6. PAS de markdown, PAS de commentaires explicatifs
-
-CODE CORRIGÉ:"""
+        fix_prompt = prompts.render(
+            'hybrid.fix',
+            error_message=error_message,
+            broken_code=broken_code[:500],
+            original_prompt=original_prompt
+        )
 
         try:
             messages = [
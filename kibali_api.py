@@ -5,13 +5,19 @@ Expose les fonctions de Kibali comme endpoints API REST
 Utilise LangChain pour orchestrer les outils IA
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import sys
 import os
 from pathlib import Path
-import requests
 import json
+import queue
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import threading
+from importlib.util import find_spec
+
+# ⏱️ Chargeur différé: les générateurs lourds sont chargés au premier usage
+from kibali_loader import subsystems
 
 # Variables globales pour disponibilité des systèmes (DÉFINIR AU DÉBUT!)
 DISPATCHER_AVAILABLE = False
@@ -23,91 +29,188 @@ KIBALI_PATH = Path("/home/belikan/Isol/kibali-IA")
 sys.path.insert(0, str(KIBALI_PATH))
 
 # Imports de Kibali-IA
-from dotenv import load_dotenv
-load_dotenv(KIBALI_PATH / ".env")
-
-# Import des configurations
-sys.path.insert(0, str(KIBALI_PATH / "kibali_data" / "models"))
-from MODEL_PATHS import *
+with subsystems.stage('kibali_config'):
+    from dotenv import load_dotenv
+    load_dotenv(KIBALI_PATH / ".env")
 
-# Imports des fonctionnalités de Kibali
-from huggingface_hub import InferenceClient
-import torch
+    # Import des configurations
+    sys.path.insert(0, str(KIBALI_PATH / "kibali_data" / "models"))
+    from MODEL_PATHS import *
 
 # LangChain pour orchestration des outils (OPTIONNEL - dispatcher est prioritaire)
+# Détection seulement: l'import réel (lent) est fait au premier appel de l'agent
+LANGCHAIN_AVAILABLE = find_spec('langchain') is not None
+if not LANGCHAIN_AVAILABLE:
+    print("⚠️ LangChain non disponible - fonctionnement en mode simple")
+
 try:
-    from langchain.agents import Tool, AgentExecutor, create_react_agent
-    from langchain.prompts import PromptTemplate
-    from langchain_community.llms import HuggingFaceEndpoint
-    LANGCHAIN_AVAILABLE = True
-    
-    # Import du registry complet des outils
-    from kibali_tools_registry import get_all_tools, get_tools_summary, ALL_TOOLS_DEFINITIONS
-    print("✅ Kibali Tools Registry chargé")
+    from kibali_tools_registry import ALL_TOOLS_DEFINITIONS
 except ImportError:
-    print("⚠️ LangChain non disponible - fonctionnement en mode simple")
-    LANGCHAIN_AVAILABLE = False
     ALL_TOOLS_DEFINITIONS = []
 
 # 🚀 DISPATCHER intelligent (BYPASS LANGCHAIN)
-try:
-    from kibali_dispatcher import KibaliDispatcher
-    dispatcher = KibaliDispatcher()
-    DISPATCHER_AVAILABLE = True
-    print("✅ Kibali Dispatcher chargé")
-except ImportError as e:
-    print(f"⚠️ Dispatcher non disponible: {e}")
-    DISPATCHER_AVAILABLE = False
-    dispatcher = None
+with subsystems.stage('dispatcher'):
+    try:
+        from kibali_dispatcher import KibaliDispatcher
+        dispatcher = KibaliDispatcher()
+        DISPATCHER_AVAILABLE = True
+        print("✅ Kibali Dispatcher chargé")
+    except ImportError as e:
+        print(f"⚠️ Dispatcher non disponible: {e}")
+        DISPATCHER_AVAILABLE = False
+        dispatcher = None
 
 # 🎭 ORCHESTRATOR + EXECUTOR (Architecture finale!)
-try:
-    from kibali_orchestrator import orchestrate_prompt
-    from kibali_executor import KibaliExecutor, process_prompt_full
-    import asyncio
-    print("✅ Orchestrator + Executor chargés")
-    ORCHESTRATOR_AVAILABLE = True
-except ImportError as e:
-    print(f"⚠️ Orchestrator non disponible: {e}")
-    ORCHESTRATOR_AVAILABLE = False
+with subsystems.stage('orchestrator'):
+    try:
+        from kibali_orchestrator import orchestrate_prompt, STEP_STAGES
+        from kibali_executor import KibaliExecutor, process_prompt_full, executor_loop
+        print("✅ Orchestrator + Executor chargés")
+        ORCHESTRATOR_AVAILABLE = True
+        # Outils que l'orchestrateur sait planifier (spéculation limitée à ceux-ci)
+        ORCHESTRATOR_TOOLS = set(STEP_STAGES)
+    except ImportError as e:
+        print(f"⚠️ Orchestrator non disponible: {e}")
+        ORCHESTRATOR_AVAILABLE = False
 
 app = Flask(__name__)
 CORS(app)  # Permet les requêtes depuis le navigateur
 
+# 📈 Métriques Prometheus: latence par route/statut + inférence (GET /metrics)
+from kibali_metrics import instrument_app, observe_inference
+instrument_app(app, 'kibali-api')
+
+# ⏳ Échéance de requête (en-tête X-Kibali-Deadline-Ms) propagée aux appels d'outils
+from kibali_deadline import install_deadline, request_deadline, deadline_scope
+install_deadline(app)
+
 # Variables globales
 HF_TOKEN = os.getenv("HF_TOKEN")
 inference_client = None
 # Utilise un modèle RAPIDE pour l'interface temps réel
 current_model = "mistralai/Mistral-7B-Instruct-v0.2"  # Plus rapide que Qwen-32B !
 
-# Import du générateur 3D par CODE IA (nouvelle méthode !)
-from ai_procedural_3d import generate_3d_by_ai, generate_animation_by_ai, generate_camera_by_ai, init_ai_generator
-
-# 🚀 NOUVEAU: Générateur HYBRIDE Mistral + CodeLlama
-from hybrid_ai_generator import generate_hybrid_3d, init_hybrid_generator, fix_broken_code
-
 # 🖼️ NOUVEAU: Analyseur d'images (CLIP + OCR + YOLO) - Import lazy pour ne pas ralentir le démarrage
 image_analyzer = None
 
-# Import du générateur AVANCÉ avec multi-méthodes
-from advanced_3d_generator import generate_advanced_3d
+# ============================================
+# SOUS-SYSTÈMES DIFFÉRÉS (chargés au premier usage ou par le préchauffage)
+# ============================================
 
-# Import du client TripoSR (isolé avec framework isol)
-from triposr_client_hf import TripoSRClientHF
+def _init_langchain(agents_module):
+    """Importe LangChain + le registry complet des outils"""
+    from langchain.prompts import PromptTemplate
+    from langchain_community.llms import HuggingFaceEndpoint
+    from kibali_tools_registry import get_all_tools, get_tools_summary
 
-# Initialise le générateur HYBRIDE au démarrage
-print("🚀 Initialisation du générateur HYBRIDE IA...")
-print("   🧠 Mistral: Raisonnement et analyse")
-print("   💻 CodeLlama: Génération de code complexe")
-try:
-    init_hybrid_generator()
-    print("✅ Générateur Hybride prêt !")
-except Exception as e:
-    print(f"⚠️ Générateur Hybride en mode dégradé: {e}")
+    tools = get_all_tools()
+    print(f"✅ {len(tools)} outils chargés depuis le registry")
+    print(get_tools_summary())
+
+    return {
+        'create_react_agent': agents_module.create_react_agent,
+        'AgentExecutor': agents_module.AgentExecutor,
+        'PromptTemplate': PromptTemplate,
+        'HuggingFaceEndpoint': HuggingFaceEndpoint,
+        'tools': tools
+    }
+
+# 🚀 Générateur HYBRIDE Mistral + CodeLlama (chargé en premier par le préchauffage)
+subsystems.register('hybrid', 'hybrid_ai_generator', init=lambda m: m.init_hybrid_generator())
+# Générateur AVANCÉ avec multi-méthodes
+subsystems.register('advanced', 'advanced_3d_generator', init=lambda m: m.init_advanced_generator())
+# Client TripoSR (isolé avec framework isol) - le service démarre au premier appel
+subsystems.register('triposr', 'triposr_client_hf', init=lambda m: m.TripoSRClientHF())
+# Générateur 3D par CODE IA (charge CodeLlama: pas de préchauffage par défaut)
+subsystems.register('ai_procedural', 'ai_procedural_3d')
+if LANGCHAIN_AVAILABLE:
+    subsystems.register('langchain', 'langchain.agents', init=_init_langchain)
+
+# Sous-systèmes préchauffés au démarrage si KIBALI_WARMUP n'est pas défini
+DEFAULT_WARMUP = ['hybrid', 'advanced', 'triposr', 'langchain']
+
+def generate_3d_by_ai(prompt, object_type='character', regenerate=False):
+    """Génère la 3D via code IA (ai_procedural_3d chargé au premier appel, code mis en cache)"""
+    def generate():
+        module = subsystems.module('ai_procedural')
+        with observe_inference('codellama', 'procedural-3d'):
+            return module.generate_3d_by_ai(prompt, object_type)
+    
+    result, cached = code_cache.generate(prompt, object_type, 'ai-procedural', generate, regenerate=regenerate)
+    return dict(result, cached=cached)
+
+def generate_hybrid_3d(prompt, object_type='object', regenerate=False):
+    """Génère avec Mistral + CodeLlama (hybrid_ai_generator chargé au premier appel, code mis en cache)"""
+    def generate():
+        module = subsystems.module('hybrid')
+        with observe_inference('mistral-codellama', 'hybrid-3d'):
+            return module.generate_hybrid_3d(prompt, object_type)
+    
+    result, cached = code_cache.generate(prompt, object_type, 'hybrid', generate, regenerate=regenerate)
+    return dict(result, cached=cached)
+
+def fix_broken_code(code, error, prompt):
+    """Auto-correction Mistral (hybrid_ai_generator chargé au premier appel)"""
+    module = subsystems.module('hybrid')
+    with observe_inference('mistral', 'fix-code'):
+        return module.fix_broken_code(code, error, prompt)
+
+def generate_advanced_3d(prompt, method='auto', regenerate=False):
+    """Génération multi-méthodes (advanced_3d_generator chargé au premier appel, code mis en cache)"""
+    def generate():
+        module = subsystems.module('advanced')
+        with observe_inference('mistral', f'advanced-{method}'):
+            return module.generate_advanced_3d(prompt, method)
+    
+    result, cached = code_cache.generate(prompt, '', f'advanced-{method}', generate, regenerate=regenerate)
+    return dict(result, cached=cached)
 
-# Initialise le client TripoSR HF (démarrage lazy - au premier appel)
-triposr_client = TripoSRClientHF()
 triposr_initialized = False
+triposr_lock = threading.Lock()
+
+# 📋 Jobs asynchrones pour les endpoints longs (reconstruction, génération, orchestration)
+from kibali_jobs import get_job_manager, report_progress, JobCancelled, QueueFull
+
+# 🔀 Fusion des générations identiques en cours (même prompt normalisé/type/méthode)
+from kibali_coalesce import SingleFlight, coalesce_key
+generation_flights = SingleFlight()
+
+# 🧾 Templates de prompts précompilés (préfixe statique + empreinte)
+from kibali_prompts import prompts
+
+# 🗄️ Cache des reconstructions MiDaS (clé = contenu des photos + preset + nombre)
+from kibali_recon_cache import ReconstructionCache, reconstruction_key, is_valid_key
+RECONSTRUCTION_PRESET = "photogrammetry"
+reconstruction_cache = ReconstructionCache(Path(os.environ.get(
+    'KIBALI_RECON_CACHE', '/home/belikan/Isol/Kibalone-Studio/outputs/reconstruction_cache')))
+
+# 🧊 Cache disque du code Three.js généré (prompt normalisé + type + générateur + scène),
+# quasi-doublons servis par l'index sémantique
+from kibali_code_cache import code_cache
+from kibali_semantic_cache import SEMANTIC_ENCODER, ClipTextEncoder
+if SEMANTIC_ENCODER == 'clip':
+    # Tour texte du CLIP de l'analyseur d'images (recherche ignorée tant qu'il n'est pas chargé)
+    code_cache.use_encoder(ClipTextEncoder(
+        lambda: (image_analyzer.clip_model, image_analyzer.clip_processor) if image_analyzer else None))
+
+# 🎞️ Keyframes vectorisées (NumPy) + pistes Float32 packées
+from kibali_keyframes import (sample_animation, sample_camera_path, tracks_to_keyframes, pack_tracks,
+                              packed_descriptor, binary_headers, ANIMATION_LAYOUT, CAMERA_LAYOUT, OUTPUT_FORMATS)
+
+# 🎬 Séquences caméra compilées en une timeline (/api/camera-batch)
+from kibali_camera_timeline import compile_camera_timeline, CameraTimelineError, DEFAULT_FPS as DEFAULT_TIMELINE_FPS
+
+# 🔌 Client HTTP mutualisé (keep-alive par hôte) pour les appels inter-services
+from kibali_http import http_client
+
+# ⛔ Disjoncteurs des backends 11002-11005 (sondés en arrière-plan au démarrage)
+from kibali_breakers import backends
+
+# 🔮 Préchauffage des backends / préchargement des assets pendant la planification
+from kibali_speculation import speculator
+
+# 🧠 Registre des modèles du process (CodeLlama, Stable Diffusion... chargés une fois)
+from kibali_models import model_registry
 
 # ============================================
 # OUTILS LANGCHAIN - ORCHESTRATION IA
@@ -116,7 +219,7 @@ triposr_initialized = False
 def tool_meshy_generate(prompt: str) -> str:
     """Génère un modèle 3D photoréaliste avec Meshy.ai"""
     try:
-        response = requests.post(
+        response = http_client.post(
             'http://localhost:11003/api/text-to-3d-meshy',
             json={'prompt': prompt, 'art_style': 'realistic'},
             timeout=60
@@ -133,7 +236,7 @@ def tool_meshy_generate(prompt: str) -> str:
 def tool_midas_reconstruct(description: str) -> str:
     """Crée une session de reconstruction 3D multi-vues avec MiDaS"""
     try:
-        response = requests.post(
+        response = http_client.post(
             'http://localhost:11002/api/create_session',
             json={'name': description, 'description': description},
             timeout=10
@@ -160,13 +263,8 @@ def tool_analyze_scene(query: str) -> str:
     # TODO: Connecter à un système de state management
     return "📊 Analyse de scène: 0 objets, caméra à (0,5,15)"
 
-# Définition des outils LangChain
+# Définition des outils LangChain (les outils eux-mêmes sont chargés par _init_langchain)
 if LANGCHAIN_AVAILABLE:
-    # Charge TOUS les outils depuis le registry
-    tools = get_all_tools()
-    print(f"✅ {len(tools)} outils chargés depuis le registry")
-    print(get_tools_summary())
-    
     # Template pour l'agent ReAct
     react_template = """Tu es Kibali, un assistant IA expert en création 3D pour Kibalone Studio.
 Tu DOIS OBLIGATOIREMENT utiliser les outils disponibles pour TOUTES les demandes.
@@ -200,10 +298,8 @@ Final Answer: ta réponse finale à l'utilisateur
 Question: {input}
 {agent_scratchpad}"""
 
-    print("✅ Outils LangChain configurés")
     AGENT_EXECUTOR = None  # Sera initialisé au premier appel
 else:
-    tools = []
     react_template = None
     AGENT_EXECUTOR = None
 
@@ -216,6 +312,8 @@ def init_kibali():
     global inference_client
     
     try:
+        with subsystems.stage('huggingface_hub'):
+            from huggingface_hub import InferenceClient
         inference_client = InferenceClient(token=HF_TOKEN)
         print("✅ Kibali-IA initialisé avec succès")
         return True
@@ -223,6 +321,32 @@ def init_kibali():
         print(f"❌ Erreur init Kibali: {e}")
         return False
 
+# ============================================
+# JOBS ASYNCHRONES
+# ============================================
+
+def wants_async(data):
+    """True si le client demande une exécution en job (body JSON ou FormData)"""
+    value = data.get('async') if data else None
+    if value is None:
+        value = request.args.get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def submit_job(kind, func, params, **kwargs):
+    """Soumet le travail au pool de jobs et répond 202 avec le job_id"""
+    try:
+        job_id = get_job_manager().submit(kind, func, params, **kwargs)
+    except QueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'async': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
 # ============================================
 # ENDPOINTS API
 # ============================================
@@ -234,7 +358,17 @@ def health_check():
         'status': 'ok',
         'service': 'Kibali-IA API',
         'version': '1.0',
-        'model': current_model
+        'model': current_model,
+        'coalescing': generation_flights.get_stats(),
+        'http_client': http_client.get_stats()
+    })
+
+@app.route('/api/startup-report', methods=['GET'])
+def startup_report():
+    """Temps d'import/init par sous-système et état du préchauffage"""
+    return jsonify({
+        'success': True,
+        'report': subsystems.report()
     })
 
 @app.route('/api/analyze-image', methods=['POST'])
@@ -343,6 +477,67 @@ def chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Variante streamée de /api/chat (Server-Sent Events)
+    
+    Body: identique à /api/chat
+    
+    Événements:
+        token: {"text": "..."}  - à chaque token reçu
+        done:  {"success": true, "response": "...", "analysis": {...}, "suggestions": []}
+        error: {"success": false, "error": "...", "partial": "..."}
+    """
+    data = request.json or {}
+    message = data.get('message', '')
+    context = data.get('context', 'general')
+    history = data.get('history', [])
+    
+    print(f"📨 [CHAT-STREAM] Message reçu: {message[:50]}...")
+    
+    if not message:
+        return jsonify({'error': 'Message vide'}), 400
+    
+    def finalize(text):
+        return {
+            'success': True,
+            'response': text,
+            'analysis': parse_analysis(text) or {},
+            'suggestions': []
+        }
+    
+    return sse_response(stream_kibali_events(message, get_system_prompt(context), history, finalize))
+
+@app.route('/api/analyze-prompt/stream', methods=['POST'])
+def analyze_prompt_stream():
+    """
+    Analyse simple par Kibali (sans dispatcher) streamée en SSE
+    
+    Body: {"prompt": "...", "context": "general"}
+    
+    L'événement final 'done' contient intent / parameters / suggestions
+    (même format que /api/analyze-prompt en mode simple)
+    """
+    data = request.json or {}
+    prompt = data.get('prompt', '')
+    context = data.get('context', 'general')
+    
+    if not prompt:
+        return jsonify({'error': 'Prompt vide'}), 400
+    
+    def finalize(text):
+        analysis = parse_kibali_analysis(prompt, text)
+        return {
+            'success': True,
+            'intent': analysis.get('intent'),
+            'parameters': analysis.get('parameters', {}),
+            'suggestions': analysis.get('suggestions', []),
+            'analysis': analysis
+        }
+    
+    return sse_response(stream_kibali_events(prompt, get_analysis_prompt(prompt, context), [], finalize))
+
 @app.route('/api/generate-model', methods=['POST'])
 def generate_model():
     """
@@ -351,18 +546,24 @@ def generate_model():
     
     Body: {
         "prompt": "un personnage héroïque avec cape",
-        "type": "character|object|environment"
+        "type": "character|object|environment",
+        "regenerate": false (optionnel: ignore le cache de code)
     }
     """
     try:
         data = request.json
         prompt = data.get('prompt', '')
         model_type = data.get('type', 'character')
+        regenerate = bool(data.get('regenerate'))
         
         print(f"🚀 [HYBRID-AI] Génération: '{prompt}' (type: {model_type})")
         
-        # Utilise le générateur HYBRIDE Mistral + CodeLlama
-        result = generate_hybrid_3d(prompt, model_type)
+        # Utilise le générateur HYBRIDE Mistral + CodeLlama (requêtes identiques fusionnées,
+        # code déjà généré servi par le cache sauf "regenerate")
+        result, coalesced = generation_flights.do(
+            coalesce_key('generate-model', prompt, model_type, regenerate),
+            lambda: generate_hybrid_3d(prompt, model_type, regenerate)
+        )
         
         if result.get('success'):
             analysis = result.get('analysis', {})
@@ -377,6 +578,9 @@ def generate_model():
                 },
                 'analysis': analysis,
                 'method_used': 'hybrid-mistral-codellama',
+                'coalesced': coalesced,
+                'cached': result.get('cached', False),
+                'semantic_match': result.get('semantic_match'),
                 'message': f"✅ Code 3D généré par Mistral + CodeLlama !"
             })
         else:
@@ -441,13 +645,19 @@ def orchestrate():
     
     Body: {
         "prompt": "crée un personnage qui court et saute",
-        "execute": true  // false = juste le plan, true = exécution
+        "execute": true,  // false = juste le plan, true = exécution
+        "async": true,    // exécution dans un job (retourne job_id, 202)
+        "deadline_ms": 60000  // budget total (défaut KIBALI_REQUEST_DEADLINE)
     }
+    
+    Le budget suit chaque appel d'outil (en-tête X-Kibali-Deadline-Ms): les
+    étapes qui ne tiennent plus dedans sont dégradées ou ignorées.
     """
     try:
         data = request.json
         prompt = data.get('prompt', '')
         execute = data.get('execute', False)
+        deadline = request_deadline(data)
         
         if not prompt:
             return jsonify({'error': 'Prompt vide'}), 400
@@ -462,8 +672,10 @@ def orchestrate():
                 'error': 'Orchestrator non disponible'
             }), 503
         
-        # Phase 1: Orchestration (plan)
-        orchestration = orchestrate_prompt(prompt)
+        # Phase 1: Orchestration (plan), backends probables préchauffés en parallèle
+        with speculator.speculate(prompt, allowed=ORCHESTRATOR_TOOLS) as speculation:
+            orchestration = orchestrate_prompt(prompt)
+            speculation.resolve(step['tool'] for step in orchestration['plan']['steps'])
         
         if not orchestration['understood']:
             return jsonify({
@@ -484,35 +696,142 @@ def orchestrate():
             })
         
         # Phase 2: Exécution (appels API réels)
-        try:
-            # Execute en async
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(process_prompt_full(prompt))
-            loop.close()
-            
-            return jsonify({
-                'success': result['success'],
-                'understood': True,
-                'plan': result['orchestration']['plan'],
-                'execution': result['execution'],
-                'message': '✅ Exécution terminée' if result['success'] else '⚠️ Erreurs détectées'
-            })
-        
-        except Exception as e:
-            print(f"❌ [ORCHESTRATE-EXEC] Erreur: {e}")
-            return jsonify({
-                'success': False,
-                'understood': True,
-                'plan': orchestration['plan'],
-                'execution': None,
-                'error': str(e)
-            })
+        if wants_async(data):
+            # Job: le budget court à partir du démarrage du job
+            return submit_job('orchestrate', run_orchestration, {'prompt': prompt},
+                              prompt=prompt, orchestration=orchestration,
+                              deadline_ms=data.get('deadline_ms'))
+        
+        payload, status = run_orchestration(prompt, orchestration, deadline=deadline)
+        return jsonify(payload), status
     
     except Exception as e:
         print(f"❌ [ORCHESTRATE] Erreur: {e}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+# Intervalle des commentaires keep-alive SSE pendant les étapes longues
+ORCHESTRATE_STREAM_HEARTBEAT = 15
+
+@app.route('/api/orchestrate/stream', methods=['POST'])
+def orchestrate_stream():
+    """
+    Variante streamée de /api/orchestrate (Server-Sent Events): le plan puis
+    les événements d'exécution au fil de l'eau
+    
+    Body: {"prompt": "crée un personnage qui court et saute", "deadline_ms": 60000}
+    
+    Événements:
+        plan:         {"plan": {...}}
+        plan_start:   {"steps": 5, "estimated_time": 21, "critical_path_time": 18, ...}
+        step_start:   {"step": 1, "tool": "...", "reason": "...", "depends_on": [], "timestamp", "elapsed"}
+        step_finish:  {"step": 1, "tool": "...", "duration": 1.2, "started_at": 0.0, ...}
+        step_error:   {"step": 2, "tool": "...", "error": "...", "duration": 0.003, ...}
+        step_skipped: {"step": 3, "tool": "...", "failed_dependencies": [2], ...}
+                      ou {"step": 3, "tool": "...", "reason": "deadline", "remaining": 1.2, ...}
+        plan_finish:  {"success": false, "succeeded": 4, "total": 5, "duration": 3.1, ...}
+        done:         même contenu que la réponse de /api/orchestrate (sans le journal texte)
+        error:        {"success": false, "error": "..."}
+    """
+    data = request.json or {}
+    prompt = data.get('prompt', '')
+    
+    if not prompt:
+        return jsonify({'error': 'Prompt vide'}), 400
+    
+    if not ORCHESTRATOR_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Orchestrator non disponible'}), 503
+    
+    print(f"🎭 [ORCHESTRATE-STREAM] Prompt: {prompt}")
+    speculation = speculator.speculate(prompt, allowed=ORCHESTRATOR_TOOLS)
+    return sse_response(stream_orchestration_events(prompt, request_deadline(data), speculation))
+
+def stream_orchestration_events(prompt, deadline=None, speculation=None):
+    """Exécute le plan sur la boucle partagée et relaie ses événements en SSE"""
+    events = queue.Queue()
+    future = executor_loop.submit(process_prompt_full(prompt, listener=events.put, deadline=deadline,
+                                                      speculation=speculation))
+    future.add_done_callback(lambda _: events.put(None))
+    
+    try:
+        while True:
+            try:
+                event = events.get(timeout=ORCHESTRATE_STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            
+            if event is None:
+                break
+            yield sse_event(event.pop('event'), event)
+        
+        result = future.result()
+        if result.get('execution') is None:
+            yield sse_event('error', {'success': False, 'error': result.get('error', 'Prompt non compris')})
+            return
+        
+        execution = {k: v for k, v in result['execution'].items() if k != 'logs'}
+        yield sse_event('done', {
+            'success': result['success'],
+            'understood': True,
+            'plan': result['orchestration']['plan'],
+            'execution': execution,
+            'message': '✅ Exécution terminée' if result['success'] else '⚠️ Erreurs détectées'
+        })
+    
+    except GeneratorExit:
+        # Client déconnecté: inutile de poursuivre les étapes restantes
+        future.cancel()
+        raise
+    
+    except Exception as e:
+        print(f"❌ [ORCHESTRATE-STREAM] Erreur: {e}")
+        yield sse_event('error', {'success': False, 'error': str(e)})
+
+# Marge laissée à l'executor pour conclure après l'échéance (étapes coupées, résumé)
+ORCHESTRATE_DEADLINE_GRACE = 2.0
+
+def run_orchestration(prompt, orchestration, job=None, deadline=None, deadline_ms=None):
+    """Phase 2 de /api/orchestrate: exécute le plan (requête ou job) dans le budget de la requête"""
+    if deadline is None:
+        deadline = request_deadline({'deadline_ms': deadline_ms})
+    try:
+        report_progress(job, 5, f"Exécution de {len(orchestration['plan']['steps'])} étapes")
+        
+        # Exécute sur la boucle asyncio persistante (partagée entre requêtes)
+        result = executor_loop.run(process_prompt_full(prompt, deadline=deadline),
+                                   timeout=deadline.remaining() + ORCHESTRATE_DEADLINE_GRACE)
+        
+        return {
+            'success': result['success'],
+            'understood': True,
+            'plan': result['orchestration']['plan'],
+            'execution': result['execution'],
+            'message': '✅ Exécution terminée' if result['success'] else '⚠️ Erreurs détectées'
+        }, 200
+    
+    except JobCancelled:
+        raise
+    
+    except FuturesTimeoutError:
+        print("⏳ [ORCHESTRATE-EXEC] Échéance dépassée")
+        return {
+            'success': False,
+            'understood': True,
+            'plan': orchestration['plan'],
+            'execution': None,
+            'error': 'Échéance de la requête dépassée'
+        }, 504
+    
+    except Exception as e:
+        print(f"❌ [ORCHESTRATE-EXEC] Erreur: {e}")
+        return {
+            'success': False,
+            'understood': True,
+            'plan': orchestration['plan'],
+            'execution': None,
+            'error': str(e)
+        }, 200
+
 @app.route('/api/triposr-generate', methods=['POST'])
 def triposr_generate():
     """
@@ -521,11 +840,10 @@ def triposr_generate():
     Body: {
         "image_path": "/path/to/image.png",
         "output_path": "/path/to/output.obj" (optional),
-        "resolution": 256 (optional)
+        "resolution": 256 (optional),
+        "async": true (optional - retourne un job_id)
     }
     """
-    global triposr_initialized
-    
     try:
         data = request.json
         image_path = data.get('image_path')
@@ -537,43 +855,60 @@ def triposr_generate():
         if not image_path:
             return jsonify({'error': 'image_path requis'}), 400
         
-        # Initialise TripoSR au premier appel
+        params = {'image_path': image_path, 'output_path': output_path, 'resolution': resolution}
+        if wants_async(data):
+            return submit_job('triposr-generate', run_triposr_generate, params, **params)
+        
+        payload, status = run_triposr_generate(**params)
+        return jsonify(payload), status
+    
+    except Exception as e:
+        print(f"❌ [TripoSR] Erreur: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def run_triposr_generate(image_path, output_path=None, resolution=256, job=None):
+    """Conversion image → mesh TripoSR (requête ou job)"""
+    global triposr_initialized
+    
+    # Le service TripoSR est un sous-process stdin/stdout: un appel à la fois
+    with triposr_lock:
+        report_progress(job, 5, 'Initialisation TripoSR')
+        
+        # Client TripoSR (import différé) + initialisation du service au premier appel
+        triposr_client = subsystems.get('triposr')
         if not triposr_initialized:
             print("🚀 [TripoSR] Initialisation du service...")
             init_result = triposr_client.initialize()
             
             if not init_result.get('success'):
-                return jsonify({
+                return {
                     'error': f"Échec initialisation TripoSR: {init_result.get('error')}"
-                }), 500
+                }, 500
             
             triposr_initialized = True
             print(f"✅ [TripoSR] Service prêt sur {init_result.get('device')}")
         
         # Génère le mesh
+        report_progress(job, 20, 'Conversion en cours')
         print(f"🔄 [TripoSR] Conversion en cours (résolution: {resolution})...")
         result = triposr_client.image_to_3d(
             image_path=image_path,
             output_path=output_path,
             resolution=resolution
         )
-        
-        if result.get('success'):
-            print(f"✅ [TripoSR] Mesh généré: {result.get('output_path')}")
-            return jsonify({
-                'success': True,
-                'mesh_path': result.get('output_path'),
-                'vertices': result.get('vertices'),
-                'faces': result.get('faces')
-            })
-        else:
-            return jsonify({
-                'error': f"Génération échouée: {result.get('error')}"
-            }), 500
     
-    except Exception as e:
-        print(f"❌ [TripoSR] Erreur: {e}")
-        return jsonify({'error': str(e)}), 500
+    if result.get('success'):
+        print(f"✅ [TripoSR] Mesh généré: {result.get('output_path')}")
+        return {
+            'success': True,
+            'mesh_path': result.get('output_path'),
+            'vertices': result.get('vertices'),
+            'faces': result.get('faces')
+        }, 200
+    else:
+        return {
+            'error': f"Génération échouée: {result.get('error')}"
+        }, 500
 
 @app.route('/api/text-to-3d', methods=['POST'])
 def text_to_3d():
@@ -586,21 +921,26 @@ def text_to_3d():
     
     Body: {
         "prompt": "un guerrier avec épée",
-        "method": "advanced" (optionnel: advanced, grease-pencil, blender-style, auto)
+        "method": "advanced" (optionnel: advanced, grease-pencil, blender-style, auto),
+        "regenerate": false (optionnel: ignore le cache de code)
     }
     """
     try:
         data = request.json
         prompt = data.get('prompt')
         method = data.get('method', 'auto')
+        regenerate = bool(data.get('regenerate'))
         
         print(f"🎨 [3D Avancé] Prompt: {prompt}, Méthode: {method}")
         
         if not prompt:
             return jsonify({'error': 'prompt requis'}), 400
         
-        # Génère avec le nouveau système
-        result = generate_advanced_3d(prompt, method)
+        # Génère avec le nouveau système (requêtes identiques fusionnées)
+        result, coalesced = generation_flights.do(
+            coalesce_key('text-to-3d', prompt, method, regenerate),
+            lambda: generate_advanced_3d(prompt, method, regenerate)
+        )
         
         if result.get('success'):
             print(f"✅ [3D Avancé] Généré avec méthode: {result['method']}")
@@ -608,7 +948,10 @@ def text_to_3d():
                 'success': True,
                 'code': result['code'],
                 'method': result['method'],
-                'type': 'javascript'
+                'type': 'javascript',
+                'coalesced': coalesced,
+                'cached': result.get('cached', False),
+                'semantic_match': result.get('semantic_match')
             })
         else:
             return jsonify({
@@ -626,73 +969,135 @@ def launch_demo():
     Reconstruit le mesh 3D et le charge dans la scène
     
     Body: {
-        "num_photos": 3 (optionnel, défaut=3, max=11)
+        "num_photos": 3 (optionnel, défaut=3, max=11),
+        "async": true (optionnel - retourne un job_id),
+        "cache": false (optionnel - ignore le cache),
+        "refresh": true (optionnel - invalide l'entrée et reconstruit)
     }
     """
     try:
         data = request.json or {}
         num_photos = min(int(data.get('num_photos', 11)), 11)  # Utilise 11 photos par défaut
+        use_cache = data.get('cache', True) is not False
+        refresh = bool(data.get('refresh', False))
         
         print(f"🎬 [DÉMO] Lancement reconstruction château ({num_photos} photos)")
         
-        # Import du client MiDaS
-        import sys
-        from pathlib import Path
-        sys.path.insert(0, '/home/belikan/Isol/isol-framework')
-        from midas_client import MiDaSClient
-        
-        # Photos du château
-        photos_dir = Path("/home/belikan/Isol/Kibalone-Studio/static/assets/test_images")
-        photos = sorted(photos_dir.glob("image_*.jpg"))[:num_photos]
-        
-        if not photos:
-            return jsonify({
-                'success': False,
-                'error': 'Aucune photo trouvée'
-            }), 404
-        
-        print(f"   📸 {len(photos)} photos sélectionnées")
-        
-        # Client MiDaS
-        client = MiDaSClient()
-        
-        # Init
-        print("   ⚙️  Init MiDaS...")
-        init_result = client.initialize()
-        if not init_result.get('success'):
-            return jsonify({
-                'success': False,
-                'error': 'MiDaS init failed'
-            }), 500
-        
-        # Reconstruction
-        output_path = "/home/belikan/Isol/Kibalone-Studio/outputs/chateau_demo.obj"
-        print(f"   🔮 Reconstruction → {output_path}")
-        
-        result = client.reconstruct_batch(
-            image_paths=[str(p) for p in photos],
-            preset="photogrammetry",
-            output_path=output_path
-        )
-        
-        if not result.get('success'):
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Reconstruction failed')
-            }), 500
-        
-        mesh_path = result.get('output_path', output_path)
-        vertices = result.get('vertices', 0)
-        triangles = result.get('triangles', 0)
-        
-        print(f"   ✅ Mesh: {vertices} vertices, {triangles} triangles")
+        if wants_async(data):
+            return submit_job('launch-demo', run_launch_demo, {'num_photos': num_photos, 'refresh': refresh},
+                              num_photos=num_photos, use_cache=use_cache, refresh=refresh)
         
-        # Convertit le chemin absolu en chemin relatif pour le frontend
-        # /home/belikan/Isol/Kibalone-Studio/outputs/chateau_demo.obj → /outputs/chateau_demo.obj
-        relative_mesh_path = mesh_path.replace('/home/belikan/Isol/Kibalone-Studio', '')
+        payload, status = run_launch_demo(num_photos, use_cache=use_cache, refresh=refresh)
+        return jsonify(payload), status
         
-        # Génère code Three.js pour charger le mesh
-        threejs_code = f"""
+    except Exception as e:
+        print(f"❌ [DÉMO] Erreur: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def run_launch_demo(num_photos, use_cache=True, refresh=False, job=None):
+    """Reconstruction MiDaS de la démo château (requête ou job, avec cache)"""
+    # Import du client MiDaS
+    sys.path.insert(0, '/home/belikan/Isol/isol-framework')
+    from midas_client import MiDaSClient
+    
+    # Photos du château
+    photos_dir = Path("/home/belikan/Isol/Kibalone-Studio/static/assets/test_images")
+    photos = sorted(photos_dir.glob("image_*.jpg"))[:num_photos]
+    
+    if not photos:
+        return {
+            'success': False,
+            'error': 'Aucune photo trouvée'
+        }, 404
+    
+    print(f"   📸 {len(photos)} photos sélectionnées")
+    
+    # Cache: même lot de photos + preset → mesh déjà reconstruit
+    cache_key = None
+    if use_cache:
+        cache_key = reconstruction_key(photos, RECONSTRUCTION_PRESET, len(photos))
+        if refresh:
+            reconstruction_cache.invalidate(cache_key)
+        entry = reconstruction_cache.get(cache_key)
+        if entry:
+            print(f"   🗄️  Reconstruction en cache ({cache_key[:12]})")
+            payload = build_demo_payload(entry['mesh_path'], len(photos),
+                                         entry['stats']['vertices'], entry['stats']['triangles'])
+            payload.update({'cached': True, 'cache_key': cache_key})
+            return payload, 200
+    
+    # Client MiDaS
+    client = MiDaSClient()
+    
+    # Init
+    report_progress(job, 5, 'Init MiDaS')
+    print("   ⚙️  Init MiDaS...")
+    init_result = client.initialize()
+    if not init_result.get('success'):
+        return {
+            'success': False,
+            'error': 'MiDaS init failed'
+        }, 500
+    
+    # Reconstruction
+    output_path = "/home/belikan/Isol/Kibalone-Studio/outputs/chateau_demo.obj"
+    report_progress(job, 15, f'Reconstruction ({len(photos)} photos)')
+    print(f"   🔮 Reconstruction → {output_path}")
+    
+    result = client.reconstruct_batch(
+        image_paths=[str(p) for p in photos],
+        preset=RECONSTRUCTION_PRESET,
+        output_path=output_path
+    )
+    
+    if not result.get('success'):
+        return {
+            'success': False,
+            'error': result.get('error', 'Reconstruction failed')
+        }, 500
+    
+    mesh_path = result.get('output_path', output_path)
+    vertices = result.get('vertices', 0)
+    triangles = result.get('triangles', 0)
+    
+    print(f"   ✅ Mesh: {vertices} vertices, {triangles} triangles")
+    
+    if cache_key:
+        entry = reconstruction_cache.put(cache_key, mesh_path, {'vertices': vertices, 'triangles': triangles},
+                                         source='demo', photos=len(photos), preset=RECONSTRUCTION_PRESET)
+        print(f"   🗄️  Mis en cache: {cache_key[:12]}")
+        mesh_path = entry['mesh_path']
+    
+    report_progress(job, 95, 'Génération du code Three.js')
+    return build_demo_payload(mesh_path, len(photos), vertices, triangles), 200
+
+def build_demo_payload(mesh_path, num_photos, vertices, triangles):
+    """Réponse de la démo château (reconstruction fraîche ou cache)"""
+    # Convertit le chemin absolu en chemin relatif pour le frontend
+    # /home/belikan/Isol/Kibalone-Studio/outputs/chateau_demo.obj → /outputs/chateau_demo.obj
+    relative_mesh_path = mesh_path.replace('/home/belikan/Isol/Kibalone-Studio', '')
+    
+    return {
+        'success': True,
+        'code': build_demo_threejs_code(relative_mesh_path, num_photos, vertices, triangles),
+        'type': 'javascript',
+        'mesh_path': mesh_path,
+        'stats': {
+            'photos': num_photos,
+            'vertices': vertices,
+            'triangles': triangles
+        },
+        'message': f'🏰 Château reconstruit depuis {num_photos} photos!'
+    }
+
+def build_demo_threejs_code(relative_mesh_path, num_photos, vertices, triangles):
+    """Code Three.js qui charge le mesh du château"""
+    return f"""
 // Château de Sceaux - Reconstruction MiDaS ({num_photos} photos)
 (function() {{
     const loader = new THREE.OBJLoader();
@@ -750,28 +1155,6 @@ def launch_demo():
     );
 }})();
 """
-        
-        return jsonify({
-            'success': True,
-            'code': threejs_code,
-            'type': 'javascript',
-            'mesh_path': mesh_path,
-            'stats': {
-                'photos': len(photos),
-                'vertices': vertices,
-                'triangles': triangles
-            },
-            'message': f'🏰 Château reconstruit depuis {len(photos)} photos!'
-        })
-        
-    except Exception as e:
-        print(f"❌ [DÉMO] Erreur: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
 
 @app.route('/api/upload-reconstruct', methods=['POST'])
 def upload_reconstruct():
@@ -779,7 +1162,10 @@ def upload_reconstruct():
     📤 Upload photos et lance reconstruction MiDaS
     Sauvegarde dans /outputs/ et retourne le chemin du mesh
     
-    FormData: files[] - Liste de fichiers image
+    FormData: photos[] - Liste de fichiers image
+              async=1 (optionnel - retourne un job_id)
+              cache=0 (optionnel - ignore le cache)
+              refresh=1 (optionnel - invalide l'entrée et reconstruit)
     """
     try:
         if 'photos' not in request.files:
@@ -822,43 +1208,84 @@ def upload_reconstruct():
                 'error': 'Aucune photo valide'
             }), 400
         
+        use_cache = request.form.get('cache', '1').lower() not in ('0', 'false', 'no')
+        refresh = request.form.get('refresh', '0').lower() in ('1', 'true', 'yes')
+        
+        params = {'photos': len(photo_paths), 'temp_dir': str(temp_dir), 'refresh': refresh}
+        if wants_async(request.form):
+            return submit_job('upload-reconstruct', run_upload_reconstruct, params,
+                              temp_dir=temp_dir, photo_paths=photo_paths, timestamp=timestamp,
+                              use_cache=use_cache, refresh=refresh)
+        
+        payload, status = run_upload_reconstruct(temp_dir, photo_paths, timestamp,
+                                                 use_cache=use_cache, refresh=refresh)
+        return jsonify(payload), status
+        
+    except Exception as e:
+        print(f"❌ [UPLOAD] Erreur: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def run_upload_reconstruct(temp_dir, photo_paths, timestamp, use_cache=True, refresh=False, job=None):
+    """Reconstruction MiDaS des photos uploadées (requête ou job, avec cache)"""
+    import shutil
+    
+    try:
         # Import du client MiDaS
-        import sys
         sys.path.insert(0, '/home/belikan/Isol/isol-framework')
         from midas_client import MiDaSClient
         
+        # Cache: un lot déjà reconstruit (même contenu d'images) est servi directement
+        cache_key = None
+        if use_cache:
+            cache_key = reconstruction_key(photo_paths, RECONSTRUCTION_PRESET, len(photo_paths))
+            if refresh:
+                reconstruction_cache.invalidate(cache_key)
+            entry = reconstruction_cache.get(cache_key)
+            if entry:
+                print(f"   🗄️  Reconstruction en cache ({cache_key[:12]})")
+                cached_mesh = entry['mesh_path']
+                payload = build_upload_payload(
+                    cached_mesh, cached_mesh.replace('/home/belikan/Isol/Kibalone-Studio', ''),
+                    entry.get('filename', Path(cached_mesh).name), len(photo_paths),
+                    entry['stats']['vertices'], entry['stats']['triangles'])
+                payload.update({'cached': True, 'cache_key': cache_key})
+                return payload, 200
+        
         # Client MiDaS
         client = MiDaSClient()
         
         # Init
+        report_progress(job, 5, 'Init MiDaS')
         print("   ⚙️  Init MiDaS...")
         init_result = client.initialize()
         if not init_result.get('success'):
-            shutil.rmtree(temp_dir)
-            return jsonify({
+            return {
                 'success': False,
                 'error': 'MiDaS init failed'
-            }), 500
+            }, 500
         
         # Reconstruction
         output_filename = f"reconstruction_{timestamp}.obj"
         output_path = f"/home/belikan/Isol/Kibalone-Studio/outputs/{output_filename}"
+        report_progress(job, 15, f'Reconstruction ({len(photo_paths)} photos)')
         print(f"   🔮 Reconstruction → {output_path}")
         
         result = client.reconstruct_batch(
             image_paths=[str(p) for p in photo_paths],
-            preset="photogrammetry",
+            preset=RECONSTRUCTION_PRESET,
             output_path=output_path
         )
         
-        # Nettoyage du dossier temporaire
-        shutil.rmtree(temp_dir)
-        
         if not result.get('success'):
-            return jsonify({
+            return {
                 'success': False,
                 'error': result.get('error', 'Reconstruction failed')
-            }), 500
+            }, 500
         
         mesh_path = result.get('output_path', output_path)
         vertices = result.get('vertices', 0)
@@ -867,11 +1294,40 @@ def upload_reconstruct():
         print(f"   ✅ Mesh: {vertices} vertices, {triangles} triangles")
         print(f"   💾 Sauvegardé: {output_filename}")
         
-        # Chemin relatif pour le frontend
-        relative_mesh_path = f"/outputs/{output_filename}"
+        if cache_key:
+            reconstruction_cache.put(cache_key, mesh_path, {'vertices': vertices, 'triangles': triangles},
+                                     source='upload', photos=len(photo_paths), preset=RECONSTRUCTION_PRESET,
+                                     filename=output_filename)
+            print(f"   🗄️  Mis en cache: {cache_key[:12]}")
+        
+        report_progress(job, 95, 'Génération du code Three.js')
+        return build_upload_payload(mesh_path, f"/outputs/{output_filename}", output_filename,
+                                    len(photo_paths), vertices, triangles), 200
         
-        # Génère code Three.js pour charger le mesh
-        threejs_code = f"""
+    finally:
+        # Nettoyage du dossier temporaire
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def build_upload_payload(mesh_path, relative_mesh_path, output_filename, num_photos, vertices, triangles):
+    """Réponse d'une reconstruction uploadée (fraîche ou cache)"""
+    return {
+        'success': True,
+        'code': build_upload_threejs_code(relative_mesh_path, output_filename, vertices, triangles),
+        'type': 'javascript',
+        'mesh_path': mesh_path,
+        'relative_path': relative_mesh_path,
+        'filename': output_filename,
+        'stats': {
+            'photos': num_photos,
+            'vertices': vertices,
+            'triangles': triangles
+        },
+        'message': f'✅ Reconstruction depuis {num_photos} photos!'
+    }
+
+def build_upload_threejs_code(relative_mesh_path, output_filename, vertices, triangles):
+    """Code Three.js qui charge un mesh reconstruit"""
+    return f"""
 (function() {{
     const loader = new THREE.OBJLoader();
     addLog('📦 Chargement du mesh reconstruit...');
@@ -920,30 +1376,108 @@ def upload_reconstruct():
     );
 }})();
 """
-        
-        return jsonify({
-            'success': True,
-            'code': threejs_code,
-            'type': 'javascript',
-            'mesh_path': mesh_path,
-            'relative_path': relative_mesh_path,
-            'filename': output_filename,
-            'stats': {
-                'photos': len(photo_paths),
-                'vertices': vertices,
-                'triangles': triangles
-            },
-            'message': f'✅ Reconstruction depuis {len(photo_paths)} photos!'
-        })
-        
+
+@app.route('/api/prompts', methods=['GET'])
+def prompts_report():
+    """Templates de prompts: tokens du préfixe statique, empreinte, coût d'assemblage"""
+    return jsonify({'success': True, 'templates': prompts.report()})
+
+@app.route('/api/reconstruction-cache', methods=['GET'])
+def reconstruction_cache_info():
+    """Stats et entrées du cache de reconstructions"""
+    return jsonify({
+        'success': True,
+        'stats': reconstruction_cache.get_stats(),
+        'entries': reconstruction_cache.list()
+    })
+
+@app.route('/api/reconstruction-cache', methods=['DELETE'])
+def reconstruction_cache_invalidate():
+    """Invalide une entrée (?key=...) ou tout le cache de reconstructions"""
+    key = request.args.get('key')
+    if key is not None and not is_valid_key(key):
+        return jsonify({'success': False, 'error': 'key invalide (SHA-256 hexadécimal attendu)'}), 400
+    removed = reconstruction_cache.invalidate(key)
+    return jsonify({'success': True, 'removed': removed})
+
+@app.route('/api/backends', methods=['GET'])
+def backends_status():
+    """État des disjoncteurs et dernier sondage de santé de chaque backend"""
+    return jsonify({'success': True, 'backends': backends.get_stats()})
+
+@app.route('/api/models', methods=['GET'])
+def models_report():
+    """Modèles résidents du process: taille, références, budget mémoire (KIBALI_MODEL_BUDGET_MB), lots de génération"""
+    from kibali_batching import report as batching_report
+    return jsonify({**model_registry.report(), 'batching': batching_report()})
+
+@app.route('/api/speculation', methods=['GET'])
+def speculation_stats():
+    """Préchauffages / préchargements spéculatifs: lancés, utilisés, annulés, expirés"""
+    return jsonify(speculator.get_stats())
+
+@app.route('/api/latency-model', methods=['GET'])
+def latency_model_report():
+    """Durées mesurées par outil (p50/p90/p99) vs estimations des plans"""
+    from kibali_latency import latency_model
+    return jsonify({
+        'success': True,
+        'min_samples': latency_model.min_samples,
+        'tools': latency_model.report()
+    })
+
+@app.route('/api/plan-cache', methods=['GET'])
+def plan_cache_info():
+    """Hits/misses des caches de plans (dispatcher, orchestrateur)"""
+    from kibali_plan_cache import report
+    return jsonify({'success': True, 'caches': report()})
+
+@app.route('/api/plan-cache', methods=['DELETE'])
+def plan_cache_invalidate():
+    """Vide les caches de plans (après modification des tables de patterns)"""
+    from kibali_plan_cache import invalidate_all
+    return jsonify({'success': True, 'removed': invalidate_all()})
+
+@app.route('/api/code-cache', methods=['GET'])
+def code_cache_info():
+    """Hits/misses, taille et entrées du cache de code généré"""
+    return jsonify({'success': True, 'cache': code_cache.get_stats()})
+
+@app.route('/api/code-cache', methods=['DELETE'])
+def code_cache_invalidate():
+    """Vide le cache de code (après changement de modèle ou de templates)"""
+    return jsonify({'success': True, 'removed': code_cache.invalidate()})
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Liste les jobs récents (sans leur résultat). Query: ?status=running&limit=50"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 200)
+        jobs = get_job_manager().list(limit=limit, status=request.args.get('status'))
+        return jsonify({'success': True, 'jobs': jobs})
     except Exception as e:
-        print(f"❌ [UPLOAD] Erreur: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Statut, progression et résultat (une fois terminé) d'un job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job introuvable'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Annule un job en file (immédiat) ou en cours (à sa prochaine étape)"""
+    manager = get_job_manager()
+    if not manager.cancel(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job introuvable'}), 404
+        return jsonify({'success': False, 'error': f"Job déjà terminé ({job['status']})"}), 409
+    
+    return jsonify({'success': True, 'job': manager.get(job_id)})
 
 @app.route('/api/grease-pencil', methods=['POST'])
 def grease_pencil():
@@ -958,14 +1492,18 @@ def grease_pencil():
     try:
         data = request.json
         prompt = data.get('prompt')
+        regenerate = bool(data.get('regenerate'))
         
         print(f"✏️ [Grease Pencil] Prompt: {prompt}")
         
         if not prompt:
             return jsonify({'error': 'prompt requis'}), 400
         
-        # Force la méthode grease-pencil
-        result = generate_advanced_3d(prompt, 'grease-pencil')
+        # Force la méthode grease-pencil (même clé que /api/text-to-3d method=grease-pencil)
+        result, coalesced = generation_flights.do(
+            coalesce_key('text-to-3d', prompt, 'grease-pencil', regenerate),
+            lambda: generate_advanced_3d(prompt, 'grease-pencil', regenerate)
+        )
         
         if result.get('success'):
             print(f"✅ [Grease Pencil] Dessin généré")
@@ -973,7 +1511,10 @@ def grease_pencil():
                 'success': True,
                 'code': result['code'],
                 'method': 'grease-pencil',
-                'type': 'javascript'
+                'type': 'javascript',
+                'coalesced': coalesced,
+                'cached': result.get('cached', False),
+                'semantic_match': result.get('semantic_match')
             })
         else:
             return jsonify({
@@ -1053,13 +1594,20 @@ def execute_agent_task(prompt: str) -> dict:
     """Exécute une tâche avec l'agent LangChain"""
     global AGENT_EXECUTOR
     
+    # Pendant l'analyse LLM: backends préchauffés, assets probables préchargés
+    speculation = speculator.speculate(prompt)
+    
     try:
+        # LangChain + outils du registry (chargés au premier appel ou par le préchauffage)
+        langchain = subsystems.get('langchain') if LANGCHAIN_AVAILABLE else None
+        tools = langchain['tools'] if langchain else []
+        
         # Initialise l'agent si nécessaire
-        if AGENT_EXECUTOR is None and LANGCHAIN_AVAILABLE:
+        if AGENT_EXECUTOR is None and langchain:
             print("🤖 Initialisation de l'agent LangChain...")
             
             # Crée un LLM HuggingFace
-            llm = HuggingFaceEndpoint(
+            llm = langchain['HuggingFaceEndpoint'](
                 endpoint_url=f"https://api-inference.huggingface.co/models/{current_model}",
                 huggingfacehub_api_token=HF_TOKEN,
                 temperature=0.7,
@@ -1067,15 +1615,15 @@ def execute_agent_task(prompt: str) -> dict:
             )
             
             # Crée le prompt template
-            prompt_template = PromptTemplate(
+            prompt_template = langchain['PromptTemplate'](
                 template=react_template,
                 input_variables=["input", "agent_scratchpad"],
                 partial_variables={"tools": "\n".join([f"{t.name}: {t.description}" for t in tools])}
             )
             
             # Crée l'agent
-            agent = create_react_agent(llm, tools, prompt_template)
-            AGENT_EXECUTOR = AgentExecutor(
+            agent = langchain['create_react_agent'](llm, tools, prompt_template)
+            AGENT_EXECUTOR = langchain['AgentExecutor'](
                 agent=agent,
                 tools=tools,
                 verbose=True,
@@ -1097,6 +1645,7 @@ def execute_agent_task(prompt: str) -> dict:
             for tool in tools:
                 if tool.name in str(result):
                     tools_used.append(tool.name)
+            speculation.resolve(tools_used)
             
             return {
                 'success': True,
@@ -1114,6 +1663,7 @@ def execute_agent_task(prompt: str) -> dict:
             raise Exception("Agent non disponible")
             
     except Exception as e:
+        speculation.cancel()
         import sys, traceback
         sys.stderr.write(f"❌ Agent erreur: {e}\n")
         sys.stderr.write(f"📋 Traceback:\n{traceback.format_exc()}\n")
@@ -1128,7 +1678,8 @@ def agent_execute():
     
     Body: {
         "task": "Crée un personnage héroïque et ajoute une lumière dramatique",
-        "max_iterations": 5
+        "max_iterations": 5,
+        "deadline_ms": 60000  // budget des appels d'outils (défaut KIBALI_REQUEST_DEADLINE)
     }
     """
     try:
@@ -1142,7 +1693,9 @@ def agent_execute():
             }), 503
         
         print(f"🤖 [AGENT] Tâche: {task}")
-        result = execute_agent_task(task)
+        # Les outils (appels synchrones via http_client) héritent de l'échéance
+        with deadline_scope(request_deadline(data)):
+            result = execute_agent_task(task)
         
         return jsonify(result)
         
@@ -1157,24 +1710,38 @@ def generate_animation():
     Body: {
         "prompt": "marche vers l'avant pendant 3 secondes",
         "object_type": "character",
-        "duration_frames": 90
+        "duration_frames": 90,
+        "format": "json"  # json (historique) | packed (Float32 base64) | binary
     }
     """
     try:
         data = request.json
         prompt = data.get('prompt', '')
-        object_type = data.get('object_type', 'character')
         duration = data.get('duration_frames', 90)
         
-        # Génère les keyframes avec Kibali
-        keyframes = generate_animation_keyframes(prompt, object_type, duration)
+        output_format = data.get('format', 'json')
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f"format doit être parmi {', '.join(OUTPUT_FORMATS)}"}), 400
         
-        return jsonify({
+        # Échantillonnage vectorisé des pistes
+        tracks = sample_animation(prompt, duration)
+        
+        if output_format == 'binary':
+            headers = binary_headers(tracks, ANIMATION_LAYOUT)
+            headers.update({'X-Animation-Duration': str(duration), 'X-Animation-Fps': '30'})
+            return Response(pack_tracks(tracks), mimetype='application/octet-stream', headers=headers)
+        
+        result = {
             'success': True,
-            'keyframes': keyframes,
             'duration': duration,
             'fps': 30
-        })
+        }
+        if output_format == 'packed':
+            result['tracks'] = packed_descriptor(tracks, ANIMATION_LAYOUT)
+        else:
+            result['keyframes'] = tracks_to_keyframes(tracks)
+        
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1186,22 +1753,36 @@ def camera_control():
     
     Body: {
         "prompt": "caméra orbite autour du personnage",
-        "current_position": {x, y, z}
+        "current_position": {x, y, z},
+        "format": "json"  # json (historique) | packed (+ trajectoire Float32 base64) | binary
     }
     """
     try:
         data = request.json
         prompt = data.get('prompt', '')
         current_pos = data.get('current_position', {'x': 5, 'y': 5, 'z': 5})
+        output_format = data.get('format', 'json')
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f"format doit être parmi {', '.join(OUTPUT_FORMATS)}"}), 400
         
         # Analyse et génère le mouvement de caméra
         camera_path = generate_camera_movement(prompt, current_pos)
         
-        return jsonify({
+        if output_format == 'binary':
+            track = sample_camera_path(camera_path)
+            headers = binary_headers(track, CAMERA_LAYOUT)
+            headers['X-Camera-Animation'] = camera_path['type']
+            return Response(pack_tracks(track), mimetype='application/octet-stream', headers=headers)
+        
+        result = {
             'success': True,
             'camera_path': camera_path,
             'animation_type': camera_path['type']
-        })
+        }
+        if output_format == 'packed':
+            result['track'] = packed_descriptor(sample_camera_path(camera_path), CAMERA_LAYOUT)
+        
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1377,49 +1958,83 @@ def camera_stop_endpoint():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/camera-batch', methods=['POST'])
+def camera_batch_endpoint():
+    """
+    Séquence de commandes caméra compilée en une seule timeline
+
+    Body: {
+        "commands": [
+            {"command": "preset", "preset": "front"},
+            {"command": "flyto", "x": 0, "y": 10, "z": 5, "duration": 2000},
+            {"command": "orbit360", "duration": 8000, "height": 5, "radius": 8},
+            {"tool": "CameraZoom", "params": {"factor": 2, "duration": 1}}
+        ],
+        "start": {"position": {x, y, z}, "target": {x, y, z}},  # optionnel
+        "fps": 30  # optionnel
+    }
+    """
+    try:
+        data = request.json or {}
+        timeline = compile_camera_timeline(
+            data.get('commands'),
+            start=data.get('start'),
+            fps=data.get('fps', DEFAULT_TIMELINE_FPS)
+        )
+        return jsonify({
+            'success': True,
+            'command': 'timeline',
+            'timeline': timeline
+        })
+    except CameraTimelineError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============================================
 # FONCTIONS INTERNES
 # ============================================
 
-def get_system_prompt(context):
-    """Retourne le prompt système selon le contexte"""
-    prompts = {
-        'creation': """Tu es Kibali, assistant expert en création 3D pour Kibalone Studio.
+# Prompts système du chat: statiques, compilés une fois dans le registre
+SYSTEM_PROMPTS = {
+    'creation': """Tu es Kibali, assistant expert en création 3D pour Kibalone Studio.
 IMPORTANT: Réponds UNIQUEMENT en français, de manière COURTE (maximum 2-3 phrases).
 Tu aides à créer des modèles 3D (personnages, objets, environnements).
 Confirme rapidement ce que tu vas créer, sans détails techniques.
 Exemple: "Je crée un guerrier héroïque avec armure et épée !"
 """,
-        
-        'animation': """Tu es Kibali, expert en animation 3D.
+    
+    'animation': """Tu es Kibali, expert en animation 3D.
 IMPORTANT: Réponds UNIQUEMENT en français, de manière COURTE (1-2 phrases).
 Confirme l'animation que tu vas créer.
 Exemple: "J'anime le personnage en marche !"
 """,
-        
-        'camera': """Tu es Kibali, directeur photo virtuel.
+    
+    'camera': """Tu es Kibali, directeur photo virtuel.
 IMPORTANT: Réponds UNIQUEMENT en français, de manière COURTE (1-2 phrases).
 Confirme le mouvement de caméra.
 Exemple: "Caméra en orbite autour de la scène !"
 """,
-        
-        'general': """Tu es Kibali, assistant IA pour la création 3D dans Kibalone Studio.
+    
+    'general': """Tu es Kibali, assistant IA pour la création 3D dans Kibalone Studio.
 IMPORTANT: 
 - Réponds UNIQUEMENT en français
 - Sois TRÈS BREF (maximum 2-3 phrases)
 - Confirme rapidement sans explications longues
 Tu comprends les demandes de création 3D et réponds de façon concise."""
-    }
-    
-    return prompts.get(context, prompts['general'])
+}
 
-def generate_response(message, system_prompt, history):
-    """Génère une réponse avec Kibali - VERSION RAPIDE ET COURTE"""
-    global inference_client, current_model
-    
-    print(f"🤖 [KIBALI] Début génération... (modèle: {current_model})")
-    
-    # Construction des messages avec instruction de brièveté
+for _context, _text in SYSTEM_PROMPTS.items():
+    prompts.register(f'system.{_context}', _text)
+
+def get_system_prompt(context):
+    """Retourne le prompt système selon le contexte (précompilé)"""
+    if context not in SYSTEM_PROMPTS:
+        context = 'general'
+    return prompts.render(f'system.{context}')
+
+def build_chat_messages(message, system_prompt, history):
+    """Construit les messages du chat avec instruction de brièveté"""
     messages = [{"role": "system", "content": system_prompt + "\n\nRAPPEL: Réponds en français, maximum 2-3 phrases courtes."}]
     
     # Ajoute l'historique (RÉDUIT pour vitesse)
@@ -1427,21 +2042,30 @@ def generate_response(message, system_prompt, history):
         messages.append(msg)
     
     messages.append({"role": "user", "content": message})
+    return messages
+
+def stream_response_tokens(message, system_prompt, history):
+    """Génère la réponse de Kibali token par token (générateur)"""
+    stream = inference_client.chat.completions.create(
+        model=current_model,
+        messages=build_chat_messages(message, system_prompt, history),
+        max_tokens=200,  # RÉDUIT à 200 pour réponses courtes
+        temperature=0.7,
+        stream=True
+    )
+    
+    for chunk in stream:
+        if chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def generate_response(message, system_prompt, history):
+    """Génère une réponse avec Kibali - VERSION RAPIDE ET COURTE"""
+    print(f"🤖 [KIBALI] Début génération... (modèle: {current_model})")
     
     # Génération
-    response_text = ""
     try:
-        stream = inference_client.chat.completions.create(
-            model=current_model,
-            messages=messages,
-            max_tokens=200,  # RÉDUIT à 200 pour réponses courtes
-            temperature=0.7,
-            stream=True
-        )
-        
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                response_text += chunk.choices[0].delta.content
+        with observe_inference(current_model, 'chat'):
+            response_text = "".join(stream_response_tokens(message, system_prompt, history))
         
         print(f"✅ [KIBALI] Réponse générée: {len(response_text)} chars")
         
@@ -1458,9 +2082,41 @@ def generate_response(message, system_prompt, history):
             'suggestions': []
         }
 
-def analyze_with_kibali(prompt, context):
-    """Analyse un prompt avec Kibali"""
-    system_prompt = f"""Analyse ce prompt pour la création 3D.
+def sse_event(event, data):
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_kibali_events(message, system_prompt, history, finalize):
+    """
+    Relaie les tokens de Kibali en événements SSE au fur et à mesure
+    
+    Événements: 'token' {"text": ...} puis 'done' avec finalize(texte complet),
+    ou 'error' {"error": ...} si la génération échoue.
+    """
+    print(f"🤖 [KIBALI] Début génération streamée... (modèle: {current_model})")
+    response_text = ""
+    try:
+        for token in stream_response_tokens(message, system_prompt, history):
+            response_text += token
+            yield sse_event('token', {'text': token})
+        
+        print(f"✅ [KIBALI] Réponse streamée: {len(response_text)} chars")
+        yield sse_event('done', finalize(response_text))
+    
+    except Exception as e:
+        print(f"❌ [KIBALI] Erreur streaming: {e}")
+        yield sse_event('error', {'success': False, 'error': str(e), 'partial': response_text})
+
+def sse_response(events):
+    """Réponse Flask text/event-stream (sans buffering proxy)"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Instructions statiques en tête, prompt/contexte à la fin: préfixe commun réutilisable
+prompts.register('analysis.intent', """Analyse ce prompt pour la création 3D.
 Retourne un JSON avec:
 - intent: l'intention (create, animate, camera, light, etc.)
 - parameters: {{
@@ -1471,23 +2127,27 @@ Retourne un JSON avec:
   }}
 - suggestions: des suggestions d'amélioration
 
-Prompt: {prompt}
-Context: {context}
-
 Choix de l'outil:
 - meshy: pour génération 3D réaliste et détaillée (nécessite API key)
 - triposr: pour conversion image→3D (actuellement non disponible)
 - midas: pour reconstruction 3D multi-vues/photogrammétrie
-- procedural: génération procédurale simple (fallback)"""
-    
-    response = generate_response(prompt, system_prompt, [])
-    
+- procedural: génération procédurale simple (fallback)
+
+Prompt: {prompt}
+Context: {context}""")
+
+def get_analysis_prompt(prompt, context):
+    """Prompt système pour l'analyse d'intention"""
+    return prompts.render('analysis.intent', prompt=prompt, context=context)
+
+def parse_kibali_analysis(prompt, text):
+    """Extrait l'analyse JSON de la réponse de Kibali (fallback par mots-clés)"""
     try:
         # Parse le JSON de la réponse
-        json_start = response['text'].find('{')
-        json_end = response['text'].rfind('}') + 1
+        json_start = text.find('{')
+        json_end = text.rfind('}') + 1
         if json_start != -1 and json_end > json_start:
-            result = json.loads(response['text'][json_start:json_end])
+            result = json.loads(text[json_start:json_end])
             # Assure qu'il y a un tool par défaut
             if 'parameters' in result and 'tool' not in result['parameters']:
                 result['parameters']['tool'] = 'procedural'
@@ -1512,6 +2172,11 @@ Choix de l'outil:
         'suggestions': []
     }
 
+def analyze_with_kibali(prompt, context):
+    """Analyse un prompt avec Kibali"""
+    response = generate_response(prompt, get_analysis_prompt(prompt, context), [])
+    return parse_kibali_analysis(prompt, response['text'])
+
 def detect_intent(prompt):
     """Détecte l'intention basique du prompt"""
     prompt_lower = prompt.lower()
@@ -1536,16 +2201,19 @@ def detect_intent(prompt):
     
     return 'general'
 
-def analyze_model_prompt(prompt, model_type):
-    """Analyse un prompt de création de modèle"""
-    system_prompt = f"""Analyse ce prompt pour créer un modèle 3D de type {model_type}.
+prompts.register('analysis.model', """Analyse ce prompt pour créer un modèle 3D.
 Extrais:
 - forme de base (humanoid, spherical, cubic, etc.)
 - caractéristiques (taille, couleur, style)
 - complexité (1-10)
 - est_organique (true/false)
 
-Prompt: {prompt}"""
+Type de modèle: {model_type}
+Prompt: {prompt}""")
+
+def analyze_model_prompt(prompt, model_type):
+    """Analyse un prompt de création de modèle"""
+    system_prompt = prompts.render('analysis.model', model_type=model_type, prompt=prompt)
     
     response = generate_response(prompt, system_prompt, [])
     
@@ -1580,42 +2248,8 @@ def generate_ai_model(analysis):
     }
 
 def generate_animation_keyframes(prompt, object_type, duration):
-    """Génère des keyframes d'animation"""
-    # Analyse le prompt
-    if 'marche' in prompt.lower() or 'walk' in prompt.lower():
-        # Animation de marche
-        keyframes = []
-        for frame in range(0, duration, 15):
-            keyframes.append({
-                'frame': frame,
-                'transformation': {
-                    'translation': {'x': 0, 'y': 0, 'z': frame * 0.05},
-                    'rotation': {'x': 0, 'y': 0, 'z': 0},
-                    'scale': {'x': 1, 'y': 1, 'z': 1}
-                }
-            })
-        return keyframes
-    
-    elif 'rotation' in prompt.lower() or 'tourne' in prompt.lower():
-        # Animation de rotation
-        keyframes = []
-        for frame in range(0, duration, 10):
-            angle = (frame / duration) * 360
-            keyframes.append({
-                'frame': frame,
-                'transformation': {
-                    'translation': {'x': 0, 'y': 0, 'z': 0},
-                    'rotation': {'x': 0, 'y': angle, 'z': 0},
-                    'scale': {'x': 1, 'y': 1, 'z': 1}
-                }
-            })
-        return keyframes
-    
-    # Default: simple keyframes
-    return [
-        {'frame': 0, 'transformation': {'translation': {'x': 0, 'y': 0, 'z': 0}, 'rotation': {'x': 0, 'y': 0, 'z': 0}, 'scale': {'x': 1, 'y': 1, 'z': 1}}},
-        {'frame': duration, 'transformation': {'translation': {'x': 0, 'y': 0, 'z': 0}, 'rotation': {'x': 0, 'y': 0, 'z': 0}, 'scale': {'x': 1, 'y': 1, 'z': 1}}}
-    ]
+    """Génère des keyframes d'animation (format JSON historique)"""
+    return tracks_to_keyframes(sample_animation(prompt, duration))
 
 def generate_camera_movement(prompt, current_pos):
     """Génère un mouvement de caméra"""
@@ -1779,16 +2413,33 @@ if __name__ == '__main__':
         print("\nEndpoints disponibles:")
         print("  GET  /api/health")
         print("  POST /api/chat")
+        print("  POST /api/chat/stream           📡 SSE")
         print("  POST /api/generate-model")
         print("  POST /api/text-to-3d")
         print("  POST /api/triposr-generate")
+        print("  GET  /api/jobs/<id>              📋 JOBS (async: true)")
         print("  POST /api/analyze-prompt        ⚡ DISPATCHER")
         print("  POST /api/generate-animation")
         print("  POST /api/camera-control")
+        print("  POST /api/camera-batch           🎬 TIMELINE")
+        print("  POST /api/orchestrate/stream     📡 SSE (étapes en direct)")
         print("  POST /api/dispatcher/test        🧪 DEBUG")
         print("  GET  /api/dispatcher/patterns    📚 DOCS")
+        print("  GET  /api/plan-cache             🗂️  PLANS")
+        print("  GET  /api/code-cache             🧊 CODE")
+        print("  GET  /api/latency-model          ⏱️  DURÉES")
+        print("  GET  /api/backends               ⛔ BREAKERS")
+        print("  GET  /api/startup-report         ⏱️  STARTUP")
+        
+        # Préchauffage en arrière-plan: l'API écoute sans attendre CodeLlama
+        print("\n🔥 Préchauffage des générateurs en arrière-plan...")
+        subsystems.warm_up(default=DEFAULT_WARMUP)
+        
+        # Sondage des backends: les appels vers un service arrêté échouent immédiatement
+        backends.start_prober()
         
         port = int(os.environ.get('PORT', 11000))
+        subsystems.mark_listening()
         app.run(host='0.0.0.0', port=port, debug=False)
     else:
         print("❌ Impossible de démarrer Kibali-IA")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+🧺 KIBALI BATCHING - Micro-batching des générations des LLM de code locaux
+==========================================================================
+Chaque model.generate() de hybrid_ai_generator et ai_procedural_3d tournait
+seul: avec plusieurs utilisateurs, N générations CodeLlama s'enchaînaient
+l'une après l'autre alors qu'un seul generate() sur un lot de N prompts
+(paddés à gauche) occupe bien mieux le CPU/GPU.
+
+Un GenerationBatcher par modèle (clé du registre kibali_models):
+
+- generate(texte, **paramètres) bloque l'appelant et renvoie le texte
+  généré (sans le prompt)
+- un thread collecte les demandes arrivées pendant KIBALI_BATCH_MAX_WAIT_MS
+  (défaut 10 ms) après la première, jusqu'à KIBALI_BATCH_MAX_SIZE (défaut 4)
+- les demandes aux paramètres identiques (max_new_tokens, temperature...)
+  partent dans le même generate(), les autres dans des lots séparés
+- chaque sortie est découpée après la longueur paddée du prompt et rendue
+  à son appelant; une erreur est relevée chez tous les appelants du lot
+  (et chez les demandes en attente si elle survient hors du generate())
+- un appelant n'attend pas plus de KIBALI_BATCH_TIMEOUT secondes (défaut
+  600): sa demande est annulée si elle n'est pas encore partie
+
+Le modèle est épinglé dans le registre pendant chaque lot.
+
+Métriques: kibali_generation_batch_size{model} et
+kibali_generation_batch_wait_seconds{model}.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from kibali_metrics import registry
+from kibali_models import model_registry
+
+BATCH_MAX_SIZE = int(os.environ.get('KIBALI_BATCH_MAX_SIZE', '4'))
+BATCH_MAX_WAIT = float(os.environ.get('KIBALI_BATCH_MAX_WAIT_MS', '10')) / 1000
+BATCH_TIMEOUT = float(os.environ.get('KIBALI_BATCH_TIMEOUT', '600'))
+
+BATCH_SIZE = registry.histogram(
+    'kibali_generation_batch_size', 'Demandes par generate() des LLM locaux', ('model',),
+    buckets=(1, 2, 3, 4, 6, 8, 16))
+BATCH_WAIT = registry.histogram(
+    'kibali_generation_batch_wait_seconds', 'Attente d\'une demande avant le départ de son lot', ('model',),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0))
+
+
+class _Request:
+    __slots__ = ('text', 'kwargs', 'signature', 'future', 'queued_at')
+
+    def __init__(self, text: str, kwargs: Dict):
+        self.text = text
+        self.kwargs = kwargs
+        # Paramètres de génération partagés par tout le lot
+        self.signature = tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+        self.future: Future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class GenerationBatcher:
+    """Regroupe les generate() concurrents d'un modèle causal en lots paddés"""
+
+    def __init__(self, key: str, loader: Callable[[], Dict], device: str,
+                 max_batch_size: int = BATCH_MAX_SIZE, max_wait: float = BATCH_MAX_WAIT,
+                 timeout: float = BATCH_TIMEOUT):
+        self.key = key
+        self.loader = loader
+        self.device = device
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.timeout = timeout
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._pending: List[_Request] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'errors': 0, 'timeouts': 0, 'max_batch': 0}
+
+    def generate(self, text: str, **kwargs) -> str:
+        """Texte généré pour `text` (paramètres de model.generate), calculé dans un lot"""
+        request = _Request(text, kwargs)
+        self._ensure_worker()
+        self._queue.put(request)
+        try:
+            return request.future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            # Pas encore partie: retirée du prochain lot
+            request.future.cancel()
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise TimeoutError(f"Génération {self.key} sans réponse après {self.timeout:.0f}s")
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True,
+                                                    name=f'kibali-batch-{self.key[-24:]}')
+                    self._thread.start()
+
+    # ---------------------------------------------
+    # Collecte et exécution des lots
+    # ---------------------------------------------
+
+    def _collect(self) -> List[_Request]:
+        """Première demande en attente + celles arrivées dans la fenêtre max_wait, même signature"""
+        if not self._pending:
+            self._pending.append(self._queue.get())
+        first = self._pending[0]
+        window_end = first.queued_at + self.max_wait
+
+        while len(self._pending) < self.max_batch_size * 4:
+            remaining = window_end - time.perf_counter()
+            if remaining <= 0 and not self._queue.qsize():
+                break
+            try:
+                self._pending.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                                     else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if sum(r.signature == first.signature for r in self._pending) >= self.max_batch_size:
+                break
+
+        batch = [r for r in self._pending if r.signature == first.signature][:self.max_batch_size]
+        self._pending = [r for r in self._pending if r not in batch]
+        return batch
+
+    def _run(self):
+        while True:
+            batch: List[_Request] = []
+            try:
+                batch = self._collect()
+                batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                now = time.perf_counter()
+                for request in batch:
+                    BATCH_WAIT.observe(now - request.queued_at, model=self.key)
+                outputs = self._generate_batch([r.text for r in batch], batch[0].kwargs)
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"{len(outputs)} sorties pour un lot de {len(batch)} demandes")
+                for request, output in zip(batch, outputs):
+                    request.future.set_result(output)
+            except Exception as e:
+                # Le thread survit; aucun appelant ne reste bloqué sur un lot perdu
+                with self._lock:
+                    self.stats['errors'] += 1
+                self._fail(batch, e)
+
+    def _fail(self, batch: List[_Request], error: Exception):
+        """Relève `error` chez les demandes du lot non terminées (et chez celles en attente si aucun lot n'était formé)"""
+        if not batch:
+            # Échec pendant la collecte: l'état de _pending n'est plus fiable
+            batch, self._pending = self._pending, []
+        for request in batch:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def _generate_batch(self, texts: List[str], kwargs: Dict[str, Any]) -> List[str]:
+        import torch
+
+        with model_registry.use(self.key, self.loader) as local:
+            tokenizer, model = local['tokenizer'], local['model']
+            # Modèles décodeurs: padding à gauche, la génération continue chaque prompt sans trou
+            tokenizer.padding_side = 'left'
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+
+            inputs = tokenizer(texts, return_tensors="pt", padding=True).to(self.device)
+            with torch.no_grad():
+                outputs = model.generate(
+                    **inputs,
+                    pad_token_id=tokenizer.pad_token_id,
+                    **kwargs
+                )
+            prompt_length = inputs['input_ids'].shape[1]
+            generated = tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
+
+        with self._lock:
+            self.stats['requests'] += len(texts)
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(texts))
+        BATCH_SIZE.observe(len(texts), model=self.key)
+        return generated
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            batches = self.stats['batches']
+            return {
+                **self.stats,
+                'avg_batch': round(self.stats['requests'] / batches, 2) if batches else None,
+                'queued': self._queue.qsize() + len(self._pending),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': round(self.max_wait * 1000, 1)
+            }
+
+
+_batchers: Dict[str, GenerationBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def batcher_for(key: str, loader: Callable[[], Dict], device: str) -> GenerationBatcher:
+    """Batcher partagé du modèle `key` (hybrid et ai_procedural partagent celui de CodeLlama)"""
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = GenerationBatcher(key, loader, device)
+        return batcher
+
+
+def report() -> Dict[str, Dict]:
+    with _batchers_lock:
+        batchers = dict(_batchers)
+    return {key: batcher.get_stats() for key, batcher in batchers.items()}
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+⛔ KIBALI BREAKERS - Disjoncteurs par backend + sondage de santé
+================================================================
+Quand un backend (MiDaS 11002, Meshy 11003, Blender 11004, Three.js 11005)
+est arrêté, chaque étape de l'executor et chaque outil attendait son
+timeout (10 à 60 s). Chaque backend a maintenant un disjoncteur:
+
+- closed    : les appels passent
+- open      : échec immédiat (BackendUnavailable) jusqu'à la prochaine
+              tentative, avec backoff exponentiel (2s, 4s, 8s... max 60s)
+- half_open : une seule requête d'essai passe; succès → closed, échec → open
+
+Le disjoncteur est alimenté par:
+- le client HTTP partagé (kibali_http): erreurs de connexion et timeouts
+- un sondeur en arrière-plan qui appelle /api/health de chaque backend
+
+BackendUnavailable hérite de requests.exceptions.ConnectionError: les
+chemins de repli existants (mode simulation, messages d'erreur des outils)
+s'appliquent sans modification, en quelques millisecondes.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from kibali_metrics import registry
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+PROBE_INTERVAL = float(os.environ.get('KIBALI_HEALTH_INTERVAL', '5'))
+PROBE_TIMEOUT = float(os.environ.get('KIBALI_HEALTH_TIMEOUT', '1'))
+
+CIRCUIT_STATE = registry.gauge(
+    'kibali_backend_circuit_state', 'État du disjoncteur (0=closed, 1=half_open, 2=open)',
+    ('backend',))
+CIRCUIT_REJECTED = registry.counter(
+    'kibali_backend_rejected_total', 'Appels refusés immédiatement (disjoncteur ouvert)',
+    ('backend',))
+
+
+class BackendUnavailable(requests.exceptions.ConnectionError):
+    """Backend connu comme indisponible: l'appel échoue sans attendre le timeout"""
+
+    def __init__(self, backend: str, retry_in: float):
+        self.backend = backend
+        self.retry_in = retry_in
+        super().__init__(f"Service {backend} indisponible (disjoncteur ouvert, nouvel essai dans {retry_in:.1f}s)")
+
+
+class CircuitBreaker:
+    """Disjoncteur closed / open / half_open avec backoff exponentiel"""
+
+    def __init__(self, name: str, failure_threshold: int = 2, base_backoff: float = 2.0,
+                 max_backoff: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = base_backoff
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        self.opened_count = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(_STATE_VALUES[CLOSED], backend=name)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            icons = {CLOSED: '✅', HALF_OPEN: '🟡', OPEN: '⛔'}
+            print(f"{icons[state]} [BREAKER] {self.name}: {self.state} → {state}")
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], backend=self.name)
+
+    def retry_in(self) -> float:
+        return max(self.retry_at - self.clock(), 0.0)
+
+    def allow(self) -> bool:
+        """True si un appel peut partir (en half_open: une seule requête d'essai)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() >= self.retry_at:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def check(self):
+        """Lève BackendUnavailable si l'appel doit échouer immédiatement"""
+        if not self.allow():
+            CIRCUIT_REJECTED.inc(backend=self.name)
+            raise BackendUnavailable(self.name, self.retry_in())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.backoff = self.base_backoff
+            self.last_error = None
+            self._trial_in_flight = False
+            self._set_state(CLOSED)
+
+    def record_failure(self, error: str = ''):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error or self.last_error
+            self._trial_in_flight = False
+
+            if self.state != CLOSED or self.failures >= self.failure_threshold:
+                # Backoff doublé à chaque nouvel échec tant que le backend reste hors service
+                delay = self.backoff if self.state != CLOSED else self.base_backoff
+                self.backoff = min(delay * 2, self.max_backoff)
+                self.retry_at = self.clock() + delay
+                self.opened_count += 1
+                self._set_state(OPEN)
+
+    def release(self):
+        """Libère la requête d'essai sans conclure (erreur sans rapport avec le backend)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'retry_in': round(self.retry_in(), 2) if self.state == OPEN else 0,
+                'opened_count': self.opened_count,
+                'last_error': self.last_error
+            }
+
+
+class BackendRegistry:
+    """Backends connus (hôte:port → disjoncteur) et sondeur de santé"""
+
+    def __init__(self):
+        self.backends: Dict[str, Dict] = {}
+        self._by_host: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, base_url: str, health_path: str = '/api/health', **breaker_options):
+        parts = urlsplit(base_url)
+        host = f"{parts.hostname}:{parts.port or 80}"
+        with self._lock:
+            self.backends[name] = {
+                'name': name,
+                'base_url': base_url.rstrip('/'),
+                'health_path': health_path,
+                'breaker': CircuitBreaker(name, **breaker_options),
+                'last_probe': None,
+                'last_probe_ms': None
+            }
+            self._by_host[host] = name
+            # localhost et 127.0.0.1 désignent le même service
+            if parts.hostname in ('localhost', '127.0.0.1'):
+                other = '127.0.0.1' if parts.hostname == 'localhost' else 'localhost'
+                self._by_host[f"{other}:{parts.port or 80}"] = name
+
+    def breaker_for(self, host: str) -> Optional[CircuitBreaker]:
+        """Disjoncteur du backend joignable à hôte:port (None si non suivi)"""
+        name = self._by_host.get(host)
+        return self.backends[name]['breaker'] if name else None
+
+    # ---------------------------------------------
+    # Sondeur
+    # ---------------------------------------------
+
+    def probe(self, name: str) -> bool:
+        """Appelle /api/health du backend et alimente son disjoncteur"""
+        backend = self.backends[name]
+        breaker = backend['breaker']
+        # Disjoncteur ouvert: on respecte le backoff avant de re-sonder
+        if breaker.state == OPEN and breaker.retry_in() > 0:
+            return False
+
+        # Session du client partagé, sans passer par la garde du disjoncteur
+        from kibali_http import http_client
+        start = time.perf_counter()
+        try:
+            response = http_client.session.get(backend['base_url'] + backend['health_path'], timeout=PROBE_TIMEOUT)
+            healthy = response.status_code < 500
+            error = '' if healthy else f'HTTP {response.status_code}'
+        except requests.exceptions.RequestException as e:
+            healthy, error = False, type(e).__name__
+
+        backend['last_probe'] = time.time()
+        backend['last_probe_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        if healthy:
+            breaker.record_success()
+        else:
+            breaker.record_failure(error)
+        return healthy
+
+    def probe_all(self):
+        for name in list(self.backends):
+            self.probe(name)
+
+    def _run(self, interval: float):
+        while not self._stop.is_set():
+            self.probe_all()
+            self._stop.wait(interval)
+
+    def start_prober(self, interval: float = PROBE_INTERVAL):
+        """Démarre le sondage périodique en arrière-plan (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,),
+                                            name='kibali-health-prober', daemon=True)
+            self._thread.start()
+        print(f"🩺 Sondeur de santé démarré ({len(self.backends)} backends, toutes les {interval:g}s)")
+
+    def stop_prober(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict:
+        return {
+            name: {
+                'url': backend['base_url'],
+                **backend['breaker'].get_stats(),
+                'last_probe': backend['last_probe'],
+                'last_probe_ms': backend['last_probe_ms']
+            }
+            for name, backend in list(self.backends.items())
+        }
+
+
+# Backends suivis par les services du process
+backends = BackendRegistry()
+backends.register('midas', os.environ.get('KIBALI_MIDAS_URL', 'http://localhost:11002'),
+                  os.environ.get('KIBALI_MIDAS_HEALTH', '/api/health'))
+backends.register('meshy', os.environ.get('KIBALI_MESHY_URL', 'http://localhost:11003'))
+backends.register('blender', os.environ.get('KIBALI_BLENDER_URL', 'http://localhost:11004'))
+backends.register('threejs', os.environ.get('KIBALI_THREEJS_URL', 'http://localhost:11005'))
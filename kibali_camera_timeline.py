@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+🎬 KIBALI CAMERA TIMELINE - Compilation de séquences caméra
+============================================================
+Compile une suite de commandes caméra (orbit360, move, rotate, flyto, lookat,
+zoom, pan, shake, preset, stop) en UNE timeline de keyframes échantillonnées:
+le studio joue un mouvement cinématique complet en un seul aller-retour HTTP
+au lieu d'un appel /api/camera-* par action.
+
+Les commandes acceptent les mêmes paramètres que les endpoints /api/camera-*
+(durées en ms), ou le format des outils/dispatcher ({'tool': 'CameraMove',
+'params': {...}}, durées en secondes).
+"""
+
+import json
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+
+Vec3 = Tuple[float, float, float]
+
+DEFAULT_FPS = 30
+MAX_FPS = 120
+MAX_COMMANDS = 100
+MAX_DURATION_MS = 5 * 60 * 1000  # 5 minutes de timeline max
+
+DEFAULT_POSITION = (5.0, 5.0, 5.0)
+DEFAULT_TARGET = (0.0, 0.0, 0.0)
+
+# Positions des presets (la caméra regarde l'origine)
+PRESETS = {
+    'front': (0.0, 2.0, 10.0),
+    'back': (0.0, 2.0, -10.0),
+    'left': (-10.0, 2.0, 0.0),
+    'right': (10.0, 2.0, 0.0),
+    'top': (0.0, 12.0, 0.01),
+    'bottom': (0.0, -12.0, 0.01),
+    'iso': (8.0, 8.0, 8.0),
+    'isometric': (8.0, 8.0, 8.0),
+    'perspective': (5.0, 5.0, 5.0),
+}
+
+# Alias des commandes: endpoints, outils du registry, actions du dispatcher
+COMMAND_ALIASES = {
+    'orbit': 'orbit360', 'orbit360': 'orbit360', 'cameraorbit360': 'orbit360', 'camera_orbit': 'orbit360',
+    'move': 'move', 'cameramove': 'move',
+    'rotate': 'rotate', 'camerarotate': 'rotate',
+    'flyto': 'flyto', 'fly_to': 'flyto', 'cameraflyto': 'flyto',
+    'lookat': 'lookat', 'look_at': 'lookat', 'cameralookat': 'lookat',
+    'zoom': 'zoom', 'camerazoom': 'zoom', 'camera_zoom': 'zoom',
+    'pan': 'pan', 'camerapan': 'pan',
+    'shake': 'shake', 'camerashake': 'shake',
+    'preset': 'preset', 'camerapreset': 'preset',
+    'stop': 'stop', 'camerastop': 'stop',
+    'wait': 'wait', 'hold': 'wait', 'pause': 'wait',
+}
+
+# Durées par défaut (ms), identiques aux endpoints /api/camera-*
+DEFAULT_DURATIONS = {
+    'orbit360': 8000, 'move': 1000, 'rotate': 1000, 'flyto': 2000, 'lookat': 0,
+    'zoom': 500, 'pan': 1000, 'shake': 500, 'preset': 0, 'wait': 1000,
+}
+
+MOVE_DIRECTIONS = {
+    'forward': 'forward', 'avant': 'forward', 'avance': 'forward',
+    'backward': 'backward', 'back': 'backward', 'arriere': 'backward', 'arrière': 'backward', 'recule': 'backward',
+    'left': 'left', 'gauche': 'left',
+    'right': 'right', 'droite': 'right',
+    'up': 'up', 'haut': 'up', 'monte': 'up',
+    'down': 'down', 'bas': 'down', 'descend': 'down',
+}
+
+
+# ============================================
+# VECTEURS / EASING
+# ============================================
+
+def _add(a: Vec3, b: Vec3) -> Vec3:
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2])
+
+def _sub(a: Vec3, b: Vec3) -> Vec3:
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+def _scale(a: Vec3, k: float) -> Vec3:
+    return (a[0] * k, a[1] * k, a[2] * k)
+
+def _lerp(a: Vec3, b: Vec3, t: float) -> Vec3:
+    return (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t, a[2] + (b[2] - a[2]) * t)
+
+def _norm(a: Vec3) -> float:
+    return math.sqrt(a[0] * a[0] + a[1] * a[1] + a[2] * a[2])
+
+def _normalize(a: Vec3) -> Vec3:
+    n = _norm(a)
+    return _scale(a, 1.0 / n) if n > 1e-9 else (0.0, 0.0, 0.0)
+
+def _cross(a: Vec3, b: Vec3) -> Vec3:
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+def _rotate_around(point: Vec3, center: Vec3, axis: str, radians: float) -> Vec3:
+    """Rotation de `point` autour d'un axe monde passant par `center`"""
+    x, y, z = _sub(point, center)
+    c, s = math.cos(radians), math.sin(radians)
+    if axis == 'x':
+        rotated = (x, y * c - z * s, y * s + z * c)
+    elif axis == 'z':
+        rotated = (x * c - y * s, x * s + y * c, z)
+    else:
+        rotated = (x * c + z * s, y, -x * s + z * c)
+    return _add(center, rotated)
+
+def ease_in_out_cubic(t: float) -> float:
+    return 4 * t * t * t if t < 0.5 else 1 - math.pow(-2 * t + 2, 3) / 2
+
+
+def _vec(value, default: Vec3) -> Vec3:
+    """Accepte {x, y, z} ou [x, y, z]"""
+    if isinstance(value, dict):
+        return (float(value.get('x', default[0])), float(value.get('y', default[1])), float(value.get('z', default[2])))
+    if isinstance(value, (list, tuple)) and len(value) == 3:
+        return (float(value[0]), float(value[1]), float(value[2]))
+    return default
+
+def _as_dict(v: Vec3) -> Dict:
+    # + 0.0 évite les -0.0 dans le JSON
+    return {'x': round(v[0], 4) + 0.0, 'y': round(v[1], 4) + 0.0, 'z': round(v[2], 4) + 0.0}
+
+
+# ============================================
+# COMPILATION
+# ============================================
+
+class CameraTimelineError(ValueError):
+    """Commande caméra invalide dans une séquence"""
+
+
+# Unité des durées → True si secondes
+DURATION_UNITS = {'ms': False, 'millisecond': False, 'milliseconds': False,
+                  's': True, 'sec': True, 'second': True, 'seconds': True}
+
+
+def normalize_command(raw: Dict, index: int) -> Tuple[str, Dict, float]:
+    """
+    Retourne (commande canonique, params, durée en ms)
+
+    Formats acceptés:
+        {'command': 'flyto', 'params': {'x': 0, 'y': 10, 'z': 5, 'duration': 2000}}
+        {'command': 'zoom', 'factor': 2}
+        {'tool': 'CameraFlyTo', 'params': {'x': 0, 'y': 10, 'z': 5, 'duration': 2}}  (secondes)
+        {'command': 'flyto', 'duration': 2, 'unit': 's'}  (unité explicite: 's' ou 'ms')
+
+    L'unité des durées vient du format ('tool' → secondes, sinon ms) ou du
+    champ 'unit', jamais du nom de la commande.
+    """
+    if not isinstance(raw, dict):
+        raise CameraTimelineError(f"Commande #{index}: objet attendu")
+
+    name = raw.get('command') or raw.get('tool') or raw.get('action') or raw.get('type') or ''
+    command = COMMAND_ALIASES.get(str(name).lower().replace('-', '_'))
+    if command is None:
+        command = COMMAND_ALIASES.get(str(name).lower().replace('-', '').replace('_', ''))
+    if command is None:
+        raise CameraTimelineError(f"Commande #{index}: '{name}' inconnue")
+
+    params = dict(raw.get('params') or {})
+    params.update({k: v for k, v in raw.items() if k not in ('command', 'tool', 'action', 'type', 'params', 'unit')})
+
+    # Outils du registry / dispatcher: durées en secondes, sauf 'unit' explicite
+    unit = str(raw.get('unit') or ('s' if 'tool' in raw else 'ms')).lower()
+    if unit not in DURATION_UNITS:
+        raise CameraTimelineError(f"Commande #{index} ({command}): unité '{unit}' inconnue (s ou ms)")
+    seconds = DURATION_UNITS[unit]
+    if 'duration' in params:
+        duration = float(params['duration']) * (1000 if seconds else 1)
+    else:
+        duration = DEFAULT_DURATIONS.get(command, 0)
+
+    if duration < 0:
+        raise CameraTimelineError(f"Commande #{index} ({command}): durée négative")
+    return command, params, duration
+
+
+def _segment_sampler(command: str, params: Dict, position: Vec3, target: Vec3, index: int):
+    """
+    Construit la fonction d'échantillonnage d'un segment: t ∈ [0, 1] → (position, target)
+    """
+    if command == 'orbit360':
+        radius = float(params.get('radius', 8))
+        height = float(params.get('height', 5))
+        offset = _sub(position, target)
+        start_angle = math.atan2(offset[0], offset[2])
+        turns = float(params.get('turns', 1))
+
+        def sample(t):
+            angle = start_angle + 2 * math.pi * turns * t
+            return (target[0] + radius * math.sin(angle), target[1] + height,
+                    target[2] + radius * math.cos(angle)), target
+        return sample
+
+    if command == 'move':
+        direction = MOVE_DIRECTIONS.get(str(params.get('direction', 'forward')).lower())
+        if direction is None:
+            raise CameraTimelineError(f"Commande #{index} (move): direction '{params.get('direction')}' inconnue")
+        distance = float(params.get('distance', 2))
+        forward = _normalize(_sub(target, position))
+        right = _normalize(_cross(forward, (0.0, 1.0, 0.0)))
+        vectors = {
+            'forward': forward, 'backward': _scale(forward, -1),
+            'right': right, 'left': _scale(right, -1),
+            'up': (0.0, 1.0, 0.0), 'down': (0.0, -1.0, 0.0),
+        }
+        delta = _scale(vectors[direction], distance)
+        end_position, end_target = _add(position, delta), _add(target, delta)
+        return lambda t: (_lerp(position, end_position, ease_in_out_cubic(t)),
+                          _lerp(target, end_target, ease_in_out_cubic(t)))
+
+    if command == 'rotate':
+        axis = str(params.get('axis', 'y')).lower()
+        if axis not in ('x', 'y', 'z'):
+            raise CameraTimelineError(f"Commande #{index} (rotate): axe '{axis}' inconnu")
+        radians = math.radians(float(params.get('degrees', 90)))
+        return lambda t: (_rotate_around(position, target, axis, radians * ease_in_out_cubic(t)), target)
+
+    if command == 'flyto':
+        end_position = _vec(params, (0.0, 10.0, 5.0))
+        return lambda t: (_lerp(position, end_position, ease_in_out_cubic(t)), target)
+
+    if command == 'lookat':
+        end_target = _vec(params, (0.0, 0.0, 0.0))
+        return lambda t: (position, _lerp(target, end_target, ease_in_out_cubic(t)))
+
+    if command == 'zoom':
+        factor = float(params.get('factor', 1.5))
+        if factor <= 0:
+            raise CameraTimelineError(f"Commande #{index} (zoom): factor doit être > 0")
+        end_position = _add(target, _scale(_sub(position, target), 1.0 / factor))
+        return lambda t: (_lerp(position, end_position, ease_in_out_cubic(t)), target)
+
+    if command == 'pan':
+        forward = _normalize(_sub(target, position))
+        right = _normalize(_cross(forward, (0.0, 1.0, 0.0)))
+        up = _normalize(_cross(right, forward))
+        delta = _add(_scale(right, float(params.get('horizontal', 0))), _scale(up, float(params.get('vertical', 0))))
+        end_position, end_target = _add(position, delta), _add(target, delta)
+        return lambda t: (_lerp(position, end_position, ease_in_out_cubic(t)),
+                          _lerp(target, end_target, ease_in_out_cubic(t)))
+
+    if command == 'shake':
+        intensity = float(params.get('intensity', 0.3))
+        rng = random.Random(params.get('seed', index))
+        jitter = [(rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1)) for _ in range(64)]
+
+        def sample(t):
+            if t >= 1:
+                return position, target
+            # Amplitude décroissante, la caméra revient à sa pose de départ
+            amplitude = intensity * (1 - t)
+            return _add(position, _scale(jitter[int(t * len(jitter)) % len(jitter)], amplitude)), target
+        return sample
+
+    if command == 'preset':
+        preset = str(params.get('preset', 'iso')).lower()
+        if preset not in PRESETS:
+            raise CameraTimelineError(f"Commande #{index} (preset): '{preset}' inconnu")
+        end_position = PRESETS[preset]
+        return lambda t: (_lerp(position, end_position, ease_in_out_cubic(t)),
+                          _lerp(target, DEFAULT_TARGET, ease_in_out_cubic(t)))
+
+    # wait
+    return lambda t: (position, target)
+
+
+def compile_camera_timeline(commands: List[Dict], start: Optional[Dict] = None,
+                            fps: int = DEFAULT_FPS) -> Dict:
+    """
+    Compile une séquence de commandes en une timeline unique
+
+    Les commandes s'enchaînent: chacune part de la pose finale de la précédente.
+    'stop' termine la timeline (les commandes suivantes sont ignorées).
+
+    Returns:
+        {
+            'fps', 'duration' (ms), 'frame_count',
+            'keyframes': [{'time': ms, 'position': {x,y,z}, 'target': {x,y,z}}, ...],
+            'segments': [{'index', 'command', 'start', 'end', 'params'}, ...],
+            'final_state': {'position', 'target'},
+            'skipped': nombre de commandes ignorées après 'stop'
+        }
+    """
+    if isinstance(commands, str):
+        # Format des outils LangChain: liste JSON sérialisée
+        try:
+            commands = json.loads(commands)
+        except json.JSONDecodeError as e:
+            raise CameraTimelineError(f"'commands' n'est pas un JSON valide: {e}")
+    if not isinstance(commands, list) or not commands:
+        raise CameraTimelineError("'commands' doit être une liste non vide")
+    if len(commands) > MAX_COMMANDS:
+        raise CameraTimelineError(f"Trop de commandes ({len(commands)} > {MAX_COMMANDS})")
+
+    fps = int(fps or DEFAULT_FPS)
+    if not 1 <= fps <= MAX_FPS:
+        raise CameraTimelineError(f"fps doit être entre 1 et {MAX_FPS}")
+    frame_ms = 1000.0 / fps
+
+    start = start or {}
+    position = _vec(start.get('position'), DEFAULT_POSITION)
+    target = _vec(start.get('target'), DEFAULT_TARGET)
+
+    keyframes = [{'time': 0.0, 'position': _as_dict(position), 'target': _as_dict(target)}]
+    segments = []
+    clock = 0.0
+    skipped = 0
+
+    for index, raw in enumerate(commands):
+        command, params, duration = normalize_command(raw, index)
+
+        if command == 'stop':
+            skipped = len(commands) - index - 1
+            segments.append({'index': index, 'command': 'stop', 'start': round(clock, 1),
+                             'end': round(clock, 1), 'params': {}})
+            break
+
+        if clock + duration > MAX_DURATION_MS:
+            raise CameraTimelineError(f"Timeline trop longue (> {MAX_DURATION_MS // 1000}s)")
+
+        sample = _segment_sampler(command, params, position, target, index)
+
+        # Échantillonnage à fps constant; un segment instantané = une keyframe
+        steps = max(1, int(math.ceil(duration / frame_ms)))
+        for step in range(1, steps + 1):
+            t = step / steps
+            pos, tgt = sample(t)
+            keyframes.append({'time': round(clock + duration * t, 1),
+                              'position': _as_dict(pos), 'target': _as_dict(tgt)})
+
+        position, target = sample(1.0)
+        segments.append({'index': index, 'command': command, 'start': round(clock, 1),
+                         'end': round(clock + duration, 1), 'params': params})
+        clock += duration
+
+    # Deux keyframes au même instant (segment instantané): la dernière gagne
+    merged = []
+    for keyframe in keyframes:
+        if merged and merged[-1]['time'] == keyframe['time']:
+            merged[-1] = keyframe
+        else:
+            merged.append(keyframe)
+
+    return {
+        'fps': fps,
+        'duration': round(clock, 1),
+        'frame_count': len(merged),
+        'keyframes': merged,
+        'segments': segments,
+        'final_state': {'position': _as_dict(position), 'target': _as_dict(target)},
+        'skipped': skipped
+    }
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+🔀 KIBALI COALESCE - Fusion des requêtes de génération identiques
+==================================================================
+Quand plusieurs onglets du studio (ou des retries) envoient le même prompt
+pendant qu'une génération Mistral/CodeLlama est déjà en cours, un seul appel
+est exécuté: les appelants suivants attendent ce calcul et reçoivent le même
+résultat (pattern "single-flight").
+
+Le résultat n'est PAS mis en cache: une fois le calcul terminé, la requête
+suivante relance une génération.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalise un prompt: unicode NFC, minuscules, espaces compactés"""
+    prompt = unicodedata.normalize('NFC', prompt or '')
+    return re.sub(r'\s+', ' ', prompt).strip().lower()
+
+
+def coalesce_key(endpoint: str, prompt: str, *variants) -> Tuple:
+    """Clé de fusion: endpoint + prompt normalisé + type/méthode"""
+    return (endpoint, normalize_prompt(prompt)) + tuple(str(v) for v in variants)
+
+
+class _Flight:
+    """Un calcul en cours, partagé par tous les appelants de la même clé"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Exécute une seule fois les appels concurrents ayant la même clé"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {'executed': 0, 'coalesced': 0, 'in_flight': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Retourne (résultat, partagé)
+
+        `partagé` vaut True si l'appelant a été rattaché à un calcul déjà
+        en cours. Une exception du calcul est relevée chez tous les appelants.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.stats['executed'] += 1
+                self.stats['in_flight'] = len(self._flights)
+            else:
+                flight.waiters += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            print(f"🔀 [COALESCE] Rattaché au calcul en cours ({flight.waiters} en attente)")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                self.stats['in_flight'] = len(self._flights)
+            flight.done.set()
+
+        return flight.result, False
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+🧊 KIBALI CODE CACHE - Cache disque du code Three.js généré
+===========================================================
+/api/generate-model, /api/text-to-3d et /api/chat/generate-model relançaient
+Mistral + CodeLlama (ou le générateur avancé) pour des prompts déjà traités
+des centaines de fois. Le code généré est maintenant gardé sur disque,
+adressé par le contenu de la demande:
+
+    clé = SHA-256(prompt normalisé, type d'objet, générateur/méthode,
+                  empreinte quantifiée du scene_context)
+
+- prompt normalisé comme pour la fusion des requêtes (kibali_coalesce):
+  unicode NFC, minuscules, espaces compactés (les nombres comptent)
+- scene_context réduit à ce que les générateurs lisent (nombre d'objets,
+  premiers noms, type et position des 3 premiers objets, drapeaux has_*,
+  bornes; positions et bornes arrondies à une grille de
+  KIBALI_CODE_CACHE_GRID unités): une scène qui bouge de quelques
+  centimètres garde la même clé
+
+Une entrée = un fichier <clé>.json (résultat complet du générateur). La
+date de modification sert de dernier usage: au-delà de KIBALI_CODE_CACHE_MB
+(ou de max_entries) les entrées les moins récemment servies sont supprimées.
+
+Les résultats marqués 'fallback' (code de secours des générateurs quand
+Mistral/CodeLlama échouent ou produisent du code invalide) ne sont jamais
+stockés ni indexés: une erreur passagère ne fige pas un cube pour le prompt.
+
+regenerate=True (bouton "regénérer") saute la lecture: le générateur est
+relancé et son résultat remplace l'entrée.
+
+Quasi-doublons (kibali_semantic_cache): sur un échec de la clé exacte, le
+prompt le plus proche du même scope (générateur, type, scène, nombres) est
+cherché dans l'index sémantique; au-dessus du seuil son code est servi
+("semantic_match" dans le résultat). L'index est reconstruit depuis les
+entrées disque au premier usage. KIBALI_SEMANTIC_CACHE: "auto" (défaut,
+actif seulement avec un vrai encodeur: sentence-transformers ou clip),
+"1" (actif même avec le hashing), "0" (désactivé).
+
+Métriques: kibali_code_cache_total{generator, outcome} (hit, semantic_hit,
+miss, bypass, store, fallback, eviction), kibali_code_cache_bytes et kibali_code_cache_entries.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from kibali_coalesce import normalize_prompt
+from kibali_metrics import registry
+from kibali_semantic_cache import SEMANTIC_ENCODER, SemanticIndex, prompt_numbers
+
+MB = 1024 * 1024
+
+CODE_CACHE_DIR = os.environ.get('KIBALI_CODE_CACHE', '/home/belikan/Isol/Kibalone-Studio/outputs/code_cache')
+CODE_CACHE_MAX_BYTES = int(float(os.environ.get('KIBALI_CODE_CACHE_MB', '64')) * MB)
+CODE_CACHE_MAX_ENTRIES = int(os.environ.get('KIBALI_CODE_CACHE_ENTRIES', '5000'))
+# Pas de la grille des bornes de scène (unités Three.js)
+SCENE_GRID = float(os.environ.get('KIBALI_CODE_CACHE_GRID', '5'))
+SEMANTIC_CACHE = os.environ.get('KIBALI_SEMANTIC_CACHE', 'auto').lower()
+
+# Incrémenter quand les générateurs changent de format de sortie
+CODE_CACHE_VERSION = 2
+
+CODE_CACHE_TOTAL = registry.counter(
+    'kibali_code_cache_total', 'Lectures/écritures du cache de code par générateur et issue',
+    ('generator', 'outcome'))
+CODE_CACHE_BYTES = registry.gauge('kibali_code_cache_bytes', 'Taille du cache de code sur disque')
+CODE_CACHE_ENTRIES = registry.gauge('kibali_code_cache_entries', 'Entrées du cache de code')
+
+
+def _snap(value, grid: float) -> Optional[float]:
+    try:
+        return round(float(value) / grid) * grid
+    except (TypeError, ValueError):
+        return None
+
+
+def _snap_position(position, grid: float) -> Optional[list]:
+    """Position {x, y, z} ou [x, y, z] arrondie à la grille"""
+    if isinstance(position, dict):
+        position = [position.get(axis) for axis in ('x', 'y', 'z')]
+    if not isinstance(position, (list, tuple)):
+        return None
+    return [_snap(value, grid) for value in position]
+
+
+def scene_fingerprint(scene_context: Optional[Dict], grid: float = SCENE_GRID) -> str:
+    """Empreinte du contexte de scène, limitée aux champs lus par les générateurs"""
+    if not scene_context or not scene_context.get('total_objects'):
+        return 'empty'
+
+    bounds = scene_context.get('bounds') or {}
+    objects = [obj for obj in (scene_context.get('objects') or []) if isinstance(obj, dict)]
+    quantized = {
+        'total_objects': scene_context.get('total_objects'),
+        # Les prompts ne citent que les premiers objets
+        'objects': [obj.get('name') for obj in objects[:5]],
+        # Type et position des 3 premiers objets: écrits dans le prompt de CodeLlama
+        'placed': [
+            [obj.get('type'), _snap_position(obj.get('position'), grid)] for obj in objects[:3]
+        ],
+        'flags': sorted(key for key, value in scene_context.items() if key.startswith('has_') and value),
+        'bounds': {
+            corner: [_snap((bounds.get(corner) or {}).get(axis), grid) for axis in ('x', 'y', 'z')]
+            for corner in ('min', 'max')
+        } if bounds else None
+    }
+    payload = json.dumps(quantized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def code_cache_key(prompt: str, object_type: str, generator: str, scene_context: Optional[Dict] = None) -> str:
+    """Clé de cache: prompt normalisé + type + générateur/méthode + empreinte de scène"""
+    payload = json.dumps([CODE_CACHE_VERSION, normalize_prompt(prompt), str(object_type), generator,
+                          scene_fingerprint(scene_context)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def code_cache_scope(prompt: str, object_type: str, generator: str, scene_context: Optional[Dict] = None) -> str:
+    """Scope sémantique: tout ce que le voisin doit partager exactement avec le prompt"""
+    return '|'.join([str(CODE_CACHE_VERSION), str(object_type), generator,
+                     scene_fingerprint(scene_context), prompt_numbers(prompt)])
+
+
+class CodeCache:
+    """Cache disque LRU du code généré, borné en octets et en entrées"""
+
+    def __init__(self, cache_dir, max_bytes: int = CODE_CACHE_MAX_BYTES,
+                 max_entries: int = CODE_CACHE_MAX_ENTRIES, semantic: Optional[SemanticIndex] = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self._semantic_loaded = False
+        self._lock = threading.Lock()
+        # clé → taille, du moins au plus récemment servi (chargé depuis le disque au premier usage)
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self.stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0,
+                      'fallbacks': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            files = []
+            if self.cache_dir.exists():
+                for path in self.cache_dir.glob('*.json'):
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, path.stem, stat.st_size))
+            self._index = OrderedDict((key, size) for _, key, size in sorted(files))
+            self._bytes = sum(self._index.values())
+            self._publish()
+        return self._index
+
+    def _publish(self):
+        CODE_CACHE_BYTES.set(self._bytes)
+        CODE_CACHE_ENTRIES.set(len(self._index))
+
+    # ---------------------------------------------
+    # Lecture / écriture
+    # ---------------------------------------------
+
+    def _read(self, key: str) -> Optional[Dict]:
+        """Entrée de `key` marquée comme servie, ou None (verrou tenu)"""
+        index = self._load_index()
+        if key not in index:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text())
+            os.utime(path)  # dernier usage
+        except (OSError, ValueError):
+            self._drop(key)
+            return None
+        index.move_to_end(key)
+        return entry
+
+    def get(self, key: str, generator: str = 'unknown') -> Optional[Dict]:
+        """Résultat mis en cache pour `key`, ou None"""
+        with self._lock:
+            entry = self._read(key)
+            self.stats['hits' if entry is not None else 'misses'] += 1
+        CODE_CACHE_TOTAL.inc(generator=generator, outcome='hit' if entry is not None else 'miss')
+        return entry['result'] if entry is not None else None
+
+    def get_similar(self, prompt: str, scope: str, generator: str = 'unknown') -> Optional[Dict]:
+        """Résultat d'un prompt quasi identique du même scope (index sémantique), ou None"""
+        if self.semantic is None:
+            return None
+        self._load_semantic()
+        match = self.semantic.search('code', scope, prompt)
+        if match is None:
+            return None
+        with self._lock:
+            entry = self._read(match['key'])
+            if entry is not None:
+                self.stats['semantic_hits'] += 1
+        if entry is None:
+            # Entrée évincée depuis son indexation
+            self.semantic.discard('code', match['key'])
+            return None
+        CODE_CACHE_TOTAL.inc(generator=generator, outcome='semantic_hit')
+        print(f"🧭 [CODE CACHE] '{prompt}' servi par '{match['prompt']}' (similarité {match['similarity']})")
+        return dict(entry['result'], semantic_match={'prompt': match['prompt'], 'similarity': match['similarity']})
+
+    def _load_semantic(self):
+        """Indexe les prompts des entrées déjà sur disque (une fois par process)"""
+        if self._semantic_loaded:
+            return
+        with self._lock:
+            if self._semantic_loaded:
+                return
+            self._semantic_loaded = True
+            keys = list(self._load_index())
+        items = []
+        for key in keys:
+            try:
+                entry = json.loads(self._path(key).read_text())
+            except (OSError, ValueError):
+                continue
+            if entry.get('prompt') and entry.get('scope'):
+                items.append((entry['scope'], entry['prompt'], key))
+        if items:
+            if not self.semantic.add_many('code', items):
+                # Encodeur indisponible pour l'instant (ex: CLIP pas encore chargé): nouvel essai plus tard
+                self._semantic_loaded = False
+                return
+            print(f"🧭 [CODE CACHE] Index sémantique: {len(items)} prompt(s) indexé(s)")
+
+    def put(self, key: str, result: Dict, generator: str = 'unknown', **metadata):
+        """Écrit le résultat (écriture atomique) puis évince au-delà des bornes"""
+        payload = json.dumps({
+            'key': key,
+            'generator': generator,
+            'created_at': time.time(),
+            **metadata,
+            'result': result
+        }, ensure_ascii=False, default=str)
+        path = self._path(key)
+        with self._lock:
+            index = self._load_index()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.json.tmp')
+            tmp_path.write_text(payload)
+            os.replace(tmp_path, path)
+
+            self._bytes += path.stat().st_size - index.get(key, 0)
+            index[key] = path.stat().st_size
+            index.move_to_end(key)
+            self.stats['stores'] += 1
+            evicted = self._evict()
+            self._publish()
+        CODE_CACHE_TOTAL.inc(generator=generator, outcome='store')
+        if evicted:
+            CODE_CACHE_TOTAL.inc(evicted, generator=generator, outcome='eviction')
+
+    def get_or_generate(self, key: str, generate: Callable[[], Dict], generator: str = 'unknown',
+                        regenerate: bool = False, prompt: Optional[str] = None,
+                        scope: Optional[str] = None) -> Tuple[Dict, bool]:
+        """
+        Retourne (résultat, servi_par_le_cache). Seuls les résultats réussis
+        avec du vrai code de modèle sont stockés (pas les 'fallback'); regenerate=True ignore l'entrée existante
+        et la remplace. Avec `prompt` et `scope`, un échec de la clé exacte
+        passe par l'index sémantique
+        """
+        semantic = self.semantic is not None and prompt is not None and scope is not None
+        if regenerate:
+            with self._lock:
+                self.stats['bypassed'] += 1
+            CODE_CACHE_TOTAL.inc(generator=generator, outcome='bypass')
+        else:
+            cached = self.get(key, generator)
+            if cached is None and semantic:
+                cached = self.get_similar(prompt, scope, generator)
+            if cached is not None:
+                return cached, True
+
+        result = generate()
+        if isinstance(result, dict) and result.get('fallback'):
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            CODE_CACHE_TOTAL.inc(generator=generator, outcome='fallback')
+        elif isinstance(result, dict) and result.get('success') and result.get('code'):
+            try:
+                self.put(key, result, generator, prompt=prompt, scope=scope)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"⚠️ [CODE CACHE] Écriture impossible: {e}")
+            else:
+                if semantic:
+                    self._load_semantic()
+                    self.semantic.add('code', scope, prompt, key)
+        return result, False
+
+    def generate(self, prompt: str, object_type: str, generator: str, generate: Callable[[], Dict],
+                 scene_context: Optional[Dict] = None, regenerate: bool = False) -> Tuple[Dict, bool]:
+        """get_or_generate avec la clé exacte et le scope sémantique calculés depuis la demande"""
+        return self.get_or_generate(
+            code_cache_key(prompt, object_type, generator, scene_context), generate, generator, regenerate,
+            prompt=prompt, scope=code_cache_scope(prompt, object_type, generator, scene_context)
+        )
+
+    # ---------------------------------------------
+    # Éviction / invalidation
+    # ---------------------------------------------
+
+    def _drop(self, key: str):
+        self._bytes -= self._index.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
+        if self.semantic is not None:
+            self.semantic.discard('code', key, stale=False)
+
+    def _evict(self) -> int:
+        """Supprime les entrées les moins récemment servies au-delà des bornes (verrou tenu)"""
+        evicted = 0
+        while len(self._index) > 1 and (self._bytes > self.max_bytes or len(self._index) > self.max_entries):
+            self._drop(next(iter(self._index)))
+            evicted += 1
+        self.stats['evictions'] += evicted
+        return evicted
+
+    def use_encoder(self, encoder):
+        """Change l'encodeur de l'index sémantique (réindexé depuis le disque au prochain usage)"""
+        if self.semantic is None:
+            return
+        self.semantic.set_encoder(encoder)
+        self._semantic_loaded = False
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Supprime une entrée (ou tout le cache si key est None), retourne le nombre supprimé"""
+        with self._lock:
+            index = self._load_index()
+            keys = [key] if key is not None else list(index)
+            removed = 0
+            for k in keys:
+                if k in index:
+                    removed += 1
+                self._drop(k)
+            self.stats['invalidations'] += removed
+            self._publish()
+        return removed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            index = self._load_index()
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(index),
+                'size_mb': round(self._bytes / MB, 2),
+                'max_mb': round(self.max_bytes / MB, 2),
+                'max_entries': self.max_entries,
+                'hit_rate': round((self.stats['hits'] + self.stats['semantic_hits']) / lookups, 3) if lookups else None,
+                'cache_dir': str(self.cache_dir),
+                'semantic': self.semantic.get_stats() if self.semantic is not None else None
+            }
+
+
+def _semantic_index() -> Optional[SemanticIndex]:
+    """Index des quasi-doublons, sauf en "auto" avec le seul hashing (il ne comprend pas les mots)"""
+    if SEMANTIC_CACHE in ('0', 'false', 'no'):
+        return None
+    index = SemanticIndex()
+    # clip: l'encodeur est branché par kibali_api une fois l'analyseur d'images créé
+    if SEMANTIC_CACHE == 'auto' and index.encoder.name == 'hashing' and SEMANTIC_ENCODER != 'clip':
+        print("ℹ️ [CODE CACHE] Quasi-doublons désactivés (encodeur hashing, KIBALI_SEMANTIC_CACHE=1 pour forcer)")
+        return None
+    return index
+
+
+# Cache partagé par les endpoints du process
+code_cache = CodeCache(CODE_CACHE_DIR, semantic=_semantic_index())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+⏳ KIBALI DEADLINE - Échéance de requête propagée de service en service
+========================================================================
+Une requête utilisateur (/api/orchestrate, /api/agent-execute) reçoit une
+échéance unique. Elle suit l'executor et chaque appel d'outil, puis part
+vers les services en aval dans l'en-tête X-Kibali-Deadline-Ms (budget
+restant en millisecondes, relatif pour ne pas dépendre des horloges).
+
+- kibali_http: timeout de chaque appel = min(timeout de l'appel, budget
+  restant); DeadlineExceeded immédiat si le budget est épuisé
+- install_deadline(app): chaque service Flask lit l'en-tête, refuse (504)
+  une requête déjà expirée et expose l'échéance à ses propres appels
+- l'executor saute ou dégrade les étapes qui ne tiennent plus dans le
+  budget restant au lieu d'attendre leur timeout
+
+Usage:
+    deadline = request_deadline(data)
+    with deadline_scope(deadline):
+        ...  # http_client.post(...) respecte l'échéance
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import requests
+
+DEADLINE_HEADER = 'X-Kibali-Deadline-Ms'
+DEFAULT_REQUEST_DEADLINE = float(os.environ.get('KIBALI_REQUEST_DEADLINE', '120'))
+MAX_REQUEST_DEADLINE = float(os.environ.get('KIBALI_MAX_REQUEST_DEADLINE', '600'))
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Budget de la requête épuisé avant (ou pendant) l'appel"""
+
+
+class Deadline:
+    """Échéance absolue (horloge monotone du process)"""
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> 'Deadline':
+        return cls(time.monotonic() + max(float(seconds), 0.0))
+
+    @classmethod
+    def from_header(cls, value) -> Optional['Deadline']:
+        """Échéance transmise par l'appelant (None si absente ou invalide)"""
+        try:
+            return cls.after(float(value) / 1000)
+        except (TypeError, ValueError):
+            return None
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, timeout=None):
+        """Timeout effectif d'un appel: le plus court du timeout demandé et du budget restant"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Échéance de la requête dépassée")
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def header(self) -> Dict[str, str]:
+        return {DEADLINE_HEADER: str(int(self.remaining() * 1000))}
+
+    def earliest(self, other: Optional['Deadline']) -> 'Deadline':
+        return self if other is None or self.expires_at <= other.expires_at else other
+
+    def to_dict(self) -> Dict:
+        return {'remaining_ms': int(self.remaining() * 1000)}
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar('kibali_deadline', default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Échéance de la requête en cours (None hors requête ou sans échéance)"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Rend `deadline` visible aux appels HTTP faits dans ce bloc (même thread/contexte)"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def request_deadline(data: Optional[Dict] = None, default: float = DEFAULT_REQUEST_DEADLINE) -> Deadline:
+    """
+    Échéance d'une requête entrante: 'deadline_ms' du body (borné à
+    MAX_REQUEST_DEADLINE) ou `default`, jamais au-delà de l'échéance reçue
+    en en-tête
+    """
+    seconds = default
+    if data and data.get('deadline_ms') is not None:
+        try:
+            seconds = min(float(data['deadline_ms']) / 1000, MAX_REQUEST_DEADLINE)
+        except (TypeError, ValueError):
+            pass
+    return Deadline.after(seconds).earliest(current_deadline())
+
+
+def install_deadline(app):
+    """Middleware Flask: lit X-Kibali-Deadline-Ms, 504 si déjà expirée, l'expose via current_deadline()"""
+    from flask import g, jsonify, request
+
+    @app.before_request
+    def _deadline_before():
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+        if deadline is None:
+            return None
+        if deadline.expired():
+            return jsonify({'success': False, 'error': 'Échéance dépassée avant traitement'}), 504
+        g._deadline_token = _current.set(deadline)
+        return None
+
+    @app.teardown_request
+    def _deadline_teardown(exc):
+        token = g.pop('_deadline_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    return app
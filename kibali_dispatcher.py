@@ -16,6 +16,9 @@ EXEMPLES DE COMPRÉHENSION:
 import re
 from typing import Dict, List, Tuple, Optional
 
+from kibali_matcher import KeywordMatcher
+from kibali_plan_cache import PlanCache, plan_key, tables_fingerprint
+
 # Import de l'orchestrateur
 try:
     from kibali_orchestrator import orchestrate_prompt
@@ -24,12 +27,149 @@ except ImportError:
     ORCHESTRATOR_AVAILABLE = False
     print("⚠️ Orchestrator non disponible - mode simple")
 
+# Indicateurs de complexité: tuple = tous les mots-clés requis
+COMPLEXITY_INDICATORS = [
+    # Création + Animation
+    ('créé', 'court'),
+    ('créé', 'saute'),
+    ('personnage', 'mouvement'),
+    ('personnage', 'animation'),
+    
+    # Création + Caméra
+    ('créé', '360'),
+    ('créé', 'orbite'),
+    ('créé', 'film'),
+    
+    # Multi-objets
+    ('plusieurs', 'objet'),
+    ('scene', 'complet'),
+    ('environnement', 'avec'),
+    
+    # Mots-clés complexité
+    'qui court', 'qui saute', 'qui marche',
+    'avec animation', 'et anime',
+    'vue 360', 'caméra tourne',
+    'personnage', 'character',
+    'scène complète'
+]
+
+# Actions simples, dans l'ordre d'évaluation
+SIMPLE_ACTIONS = [
+    ('camera_orbit', ['orbite', '360', 'tourne autour']),
+    ('camera_zoom', ['zoom']),
+    ('remove_objects', ['retire', 'supprime', 'enlève', 'remove']),
+    ('clear_scene', ['vide', 'clear', 'reset']),
+]
+
+# Commandes caméra: mot-clé → (direction, outil)
+CAMERA_DIRECTIONS = {
+    'avance': ('forward', 'CameraMove'),
+    'recule': ('backward', 'CameraMove'),
+    'gauche': ('left', 'CameraMove'),
+    'droite': ('right', 'CameraMove'),
+    'monte': ('up', 'CameraMove'),
+    'descend': ('down', 'CameraMove'),
+}
+
+CAMERA_ROTATION_KEYWORDS = ['rotation', 'tourne de']
+
+CAMERA_PRESETS = {
+    'face': 'front',
+    'front': 'front',
+    'dos': 'back',
+    'back': 'back',
+    'haut': 'top',
+    'top': 'top',
+    'isométrique': 'iso',
+    'iso': 'iso'
+}
+
+TEXTURE_KEYWORDS = {
+    'bois': 'wood',
+    'wood': 'wood',
+    'métal': 'metal',
+    'metal': 'metal',
+    'pierre': 'stone',
+    'stone': 'stone',
+    'marbre': 'marble',
+    'marble': 'marble',
+    'béton': 'concrete',
+    'concrete': 'concrete',
+    'herbe': 'grass',
+    'grass': 'grass',
+    'tissu': 'fabric',
+    'fabric': 'fabric',
+    'verre': 'glass',
+    'glass': 'glass'
+}
+
+# Squelettes de plans par forme de prompt (voir kibali_plan_cache)
+PLAN_CACHE = PlanCache('dispatcher', max_entries=512)
+
 class KibaliDispatcher:
     """Dispatcher intelligent qui ORCHESTRE les 48 outils"""
     
+    # Automates compilés une fois par process, recompilés si les tables changent
+    _matchers = None
+    _numeric_keywords = frozenset()
+    
     def __init__(self):
         self.use_orchestrator = ORCHESTRATOR_AVAILABLE
+        self.patterns = self._init_patterns()
+        self.plan_cache = PLAN_CACHE
+        self.refresh_tables()
         print(f"🧠 Dispatcher initialisé - Orchestrator: {self.use_orchestrator}")
+    
+    def refresh_tables(self):
+        """Recompile les automates et invalide le cache de plans si une table a changé"""
+        fingerprint = tables_fingerprint(
+            self.patterns, COMPLEXITY_INDICATORS, SIMPLE_ACTIONS, CAMERA_DIRECTIONS,
+            CAMERA_ROTATION_KEYWORDS, CAMERA_PRESETS, TEXTURE_KEYWORDS
+        )
+        if KibaliDispatcher._matchers is None or fingerprint != self.plan_cache.version:
+            KibaliDispatcher._matchers = self._compile_matchers()
+            # Nombres à garder tels quels dans la clé de cache (ex: '360')
+            KibaliDispatcher._numeric_keywords = frozenset(
+                digits for p in self.patterns for kw in p['keywords'] for digits in re.findall(r'\d+', kw)
+            )
+            self.plan_cache.ensure_version(fingerprint)
+        self.matchers = KibaliDispatcher._matchers
+    
+    def _compile_matchers(self) -> Dict[str, KeywordMatcher]:
+        """Compile toutes les tables de mots-clés en automates Aho-Corasick (sans accents)"""
+        patterns = KeywordMatcher(fold=True)
+        for pattern in self.patterns:
+            patterns.add_rule(pattern['action'], pattern['keywords'], pattern['priority'], data=pattern)
+        
+        complexity = KeywordMatcher(fold=True)
+        for indicator in COMPLEXITY_INDICATORS:
+            keywords = indicator if isinstance(indicator, tuple) else (indicator,)
+            complexity.add_rule(' + '.join(keywords), keywords, require_all=True)
+        
+        # Ordre d'évaluation = priorité décroissante
+        simple = KeywordMatcher(fold=True)
+        for rank, (action, keywords) in enumerate(SIMPLE_ACTIONS):
+            simple.add_rule(action, keywords, priority=len(SIMPLE_ACTIONS) - rank)
+        
+        # Caméra: l'ordre d'ajout reproduit l'ordre des actions générées
+        camera = KeywordMatcher(fold=True)
+        for keyword, (direction, tool) in CAMERA_DIRECTIONS.items():
+            camera.add_rule('direction', [keyword], data=(direction, tool))
+        camera.add_rule('rotation', CAMERA_ROTATION_KEYWORDS)
+        for keyword, preset in CAMERA_PRESETS.items():
+            camera.add_rule('preset', [keyword], data=preset)
+        
+        texture = KeywordMatcher(fold=True)
+        for keyword, texture_type in TEXTURE_KEYWORDS.items():
+            texture.add_rule(texture_type, [keyword])
+        
+        return {
+            'patterns': patterns.compile(),
+            'complexity': complexity.compile(),
+            'simple': simple.compile(),
+            'camera': camera.compile(),
+            'texture': texture.compile()
+        }
         
     def dispatch(self, prompt: str) -> Dict:
         """
@@ -55,53 +195,18 @@ class KibaliDispatcher:
     
     def _is_complex_request(self, prompt: str) -> bool:
         """Détecte si la demande nécessite orchestration"""
-        prompt_lower = prompt.lower()
-        
-        # Indicateurs de complexité
-        complexity_indicators = [
-            # Création + Animation
-            ('créé', 'court'),
-            ('créé', 'saute'),
-            ('personnage', 'mouvement'),
-            ('personnage', 'animation'),
-            
-            # Création + Caméra
-            ('créé', '360'),
-            ('créé', 'orbite'),
-            ('créé', 'film'),
-            
-            # Multi-objets
-            ('plusieurs', 'objet'),
-            ('scene', 'complet'),
-            ('environnement', 'avec'),
-            
-            # Mots-clés complexité
-            'qui court', 'qui saute', 'qui marche',
-            'avec animation', 'et anime',
-            'vue 360', 'caméra tourne',
-            'personnage', 'character',
-            'scène complète'
-        ]
-        
-        # Vérifie indicateurs
-        for indicator in complexity_indicators:
-            if isinstance(indicator, tuple):
-                if all(kw in prompt_lower for kw in indicator):
-                    return True
-            else:
-                if indicator in prompt_lower:
-                    return True
-        
-        return False
+        return self.matchers['complexity'].matches_any(prompt.lower())
     
     def _simple_dispatch(self, prompt: str) -> Dict:
         """Pattern matching simple pour actions simples"""
         prompt_lower = prompt.lower()
         
-        # ACTIONS SIMPLES
+        # ACTIONS SIMPLES (un seul passage sur le prompt)
+        match = self.matchers['simple'].first(prompt_lower)
+        action = match.name if match else None
         
         # Caméra orbite
-        if any(kw in prompt_lower for kw in ['orbite', '360', 'tourne autour']):
+        if action == 'camera_orbit':
             return {
                 'type': 'simple',
                 'action': 'camera_orbit',
@@ -109,7 +214,7 @@ class KibaliDispatcher:
             }
         
         # Caméra zoom
-        if 'zoom' in prompt_lower:
+        if action == 'camera_zoom':
             factor = 2.0 if 'avant' in prompt_lower or 'in' in prompt_lower else 0.5
             return {
                 'type': 'simple',
@@ -118,7 +223,7 @@ class KibaliDispatcher:
             }
         
         # Suppression
-        if any(kw in prompt_lower for kw in ['retire', 'supprime', 'enlève', 'remove']):
+        if action == 'remove_objects':
             # Extrait le nombre
             import re
             numbers = re.findall(r'\d+', prompt)
@@ -130,7 +235,7 @@ class KibaliDispatcher:
             }
         
         # Clear scene
-        if any(kw in prompt_lower for kw in ['vide', 'clear', 'reset']):
+        if action == 'clear_scene':
             return {
                 'type': 'simple',
                 'action': 'clear_scene',
@@ -236,6 +341,9 @@ class KibaliDispatcher:
         """
         Analyse le prompt et retourne une stratégie d'exécution
         
+        La reconnaissance des mots-clés est mise en cache par forme de prompt
+        (plan_key); seuls les nombres et le prompt sont réinjectés à chaque appel.
+        
         Returns:
             {
                 'primary_action': str,
@@ -244,27 +352,36 @@ class KibaliDispatcher:
                 'complexity': int
             }
         """
-        prompt_lower = prompt.lower()
+        key = plan_key(prompt, self._numeric_keywords)
+        skeleton = self.plan_cache.get_or_compute(key, lambda: self._analyze_skeleton(key))
         
-        # Détecte les nombres
-        numbers = self._extract_numbers(prompt)
-        
-        # Trouve les patterns correspondants
-        matched_patterns = []
-        for pattern in self.patterns:
-            if any(kw in prompt_lower for kw in pattern['keywords']):
-                matched_patterns.append(pattern)
-        
-        # Trie par priorité
-        matched_patterns.sort(key=lambda x: x['priority'], reverse=True)
-        
-        if not matched_patterns:
+        if skeleton is None:
             return self._generic_create(prompt)
         
-        # Pattern principal
-        main_pattern = matched_patterns[0]
+        return self._build_plan(skeleton, prompt, self._extract_numbers(prompt))
+    
+    def _analyze_skeleton(self, key: str) -> Optional[Dict]:
+        """Partie du plan qui ne dépend que de la clé (pattern, commandes, texture)"""
+        # Trouve les patterns correspondants, triés par priorité (un seul passage)
+        matches = self.matchers['patterns'].match(key)
+        if not matches:
+            return None
+        
+        main_pattern = matches[0].data
+        skeleton = {'pattern': main_pattern}
+        
+        if main_pattern['action'] == 'apply_texture':
+            skeleton['texture'] = self._extract_texture_query(key)
+        elif main_pattern['action'] == 'camera_zoom':
+            skeleton['zoom_in'] = 'avant' in key or 'in' in key
+        elif main_pattern['action'] == 'camera_control':
+            skeleton['camera'] = self._camera_commands(key)
         
-        # Construit le plan d'action
+        return skeleton
+    
+    def _build_plan(self, skeleton: Dict, prompt: str, numbers: List[int]) -> Dict:
+        """Construit le plan d'action à partir du squelette, des nombres et du prompt"""
+        main_pattern = skeleton['pattern']
         actions = []
         
         if main_pattern['action'] == 'procedural_generate':
@@ -279,10 +396,9 @@ class KibaliDispatcher:
             })
         
         elif main_pattern['action'] == 'apply_texture':
-            texture_query = self._extract_texture_query(prompt)
             actions.append({
                 'tool': 'TextureGenerate',
-                'params': {'style': texture_query}
+                'params': {'style': skeleton['texture']}
             })
         
         elif main_pattern['action'] == 'camera_orbit':
@@ -293,14 +409,14 @@ class KibaliDispatcher:
             })
         
         elif main_pattern['action'] == 'camera_zoom':
-            factor = 2.0 if 'avant' in prompt_lower or 'in' in prompt_lower else 0.5
+            factor = 2.0 if skeleton['zoom_in'] else 0.5
             actions.append({
                 'tool': 'CameraZoom',
                 'params': {'factor': factor, 'duration': 1}
             })
         
         elif main_pattern['action'] == 'camera_control':
-            actions.extend(self._parse_camera_commands(prompt, prompt_lower, numbers))
+            actions.extend(self._parse_camera_commands(skeleton['camera'], numbers))
         
         elif main_pattern['action'] == 'remove_objects':
             count = numbers[0] if numbers else 1
@@ -315,8 +431,8 @@ class KibaliDispatcher:
                 'params': {}
             })
         
-        # Gère la multiplicité
-        if main_pattern.get('action') == 'multiple' or numbers and numbers[0] > 1:
+        # Gère la multiplicité (un pattern sans action propre n'a rien à multiplier)
+        if actions and (main_pattern.get('action') == 'multiple' or numbers and numbers[0] > 1):
             count = numbers[0] if numbers else 3
             actions[0]['params']['count'] = count
         
@@ -337,79 +453,39 @@ class KibaliDispatcher:
     
     def _extract_texture_query(self, prompt: str) -> str:
         """Extrait le type de texture demandé"""
-        texture_keywords = {
-            'bois': 'wood',
-            'wood': 'wood',
-            'métal': 'metal',
-            'metal': 'metal',
-            'pierre': 'stone',
-            'stone': 'stone',
-            'marbre': 'marble',
-            'marble': 'marble',
-            'béton': 'concrete',
-            'concrete': 'concrete',
-            'herbe': 'grass',
-            'grass': 'grass',
-            'tissu': 'fabric',
-            'fabric': 'fabric',
-            'verre': 'glass',
-            'glass': 'glass'
-        }
-        
-        prompt_lower = prompt.lower()
-        for keyword, texture_type in texture_keywords.items():
-            if keyword in prompt_lower:
-                return texture_type
-        
-        return 'default'
+        # Premier mot-clé de TEXTURE_KEYWORDS présent (ordre de la table)
+        matches = self.matchers['texture'].match(prompt)
+        return min(matches, key=lambda m: m.order).name if matches else 'default'
+    
+    def _camera_commands(self, prompt: str) -> List[Tuple[str, object]]:
+        """Commandes caméra reconnues: directions, rotation puis presets, dans l'ordre des tables"""
+        matches = sorted(self.matchers['camera'].match(prompt), key=lambda m: m.order)
+        return [(match.name, match.data) for match in matches]
     
-    def _parse_camera_commands(self, prompt: str, prompt_lower: str, numbers: List[int]) -> List[Dict]:
+    def _parse_camera_commands(self, commands: List[Tuple[str, object]], numbers: List[int]) -> List[Dict]:
         """Parse les commandes de caméra complexes"""
         actions = []
         
-        # Directions
-        directions = {
-            'avance': ('forward', 'CameraMove'),
-            'recule': ('backward', 'CameraMove'),
-            'gauche': ('left', 'CameraMove'),
-            'droite': ('right', 'CameraMove'),
-            'monte': ('up', 'CameraMove'),
-            'descend': ('down', 'CameraMove'),
-        }
-        
-        for keyword, (direction, tool) in directions.items():
-            if keyword in prompt_lower:
+        for name, data in commands:
+            if name == 'direction':
+                direction, tool = data
                 distance = numbers[0] if numbers else 2
                 actions.append({
                     'tool': tool,
                     'params': {'direction': direction, 'distance': distance, 'duration': 1}
                 })
-        
-        # Rotations
-        if 'rotation' in prompt_lower or 'tourne de' in prompt_lower:
-            degrees = numbers[0] if numbers else 90
-            actions.append({
-                'tool': 'CameraRotate',
-                'params': {'axis': 'y', 'degrees': degrees, 'duration': 1}
-            })
-        
-        # Presets
-        presets = {
-            'face': 'front',
-            'front': 'front',
-            'dos': 'back',
-            'back': 'back',
-            'haut': 'top',
-            'top': 'top',
-            'isométrique': 'iso',
-            'iso': 'iso'
-        }
-        
-        for keyword, preset in presets.items():
-            if keyword in prompt_lower:
+            
+            elif name == 'rotation':
+                degrees = numbers[0] if numbers else 90
+                actions.append({
+                    'tool': 'CameraRotate',
+                    'params': {'axis': 'y', 'degrees': degrees, 'duration': 1}
+                })
+            
+            elif name == 'preset':
                 actions.append({
                     'tool': 'CameraPreset',
-                    'params': {'preset': preset}
+                    'params': {'preset': data}
                 })
         
         return actions
@@ -500,6 +576,9 @@ class KibaliDispatcher:
 # FONCTION PRINCIPALE POUR KIBALI API
 # ============================================
 
+# Instance partagée (les tables et le cache de plans sont par process)
+_shared_dispatcher: Optional[KibaliDispatcher] = None
+
 def dispatch_and_execute(prompt: str) -> Dict:
     """
     Point d'entrée unique: analyse et exécute le prompt
@@ -512,7 +591,10 @@ def dispatch_and_execute(prompt: str) -> Dict:
             'frontend_actions': List[Dict]  # Actions à exécuter côté frontend
         }
     """
-    dispatcher = KibaliDispatcher()
+    global _shared_dispatcher
+    if _shared_dispatcher is None:
+        _shared_dispatcher = KibaliDispatcher()
+    dispatcher = _shared_dispatcher
     
     # Analyse
     plan = dispatcher.analyze(prompt)
@@ -4,21 +4,69 @@
 ======================================================
 Execute le plan d'orchestration en appelant les vrais outils
 Affiche les logs en temps réel pour voir le processus
+
+Les étapes forment un graphe (step['depends_on']): chaque étape démarre dès
+que ses dépendances sont terminées, les étapes indépendantes s'exécutent en
+parallèle. Un plan de 5 étapes coûte son chemin critique, pas la somme.
+
+Suivi en direct: un `listener` reçoit les événements d'exécution au fil de
+l'eau (plan_start, step_start, step_finish, step_error, step_skipped,
+plan_finish) avec horodatage et durées; /api/orchestrate/stream les relaie
+en SSE. Le journal texte est borné (KIBALI_EXECUTOR_MAX_LOGS).
+
+Échéance: avec une `deadline` (kibali_deadline), chaque appel d'outil est
+borné par le budget restant et l'étape qui ne tient plus dans ce budget
+(estimated_time) est dégradée (qualité 'low') ou sautée avant l'appel.
 """
 
+import os
 import time
 import asyncio
+import threading
 import requests
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Coroutine, Any
+from collections import deque
 from datetime import datetime
+from concurrent.futures import Future
 from kibali_orchestrator import orchestrate_prompt
+from kibali_http import http_client
+from kibali_breakers import BackendUnavailable
+from kibali_deadline import Deadline, DeadlineExceeded
+from kibali_latency import latency_model
+
+# Lignes de journal conservées par exécution (les plus récentes)
+MAX_LOGS = int(os.environ.get('KIBALI_EXECUTOR_MAX_LOGS', '500'))
+
+# Une étape dégradée (qualité 'low') doit tenir dans au moins cette part de son estimation
+DEGRADED_TIME_RATIO = 0.5
+DEGRADABLE_QUALITIES = ('medium', 'high')
 
 class KibaliExecutor:
     """Exécute le plan d'orchestration en temps réel"""
     
-    def __init__(self, api_base_url: str = "http://localhost:11000"):
+    def __init__(self, api_base_url: str = "http://localhost:11000",
+                 listener: Optional[Callable[[Dict], None]] = None, max_logs: int = MAX_LOGS,
+                 deadline: Optional[Deadline] = None):
         self.api_base = api_base_url
-        self.execution_logs = []
+        self.listener = listener
+        self.deadline = deadline
+        self.execution_logs = deque(maxlen=max_logs)
+        self._started = time.time()
+    
+    def emit(self, event: str, **data):
+        """Transmet un événement d'exécution au listener (sans jamais bloquer l'exécution)"""
+        if self.listener is None:
+            return
+        payload = {
+            'event': event,
+            'timestamp': datetime.now().strftime("%H:%M:%S.%f")[:-3],
+            'elapsed': round(time.time() - self._started, 3),
+            **data
+        }
+        try:
+            self.listener(payload)
+        except Exception as e:
+            print(f"⚠️ [EXECUTOR] Listener en erreur: {e}")
     
     def log(self, message: str, level: str = "INFO"):
         """Ajoute un log avec timestamp"""
@@ -83,6 +131,7 @@ class KibaliExecutor:
                 'CameraShake': '/api/camera-control',
                 'CameraPreset': '/api/camera-control',
                 'CameraStop': '/api/camera-control',
+                'CameraSequence': '/api/camera-batch',
                 
                 # MODIFICATION MESH - Three.js Backend pour rapidité
                 'RepairMesh': '/api/mesh/repair',
@@ -123,7 +172,9 @@ class KibaliExecutor:
             
             self.log(f"📡 Appel API: POST {endpoint}", "INFO")
             
-            response = requests.post(url, json=params, timeout=60)
+            # Client partagé: connexions keep-alive réutilisées entre étapes,
+            # appel bloquant exécuté hors de la boucle asyncio
+            response = await http_client.apost(url, json=params, timeout=60, deadline=self.deadline)
             duration = time.time() - start_time
             
             if response.status_code == 200:
@@ -144,6 +195,17 @@ class KibaliExecutor:
                     'duration': duration
                 }
         
+        except BackendUnavailable as e:
+            # Disjoncteur ouvert: échec immédiat au lieu d'attendre le timeout
+            duration = time.time() - start_time
+            self.log(f"⛔ {e}", "ERROR")
+            return {'success': False, 'error': str(e), 'backend_unavailable': True, 'duration': duration}
+        
+        except DeadlineExceeded as e:
+            duration = time.time() - start_time
+            self.log(f"⏳ {e} ({duration:.2f}s)", "ERROR")
+            return {'success': False, 'error': str(e), 'deadline_exceeded': True, 'duration': duration}
+        
         except requests.exceptions.Timeout:
             duration = time.time() - start_time
             self.log(f"⏱️  Timeout après {duration:.2f}s", "ERROR")
@@ -154,30 +216,130 @@ class KibaliExecutor:
             self.log(f"❌ Erreur: {str(e)}", "ERROR")
             return {'success': False, 'error': str(e), 'duration': duration}
     
+    def budget_decision(self, step: Dict) -> str:
+        """'run', 'degrade' ou 'skip' selon le budget restant et la durée estimée de l'étape"""
+        if self.deadline is None:
+            return 'run'
+        remaining = self.deadline.remaining()
+        estimated = step.get('estimated_time') or 0
+        if remaining <= 0:
+            return 'skip'
+        if remaining >= estimated:
+            return 'run'
+        quality = step.get('params', {}).get('quality')
+        if quality in DEGRADABLE_QUALITIES and remaining >= estimated * DEGRADED_TIME_RATIO:
+            return 'degrade'
+        return 'skip'
+    
+    @staticmethod
+    def step_dependencies(steps: List[Dict]) -> Dict[int, List[int]]:
+        """
+        Dépendances de chaque étape: step['depends_on'] si présent, sinon
+        l'étape précédente (exécution séquentielle des anciens plans).
+        Seules les étapes antérieures sont retenues (pas de cycle possible).
+        """
+        known = [step['step'] for step in steps]
+        dependencies = {}
+        for index, step in enumerate(steps):
+            if 'depends_on' in step:
+                earlier = set(known[:index])
+                dependencies[step['step']] = [dep for dep in step['depends_on'] if dep in earlier]
+            else:
+                dependencies[step['step']] = known[index - 1:index]
+        return dependencies
+    
     async def execute_plan(self, plan: Dict) -> Dict:
-        """Exécute le plan complet étape par étape"""
+        """Exécute le plan: chaque étape démarre dès que ses dépendances sont terminées"""
+        steps = plan['steps']
+        dependencies = self.step_dependencies(steps)
+        
         self.log("="*60, "INFO")
         self.log(f"🎬 DÉBUT DE L'EXÉCUTION", "INFO")
-        self.log(f"📊 {len(plan['steps'])} étapes à exécuter", "INFO")
+        self.log(f"📊 {len(steps)} étapes à exécuter", "INFO")
         self.log(f"⏱️  Temps estimé: {plan['estimated_time']}s", "INFO")
         self.log("="*60, "INFO")
         
-        results = []
-        total_duration = 0
+        start_time = self._started = time.time()
+        self.emit('plan_start', steps=len(steps), estimated_time=plan['estimated_time'],
+                  critical_path_time=plan.get('critical_path_time'),
+                  deadline_ms=self.deadline.to_dict()['remaining_ms'] if self.deadline else None)
+        if self.deadline is not None and (plan.get('critical_path_time') or 0) > self.deadline.remaining():
+            self.log(f"⏳ Chemin critique estimé ({plan.get('critical_path_time')}s) au-delà du budget "
+                     f"({self.deadline.remaining():.1f}s): étapes dégradées ou ignorées si nécessaire", "WARNING")
+        tasks: Dict[int, asyncio.Task] = {}
         
-        for step in plan['steps']:
-            self.log(f"\n{'='*60}", "INFO")
-            self.log(f"📍 ÉTAPE {step['step']}/{len(plan['steps'])}", "INFO")
-            self.log(f"{'='*60}", "INFO")
+        async def run_step(step: Dict) -> Dict:
+            deps = dependencies[step['step']]
+            if deps:
+                dep_results = await asyncio.gather(*(tasks[dep] for dep in deps))
+                failed = [dep for dep, result in zip(deps, dep_results) if not result['success']]
+                if failed:
+                    self.log(f"⏭️  ÉTAPE {step['step']} ({step['tool']}) ignorée: dépendance(s) {failed} en échec", "WARNING")
+                    self.emit('step_skipped', step=step['step'], tool=step['tool'], failed_dependencies=failed)
+                    return {
+                        'success': False,
+                        'step': step['step'],
+                        'tool': step['tool'],
+                        'error': f'Dépendances en échec: {failed}',
+                        'skipped': True,
+                        'duration': 0
+                    }
             
+            decision = self.budget_decision(step)
+            if decision == 'skip':
+                remaining = self.deadline.remaining()
+                self.log(f"⏭️  ÉTAPE {step['step']} ({step['tool']}) ignorée: {remaining:.1f}s restantes, "
+                         f"{step.get('estimated_time', 0)}s estimées", "WARNING")
+                self.emit('step_skipped', step=step['step'], tool=step['tool'], reason='deadline',
+                          remaining=round(remaining, 3), estimated_time=step.get('estimated_time'))
+                return {
+                    'success': False,
+                    'step': step['step'],
+                    'tool': step['tool'],
+                    'error': 'Budget de la requête insuffisant',
+                    'skipped': True,
+                    'deadline_exceeded': True,
+                    'duration': 0
+                }
+            if decision == 'degrade':
+                self.log(f"🔻 ÉTAPE {step['step']} ({step['tool']}) dégradée: qualité "
+                         f"{step['params']['quality']} → low pour tenir l'échéance", "WARNING")
+                step = dict(step, params=dict(step['params'], quality='low'))
+            
+            self.log(f"📍 ÉTAPE {step['step']}/{len(steps)}", "INFO")
+            self.emit('step_start', step=step['step'], tool=step['tool'], reason=step.get('reason'),
+                      depends_on=deps)
             result = await self.execute_tool_step(step)
-            results.append(result)
-            total_duration += result['duration']
+            result['step'] = step['step']
+            if decision == 'degrade':
+                result['degraded'] = True
+            result['started_at'] = round(time.time() - start_time - result['duration'], 3)
+            
+            # Durée mesurée → modèle de latence (un service coupé ne dit rien de sa latence)
+            if not (result.get('backend_unavailable') or result.get('deadline_exceeded') or decision == 'degrade'):
+                latency_model.record(step['tool'], result['duration'], result['success'],
+                                     estimated=step.get('estimated_time'))
             
-            # Pause entre les étapes
-            if step['step'] < len(plan['steps']):
-                self.log("⏸️  Pause 1s avant prochaine étape...", "INFO")
-                await asyncio.sleep(1)
+            if result['success']:
+                self.emit('step_finish', step=step['step'], tool=step['tool'], success=True,
+                          duration=round(result['duration'], 3), started_at=result['started_at'])
+            else:
+                self.emit('step_error', step=step['step'], tool=step['tool'], success=False,
+                          duration=round(result['duration'], 3), started_at=result['started_at'],
+                          error=result.get('error'), backend_unavailable=result.get('backend_unavailable', False))
+            return result
+        
+        # Toutes les tâches sont créées avant de céder la main: les dépendances existent toujours.
+        # Ordre de création = ordre de démarrage (chaînes les plus longues d'abord, cf. plan['schedule'])
+        by_number = {step['step']: step for step in steps}
+        schedule = [n for n in plan.get('schedule', []) if n in by_number]
+        schedule += [n for n in by_number if n not in schedule]
+        for number in schedule:
+            tasks[number] = asyncio.ensure_future(run_step(by_number[number]))
+        
+        results = list(await asyncio.gather(*(tasks[step['step']] for step in steps)))
+        wall_duration = time.time() - start_time
+        busy_duration = sum(r['duration'] for r in results)
         
         # Résumé final
         self.log("\n" + "="*60, "INFO")
@@ -186,31 +348,108 @@ class KibaliExecutor:
         
         success_count = sum(1 for r in results if r['success'])
         self.log(f"✅ Réussis: {success_count}/{len(results)}", "SUCCESS")
-        self.log(f"⏱️  Durée totale: {total_duration:.2f}s (estimé: {plan['estimated_time']}s)", "INFO")
+        self.log(f"⏱️  Durée totale: {wall_duration:.2f}s (cumul des étapes: {busy_duration:.2f}s, estimé: {plan['estimated_time']}s)", "INFO")
+        self.emit('plan_finish', success=success_count == len(results), succeeded=success_count,
+                  total=len(results), duration=round(wall_duration, 3), steps_duration=round(busy_duration, 3))
         
         return {
             'success': success_count == len(results),
             'results': results,
-            'duration': total_duration,
-            'logs': self.execution_logs
+            'duration': wall_duration,
+            'steps_duration': busy_duration,
+            'logs': list(self.execution_logs)
         }
 
 
+# ============================================
+# BOUCLE ASYNCIO PERSISTANTE
+# ============================================
+
+class ExecutorLoop:
+    """
+    Boucle asyncio longue durée dans un thread dédié
+    
+    Les handlers Flask (threads synchrones) y soumettent des coroutines et
+    attendent le Future: les exécutions concurrentes partagent une seule boucle
+    (et ses ressources) au lieu de créer/fermer une boucle par requête.
+    """
+    
+    def __init__(self, name: str = "kibali-executor-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+    
+    def start(self):
+        """Démarre le thread de la boucle (idempotent)"""
+        with self._lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            
+            self._ready.clear()
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+        
+        self._ready.wait()
+    
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        print(f"🔁 Boucle d'exécution démarrée ({self.name})")
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+    
+    def submit(self, coro: Coroutine) -> Future:
+        """Soumet une coroutine depuis n'importe quel thread (thread-safe)"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Soumet et attend le résultat (bloque le thread appelant, pas la boucle)"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+    
+    def stop(self):
+        """Arrête la boucle (les tâches en cours sont abandonnées)"""
+        with self._lock:
+            if self.loop is not None and self.thread is not None and self.thread.is_alive():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.thread.join(timeout=5)
+            self.thread = None
+
+
+# Boucle partagée par les handlers de kibali_api
+executor_loop = ExecutorLoop()
+
+
 # ============================================
 # FONCTION PRINCIPALE POUR API
 # ============================================
 
-async def process_prompt_full(prompt: str) -> Dict:
+async def process_prompt_full(prompt: str, listener: Optional[Callable[[Dict], None]] = None,
+                              deadline: Optional[Deadline] = None, speculation=None) -> Dict:
     """
     Point d'entrée complet:
-    1. Orchestration (création du plan)
-    2. Exécution (appels API en temps réel)
+    1. Orchestration (création du plan; la `speculation` lancée par
+       l'appelant est confirmée ou annulée par le plan)
+    2. Exécution (appels API en temps réel, événements transmis à `listener`,
+       bornée par `deadline`)
     """
     
     # Phase 1: Orchestration
     print("\n🎭 PHASE 1: ORCHESTRATION")
     print("="*60)
     orchestration = orchestrate_prompt(prompt)
+    if speculation is not None:
+        speculation.resolve(step['tool'] for step in orchestration['plan']['steps'])
     
     if not orchestration['understood']:
         return {
@@ -222,7 +461,8 @@ async def process_prompt_full(prompt: str) -> Dict:
     # Phase 2: Exécution
     print("\n⚡ PHASE 2: EXÉCUTION")
     print("="*60)
-    executor = KibaliExecutor()
+    executor = KibaliExecutor(listener=listener, deadline=deadline)
+    executor.emit('plan', plan=orchestration['plan'])
     execution = await executor.execute_plan(orchestration['plan'])
     
     return {
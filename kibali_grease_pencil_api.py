@@ -26,6 +26,15 @@ from triposr_client_hf import TripoSRClientHF
 app = Flask(__name__)
 CORS(app)
 
+# 📈 Métriques Prometheus (GET /metrics)
+from kibali_metrics import instrument_app, observe_inference
+from kibali_models import model_registry, causal_lm_key, cpu_quantization, load_causal_lm, sdxl_key
+instrument_app(app, 'grease-pencil')
+
+# ⏳ Échéance transmise par l'appelant (X-Kibali-Deadline-Ms)
+from kibali_deadline import install_deadline
+install_deadline(app)
+
 # Chemins vers les modèles
 MODELS_PATH = Path("/home/belikan/Isol/kibali-IA/kibali_data/models/huggingface_cache")
 
@@ -62,18 +71,27 @@ class GreasePencilAI:
             qwen_path = MODELS_PATH / "models--Qwen--Qwen2.5-Coder-1.5B"  # Nom correct!
             if qwen_path.exists():
                 print(f"   📁 Modèle trouvé: {qwen_path}")
-                self.code_tokenizer = AutoTokenizer.from_pretrained(
-                    str(qwen_path),
-                    local_files_only=True,
-                    trust_remote_code=True
-                )
-                self.code_generator = AutoModelForCausalLM.from_pretrained(
-                    str(qwen_path),
-                    local_files_only=True,
-                    trust_remote_code=True,
-                    torch_dtype=torch.float16,
-                    device_map="cpu"  # Fallback CPU car GPU non supporté
-                )
+                if cpu_quantization('qwen', "cpu"):
+                    # KIBALI_CPU_INT8=qwen: Linear int8 dynamiques au lieu du float16 CPU (lent)
+                    code_llm = model_registry.acquire(causal_lm_key(qwen_path, "cpu", 'int8'),
+                                                      lambda: load_causal_lm(qwen_path, "cpu", 'int8'))
+                else:
+                    code_llm = model_registry.acquire(f"causal-lm:{qwen_path}:cpu-float16", lambda: {
+                        'tokenizer': AutoTokenizer.from_pretrained(
+                            str(qwen_path),
+                            local_files_only=True,
+                            trust_remote_code=True
+                        ),
+                        'model': AutoModelForCausalLM.from_pretrained(
+                            str(qwen_path),
+                            local_files_only=True,
+                            trust_remote_code=True,
+                            torch_dtype=torch.float16,
+                            device_map="cpu"  # Fallback CPU car GPU non supporté
+                        )
+                    })
+                self.code_tokenizer = code_llm['tokenizer']
+                self.code_generator = code_llm['model']
                 print("   ✅ Qwen2.5-Coder chargé (génération code Three.js COMPLEXE)")
             else:
                 print(f"   ⚠️  Modèle non trouvé: {qwen_path}")
@@ -88,11 +106,12 @@ class GreasePencilAI:
             sdxl_path = MODELS_PATH / "models--stabilityai--stable-diffusion-xl-base-1.0"
             if sdxl_path.exists():
                 print(f"   📁 SDXL trouvé: {sdxl_path}")
-                self.image_generator = StableDiffusionXLPipeline.from_pretrained(
+                # Registre partagé: SDXL chargé une fois par process, épinglé par le studio
+                self.image_generator = model_registry.acquire(sdxl_key("cpu"), lambda: StableDiffusionXLPipeline.from_pretrained(
                     str(sdxl_path),
                     local_files_only=True,
                     torch_dtype=torch.float16
-                ).to("cpu")  # CPU car GPU sm_120 non supporté
+                ).to("cpu"))  # CPU car GPU sm_120 non supporté
                 print("   ✅ SDXL chargé (dessins 2D colorés réalistes)")
                 
                 # ControlNet Scribble pour strokes naturels
@@ -100,11 +119,11 @@ class GreasePencilAI:
                 try:
                     controlnet_path = MODELS_PATH / "models--lllyasviel--sd-controlnet-scribble"
                     if controlnet_path.exists():
-                        self.controlnet = ControlNetModel.from_pretrained(
+                        self.controlnet = model_registry.acquire('controlnet:sd-controlnet-scribble', lambda: ControlNetModel.from_pretrained(
                             str(controlnet_path),
                             local_files_only=True,
                             torch_dtype=torch.float16
-                        )
+                        ))
                         print("   ✅ ControlNet Scribble chargé (traits naturels)")
                 except Exception as e:
                     print(f"   ⚠️  ControlNet non dispo: {e}")
@@ -214,14 +233,15 @@ character; // RETOURNE l'objet
             inputs = self.code_tokenizer([text], return_tensors="pt").to(self.code_generator.device)
             
             print("   ⚙️  Qwen génère (max 1024 tokens)...")
-            outputs = self.code_generator.generate(
-                **inputs,
-                max_new_tokens=1024,  # Plus long pour code complexe
-                temperature=0.7,
-                top_p=0.9,
-                do_sample=True,
-                pad_token_id=self.code_tokenizer.eos_token_id
-            )
+            with observe_inference('qwen2.5-coder', 'generate'):
+                outputs = self.code_generator.generate(
+                    **inputs,
+                    max_new_tokens=1024,  # Plus long pour code complexe
+                    temperature=0.7,
+                    top_p=0.9,
+                    do_sample=True,
+                    pad_token_id=self.code_tokenizer.eos_token_id
+                )
             
             code = self.code_tokenizer.decode(outputs[0][len(inputs.input_ids[0]):], skip_special_tokens=True)
             
@@ -434,14 +454,15 @@ object; // Retourne l'objet
             print(f"   ⚙️  Génération SDXL (30 steps)...")
             
             # Génération avec SDXL
-            image = self.image_generator(
-                prompt=full_prompt,
-                negative_prompt=negative_prompt,
-                num_inference_steps=30,  # Qualité élevée
-                guidance_scale=7.5,
-                height=768,  # Haute résolution
-                width=768
-            ).images[0]
+            with observe_inference('sdxl', 'drawing'):
+                image = self.image_generator(
+                    prompt=full_prompt,
+                    negative_prompt=negative_prompt,
+                    num_inference_steps=30,  # Qualité élevée
+                    guidance_scale=7.5,
+                    height=768,  # Haute résolution
+                    width=768
+                ).images[0]
             
             # Sauvegarde
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
@@ -598,6 +619,11 @@ def health():
         }
     })
 
+@app.route('/api/models', methods=['GET'])
+def models_report():
+    """Modèles résidents du process: taille, références, budget mémoire"""
+    return jsonify(model_registry.report())
+
 @app.route('/api/process-prompt', methods=['POST'])
 def process_prompt():
     """
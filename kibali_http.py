@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+🔌 KIBALI HTTP - Clients HTTP mutualisés pour les appels inter-services
+=======================================================================
+Les sauts localhost entre services (kibali_api 11000, TripoSR 11001,
+MiDaS 11002, Meshy 11003, Blender 11004, Three.js 11005) passent par une
+session requests partagée: un pool keep-alive par hôte:port, la connexion
+TCP est réutilisée d'un appel d'outil à l'autre.
+
+- Synchrone:  http_client.post(url, json=..., timeout=...)
+- Asynchrone: await http_client.apost(url, json=..., timeout=...)
+  (exécuté sur un pool de threads dédié, la boucle asyncio reste libre)
+
+Configuration (variables d'environnement):
+    KIBALI_HTTP_POOL_CONNECTIONS   hôtes gardés en pool (défaut 16)
+    KIBALI_HTTP_POOL_MAXSIZE       connexions keep-alive par hôte (défaut 16)
+    KIBALI_HTTP_ASYNC_WORKERS      threads des appels asynchrones (défaut 16)
+
+Métriques: nouvelles connexions vs requêtes par hôte (get_stats() et
+/metrics via kibali_metrics).
+
+Les hôtes suivis par kibali_breakers passent par leur disjoncteur: un
+backend connu comme arrêté lève BackendUnavailable immédiatement.
+
+Échéance (kibali_deadline): le timeout de chaque appel est borné par le
+budget restant de la requête en cours, transmis en aval dans l'en-tête
+X-Kibali-Deadline-Ms; DeadlineExceeded si le budget est épuisé.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from kibali_breakers import backends
+from kibali_deadline import Deadline, DeadlineExceeded, current_deadline
+from kibali_metrics import registry
+
+POOL_CONNECTIONS = int(os.environ.get('KIBALI_HTTP_POOL_CONNECTIONS', '16'))
+POOL_MAXSIZE = int(os.environ.get('KIBALI_HTTP_POOL_MAXSIZE', '16'))
+ASYNC_WORKERS = int(os.environ.get('KIBALI_HTTP_ASYNC_WORKERS', '16'))
+
+CLIENT_REQUESTS = registry.counter(
+    'kibali_http_client_requests_total', 'Requêtes HTTP sortantes par hôte',
+    ('client', 'host'))
+CLIENT_CONNECTIONS = registry.counter(
+    'kibali_http_client_connections_total', 'Connexions TCP ouvertes par hôte (le reste est réutilisé)',
+    ('client', 'host'))
+
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _host_of(url: str) -> str:
+    """Clé hôte:port, identique à celle des pools urllib3"""
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return url
+    return f"{parts.hostname}:{parts.port or _DEFAULT_PORTS.get(parts.scheme, 80)}"
+
+
+class _CountingPoolMixin:
+    """Compte les connexions réellement ouvertes par le pool urllib3"""
+
+    on_new_connection = None
+
+    def _new_conn(self):
+        if self.on_new_connection is not None:
+            self.on_new_connection(f"{self.host}:{self.port}")
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter dont les pools signalent chaque nouvelle connexion"""
+
+    def __init__(self, on_new_connection, **kwargs):
+        attrs = {'on_new_connection': staticmethod(on_new_connection)}
+        self._pool_classes = {
+            'http': type('HTTPConnectionPool', (_CountingPoolMixin, HTTPConnectionPool), attrs),
+            'https': type('HTTPSConnectionPool', (_CountingPoolMixin, HTTPSConnectionPool), attrs)
+        }
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+
+class HttpClient:
+    """Session requests partagée, pools keep-alive par hôte, variantes sync et async"""
+
+    def __init__(self, name: str = 'default', pool_connections: int = POOL_CONNECTIONS,
+                 pool_maxsize: int = POOL_MAXSIZE, async_workers: int = ASYNC_WORKERS):
+        self.name = name
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.async_workers = async_workers
+        self._session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, int]] = {}
+
+    # ---------------------------------------------
+    # Session et pools
+    # ---------------------------------------------
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    for prefix in ('http://', 'https://'):
+                        session.mount(prefix, _PooledAdapter(
+                            self._record_connection,
+                            pool_connections=self.pool_connections,
+                            pool_maxsize=self.pool_maxsize
+                        ))
+                    self._session = session
+        return self._session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.async_workers, thread_name_prefix=f'kibali-http-{self.name}'
+                    )
+        return self._executor
+
+    def configure(self, pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                  async_workers: Optional[int] = None):
+        """Change la taille des pools (les sessions existantes sont fermées)"""
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if async_workers is not None:
+            self.async_workers = async_workers
+        self.close()
+
+    def close(self):
+        with self._lock:
+            session, executor = self._session, self._executor
+            self._session = self._executor = None
+        if session is not None:
+            session.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _host_stats(self, host: str) -> Dict[str, int]:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts.setdefault(host, {'requests': 0, 'connections': 0, 'errors': 0})
+        return stats
+
+    def _record_connection(self, host: str):
+        with self._lock:
+            self._host_stats(host)['connections'] += 1
+        CLIENT_CONNECTIONS.inc(client=self.name, host=host)
+
+    # ---------------------------------------------
+    # Appels synchrones
+    # ---------------------------------------------
+
+    def request(self, method: str, url: str, deadline: Optional[Deadline] = None,
+                **kwargs) -> requests.Response:
+        """Comme requests.request, sur la session partagée, borné par l'échéance de la requête"""
+        host = _host_of(url)
+        deadline = deadline or current_deadline()
+        cut_by_deadline = False
+        if deadline is not None:
+            # Lève DeadlineExceeded sans appel réseau si le budget est épuisé
+            timeout = kwargs.get('timeout')
+            kwargs['timeout'] = deadline.timeout(timeout)
+            cut_by_deadline = kwargs['timeout'] != timeout
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **deadline.header()}
+
+        breaker = backends.breaker_for(host)
+        if breaker is not None:
+            breaker.check()
+
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.Timeout as e:
+            # Timeout raccourci par l'échéance: le backend n'est pas en cause
+            if breaker is not None:
+                if cut_by_deadline:
+                    breaker.release()
+                else:
+                    breaker.record_failure(type(e).__name__)
+            with self._lock:
+                self._host_stats(host)['errors'] += 1
+            if cut_by_deadline:
+                raise DeadlineExceeded(f"Échéance de la requête atteinte pendant l'appel à {host}") from e
+            raise
+        except requests.exceptions.ConnectionError as e:
+            # Backend injoignable: alimente le disjoncteur
+            if breaker is not None:
+                breaker.record_failure(type(e).__name__)
+            with self._lock:
+                self._host_stats(host)['errors'] += 1
+            raise
+        except requests.exceptions.RequestException:
+            if breaker is not None:
+                breaker.release()
+            with self._lock:
+                self._host_stats(host)['errors'] += 1
+            raise
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return response
+        finally:
+            with self._lock:
+                self._host_stats(host)['requests'] += 1
+            CLIENT_REQUESTS.inc(client=self.name, host=host)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    # ---------------------------------------------
+    # Appels asynchrones
+    # ---------------------------------------------
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Variante async: la requête bloquante tourne sur le pool de threads du client"""
+        loop = asyncio.get_running_loop()
+        # run_in_executor ne copie pas le contexte: l'échéance est passée explicitement
+        kwargs.setdefault('deadline', current_deadline())
+        return await loop.run_in_executor(
+            self.executor, functools.partial(self.request, method, url, **kwargs)
+        )
+
+    async def aget(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest('GET', url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest('POST', url, **kwargs)
+
+    # ---------------------------------------------
+    # Stats
+    # ---------------------------------------------
+
+    def get_stats(self) -> Dict:
+        """Requêtes, connexions ouvertes et taux de réutilisation par hôte"""
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._hosts.items()}
+        for stats in hosts.values():
+            requests_count = stats['requests']
+            reused = max(requests_count - stats['connections'], 0)
+            stats['reuse_rate'] = round(reused / requests_count, 3) if requests_count else None
+        return {
+            'client': self.name,
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'async_workers': self.async_workers,
+            'hosts': hosts
+        }
+
+
+# Client partagé par les modules du process (executor, outils, blueprints)
+http_client = HttpClient()
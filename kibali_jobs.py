@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+📋 KIBALI JOBS - File de tâches asynchrones
+============================================
+Les endpoints longs (reconstruction MiDaS, démo château, TripoSR, orchestration
+avec exécution) retournent immédiatement un job_id et confient le travail à un
+pool de workers borné. Le client interroge ensuite statut / progression /
+résultat, ou annule le job.
+
+Les jobs sont persistés dans une petite base sqlite: les résultats survivent à
+un redémarrage, et les jobs interrompus par un arrêt sont marqués en échec.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_DB_PATH = Path(__file__).parent / "outputs" / "kibali_jobs.db"
+
+# Statuts possibles d'un job
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Levée dans un job quand l'annulation a été demandée"""
+
+
+class QueueFull(Exception):
+    """Levée quand la file de jobs est pleine"""
+
+
+class Job:
+    """Handle passé à la fonction du job pour publier sa progression"""
+
+    def __init__(self, manager: 'JobManager', job_id: str):
+        self.manager = manager
+        self.id = job_id
+        self.cancel_requested = threading.Event()
+
+    def update(self, progress: float, message: str = ''):
+        """Publie la progression (0-100) et vérifie l'annulation"""
+        self.check_cancelled()
+        self.manager.store.update(self.id, progress=round(float(progress), 1), message=message)
+
+    def check_cancelled(self):
+        """Point d'annulation coopératif"""
+        if self.cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} annulé")
+
+
+def report_progress(job: Optional[Job], progress: float, message: str = ''):
+    """Publie la progression si le code tourne dans un job (no-op sinon)"""
+    if job is not None:
+        job.update(progress, message)
+
+
+class JobStore:
+    """Persistance sqlite des jobs (une connexion par opération, sérialisée)"""
+
+    def __init__(self, db_path: Path, max_finished: int = 200):
+        self.db_path = Path(db_path)
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL DEFAULT 0,
+                    message TEXT DEFAULT '',
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            # Jobs d'un process précédent: ils ne reprendront jamais
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)",
+                (FAILED, 'Interrompu par un redémarrage du service', time.time(), QUEUED, RUNNING)
+            )
+
+    def _connect(self):
+        return sqlite3.connect(str(self.db_path), timeout=10)
+
+    def insert(self, job_id: str, kind: str, params: Dict):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params, ensure_ascii=False, default=str), time.time())
+            )
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False, default=str)
+        columns = ', '.join(f"{key} = ?" for key in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict]:
+        query = "SELECT * FROM jobs"
+        args = []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query, args).fetchall()
+        # Pas de résultat complet dans la liste (peut contenir du code Three.js volumineux)
+        return [self._to_dict(row, include_result=False) for row in rows]
+
+    def prune(self):
+        """Ne garde que les `max_finished` jobs terminés les plus récents"""
+        with self._lock, self._connect() as conn:
+            conn.execute(f"""
+                DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED_STATUSES))})
+                AND id NOT IN (
+                    SELECT id FROM jobs WHERE status IN ({','.join('?' * len(FINISHED_STATUSES))})
+                    ORDER BY finished_at DESC LIMIT ?
+                )
+            """, (*FINISHED_STATUSES, *FINISHED_STATUSES, self.max_finished))
+
+    @staticmethod
+    def _to_dict(row, include_result: bool = True) -> Dict:
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        if include_result:
+            job['result'] = json.loads(job['result']) if job['result'] else None
+        else:
+            job.pop('result', None)
+        return job
+
+
+class JobManager:
+    """Pool de workers borné + suivi des jobs en cours"""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, max_workers: int = 2, max_pending: int = 32):
+        self.store = JobStore(db_path)
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kibali-job')
+        self.active: Dict[str, Job] = {}
+        self.futures = {}
+        self._lock = threading.Lock()
+        print(f"📋 Jobs: {max_workers} worker(s), file max {max_pending}, base {self.store.db_path}")
+
+    def submit(self, kind: str, func: Callable, params: Optional[Dict] = None, **kwargs) -> str:
+        """
+        Soumet `func(job=handle, **kwargs)` au pool et retourne le job_id
+
+        La fonction retourne (payload, status_code) comme les handlers Flask:
+        un status >= 400 ou un payload {'success': False} marque le job en échec.
+        """
+        with self._lock:
+            if len(self.active) >= self.max_pending:
+                raise QueueFull(f"File de jobs pleine ({self.max_pending} en attente/en cours)")
+
+            job_id = uuid.uuid4().hex[:12]
+            self.store.insert(job_id, kind, params or {})
+            job = Job(self, job_id)
+            self.active[job_id] = job
+            self.futures[job_id] = self.executor.submit(self._run, job, func, kwargs)
+
+        print(f"📋 [JOB {job_id}] {kind} en file")
+        return job_id
+
+    def _run(self, job: Job, func: Callable, kwargs: Dict):
+        try:
+            job.check_cancelled()
+            self.store.update(job.id, status=RUNNING, started_at=time.time())
+            payload, status_code = func(job=job, **kwargs)
+
+            failed = status_code >= 400 or (isinstance(payload, dict) and payload.get('success') is False)
+            if failed:
+                error = payload.get('error', f'HTTP {status_code}') if isinstance(payload, dict) else str(payload)
+                self.store.update(job.id, status=FAILED, result=payload, error=error,
+                                  finished_at=time.time())
+                print(f"❌ [JOB {job.id}] Échec: {error}")
+            else:
+                self.store.update(job.id, status=SUCCEEDED, progress=100.0, result=payload,
+                                  finished_at=time.time())
+                print(f"✅ [JOB {job.id}] Terminé")
+
+        except JobCancelled:
+            self.store.update(job.id, status=CANCELLED, message='Annulé', finished_at=time.time())
+            print(f"🛑 [JOB {job.id}] Annulé")
+
+        except Exception as e:
+            self.store.update(job.id, status=FAILED, error=str(e), finished_at=time.time())
+            print(f"❌ [JOB {job.id}] Erreur: {e}")
+
+        finally:
+            with self._lock:
+                self.active.pop(job.id, None)
+                self.futures.pop(job.id, None)
+            self.store.prune()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict]:
+        return self.store.list(limit, status)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Annule un job: immédiat s'il est encore en file, sinon coopératif
+        (pris en compte au prochain report_progress de la fonction du job)
+        """
+        with self._lock:
+            job = self.active.get(job_id)
+            future = self.futures.get(job_id)
+            if job is None:
+                return False
+
+            job.cancel_requested.set()
+            if future is not None and future.cancel():
+                self.active.pop(job_id, None)
+                self.futures.pop(job_id, None)
+                self.store.update(job_id, status=CANCELLED, message='Annulé avant démarrage',
+                                  finished_at=time.time())
+        return True
+
+
+# Instance globale (créée au premier usage)
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    """Retourne le gestionnaire de jobs partagé (configuré par variables d'environnement)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                db_path=Path(os.environ.get('KIBALI_JOBS_DB', DEFAULT_DB_PATH)),
+                max_workers=int(os.environ.get('KIBALI_JOB_WORKERS', 2)),
+                max_pending=int(os.environ.get('KIBALI_JOB_QUEUE', 32))
+            )
+    return _manager
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+🎞️ KIBALI KEYFRAMES - Moteur de keyframes vectorisé (NumPy)
+============================================================
+Échantillonne les courbes d'animation (marche, rotation) et de caméra
+(orbite, zoom) en bloc avec NumPy au lieu de construire un dict Python par
+frame.
+
+Deux sorties pour les mêmes pistes:
+- JSON historique (liste de dicts translation/rotation/scale), inchangé
+- pistes Float32 entrelacées, compactes (base64 dans le JSON ou réponse
+  binaire application/octet-stream): une animation longue pèse quelques Ko
+  au lieu de plusieurs Mo
+
+Format packé (little-endian float32, une ligne par keyframe):
+    animation: frame, tx, ty, tz, rx, ry, rz, sx, sy, sz   (stride 10)
+    caméra:    frame, px, py, pz                          (stride 4)
+"""
+
+import base64
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+ANIMATION_LAYOUT = ('frame', 'tx', 'ty', 'tz', 'rx', 'ry', 'rz', 'sx', 'sy', 'sz')
+CAMERA_LAYOUT = ('frame', 'px', 'py', 'pz')
+
+PACKED_FORMAT = 'f32le-interleaved'
+OUTPUT_FORMATS = ('json', 'packed', 'binary')
+
+
+# ============================================
+# ÉCHANTILLONNAGE
+# ============================================
+
+def _identity_tracks(frames: np.ndarray) -> np.ndarray:
+    """Pistes (n, 10): frame + translation/rotation nulles + échelle 1"""
+    tracks = np.zeros((len(frames), len(ANIMATION_LAYOUT)), dtype=np.float64)
+    tracks[:, 0] = frames
+    tracks[:, 7:10] = 1.0
+    return tracks
+
+
+def sample_animation(prompt: str, duration: int) -> np.ndarray:
+    """
+    Échantillonne l'animation décrite par le prompt
+
+    Returns:
+        Tableau (n, 10) float64 selon ANIMATION_LAYOUT
+    """
+    prompt_lower = prompt.lower()
+
+    if 'marche' in prompt_lower or 'walk' in prompt_lower:
+        # Marche: avance de 0.05 par frame, une keyframe toutes les 15 frames
+        frames = np.arange(0, duration, 15, dtype=np.float64)
+        tracks = _identity_tracks(frames)
+        tracks[:, 3] = frames * 0.05
+        return tracks
+
+    if 'rotation' in prompt_lower or 'tourne' in prompt_lower:
+        # Rotation: un tour complet sur Y, une keyframe toutes les 10 frames
+        frames = np.arange(0, duration, 10, dtype=np.float64)
+        tracks = _identity_tracks(frames)
+        tracks[:, 5] = frames / duration * 360
+        return tracks
+
+    # Par défaut: pose neutre au début et à la fin
+    return _identity_tracks(np.array([0, duration], dtype=np.float64))
+
+
+def sample_orbit(center: Dict, radius: float, frames: int, start_angle: float = 0,
+                 end_angle: float = 360, height: float = 0) -> np.ndarray:
+    """Positions caméra (frames + 1, 4) sur un cercle horizontal autour de `center`"""
+    t = np.arange(frames + 1, dtype=np.float64)
+    angles = np.radians(start_angle + (end_angle - start_angle) * t / max(frames, 1))
+    track = np.empty((len(t), len(CAMERA_LAYOUT)), dtype=np.float64)
+    track[:, 0] = t
+    track[:, 1] = center['x'] + radius * np.sin(angles)
+    track[:, 2] = center['y'] + height
+    track[:, 3] = center['z'] + radius * np.cos(angles)
+    return track
+
+
+def sample_linear(start: Dict, end: Dict, frames: int) -> np.ndarray:
+    """Positions caméra (frames + 1, 4) interpolées linéairement de start à end"""
+    t = np.arange(frames + 1, dtype=np.float64)
+    alpha = (t / max(frames, 1))[:, None]
+    a = np.array([start['x'], start['y'], start['z']], dtype=np.float64)
+    b = np.array([end['x'], end['y'], end['z']], dtype=np.float64)
+    track = np.empty((len(t), len(CAMERA_LAYOUT)), dtype=np.float64)
+    track[:, 0] = t
+    track[:, 1:] = a + (b - a) * alpha
+    return track
+
+
+def sample_camera_path(camera_path: Dict) -> np.ndarray:
+    """Échantillonne une trajectoire caméra (format de generate_camera_movement), une ligne par frame"""
+    path_type = camera_path['type']
+
+    if path_type == 'orbit':
+        return sample_orbit(camera_path['center'], camera_path['radius'], camera_path['duration'],
+                            camera_path['start_angle'], camera_path['end_angle'])
+
+    if path_type == 'zoom':
+        return sample_linear(camera_path['start'], camera_path['end'], camera_path['duration'])
+
+    # static: une seule position
+    return sample_linear(camera_path['position'], camera_path['position'], 0)
+
+
+# ============================================
+# SORTIES
+# ============================================
+
+def tracks_to_keyframes(tracks: np.ndarray) -> List[Dict]:
+    """Convertit les pistes d'animation au format JSON historique"""
+    keyframes = []
+    for row in tracks.tolist():
+        keyframes.append({
+            'frame': int(row[0]),
+            'transformation': {
+                'translation': {'x': row[1], 'y': row[2], 'z': row[3]},
+                'rotation': {'x': row[4], 'y': row[5], 'z': row[6]},
+                'scale': {'x': row[7], 'y': row[8], 'z': row[9]}
+            }
+        })
+    return keyframes
+
+
+def pack_tracks(tracks: np.ndarray) -> bytes:
+    """Sérialise les pistes en float32 little-endian entrelacés"""
+    return np.ascontiguousarray(tracks, dtype='<f4').tobytes()
+
+
+def unpack_tracks(data: bytes, layout: Tuple[str, ...]) -> np.ndarray:
+    """Inverse de pack_tracks (base64 accepté)"""
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    return np.frombuffer(data, dtype='<f4').reshape(-1, len(layout))
+
+
+def packed_descriptor(tracks: np.ndarray, layout: Tuple[str, ...]) -> Dict:
+    """Pistes packées encodées en base64, avec leur description"""
+    data = pack_tracks(tracks)
+    return {
+        'format': PACKED_FORMAT,
+        'layout': list(layout),
+        'stride': len(layout),
+        'count': int(tracks.shape[0]),
+        'bytes': len(data),
+        'data': base64.b64encode(data).decode('ascii')
+    }
+
+
+def binary_headers(tracks: np.ndarray, layout: Tuple[str, ...]) -> Dict[str, str]:
+    """En-têtes HTTP décrivant une réponse binaire (application/octet-stream)"""
+    return {
+        'X-Keyframe-Format': PACKED_FORMAT,
+        'X-Keyframe-Layout': ','.join(layout),
+        'X-Keyframe-Stride': str(len(layout)),
+        'X-Keyframe-Count': str(int(tracks.shape[0]))
+    }
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+⏱️ KIBALI LATENCY - Modèle de latence appris par outil
+=======================================================
+L'executor enregistre la durée mesurée de chaque étape; le modèle garde
+une fenêtre glissante par outil (percentiles p50/p90/p99) et la persiste
+en JSON entre deux redémarrages.
+
+L'orchestrateur s'en sert pour:
+- remplacer les estimated_time codés en dur par la médiane mesurée (dès
+  MIN_SAMPLES mesures, sinon la valeur codée sert d'a priori)
+- ordonner le démarrage des étapes indépendantes: les chaînes les plus
+  longues d'abord (plan['schedule'])
+
+Le rapport (GET /api/latency-model) compare durées réelles et estimations.
+
+Configuration:
+    KIBALI_LATENCY_MODEL        fichier JSON (défaut ~/.cache/kibali/latency_model.json,
+                                hors du dépôt)
+    KIBALI_LATENCY_WINDOW       mesures gardées par outil (défaut 200)
+    KIBALI_LATENCY_MIN_SAMPLES  mesures avant de remplacer l'a priori (défaut 3)
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# État appris par machine: jamais dans l'arbre des sources
+DEFAULT_PATH = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'kibali' / 'latency_model.json'
+WINDOW = int(os.environ.get('KIBALI_LATENCY_WINDOW', '200'))
+MIN_SAMPLES = int(os.environ.get('KIBALI_LATENCY_MIN_SAMPLES', '3'))
+SAVE_INTERVAL = 5.0
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Percentile (interpolation linéaire) d'une liste déjà triée"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class LatencyModel:
+    """Fenêtre glissante des durées par outil, persistée en JSON"""
+
+    def __init__(self, path: Path = DEFAULT_PATH, window: int = WINDOW, min_samples: int = MIN_SAMPLES):
+        self.path = Path(path)
+        self.window = window
+        self.min_samples = min_samples
+        self.tools: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    def _tool(self, tool: str) -> Dict:
+        entry = self.tools.get(tool)
+        if entry is None:
+            entry = self.tools[tool] = {
+                'durations': deque(maxlen=self.window),
+                'failures': 0,
+                'estimated_total': 0.0,
+                'actual_total': 0.0,
+                'compared': 0
+            }
+        return entry
+
+    # ---------------------------------------------
+    # Mesures
+    # ---------------------------------------------
+
+    def record(self, tool: str, duration: float, success: bool = True, estimated: Optional[float] = None):
+        """Enregistre la durée d'une étape (les échecs ne comptent pas dans les percentiles)"""
+        with self._lock:
+            entry = self._tool(tool)
+            if success:
+                entry['durations'].append(round(duration, 4))
+                if estimated is not None:
+                    entry['estimated_total'] += estimated
+                    entry['actual_total'] += duration
+                    entry['compared'] += 1
+            else:
+                entry['failures'] += 1
+            self._dirty = True
+            save_now = time.time() - self._last_save >= SAVE_INTERVAL
+        if save_now:
+            self.save()
+
+    def percentiles(self, tool: str) -> Dict:
+        with self._lock:
+            entry = self.tools.get(tool)
+            values = sorted(entry['durations']) if entry else []
+        return {
+            'samples': len(values),
+            'p50': percentile(values, 50),
+            'p90': percentile(values, 90),
+            'p99': percentile(values, 99),
+            'mean': sum(values) / len(values) if values else None
+        }
+
+    def estimate(self, tool: str, default: float, q: float = 50) -> float:
+        """Durée estimée: percentile mesuré si assez d'échantillons, sinon l'a priori"""
+        with self._lock:
+            entry = self.tools.get(tool)
+            values = sorted(entry['durations']) if entry else []
+        if len(values) < self.min_samples:
+            return default
+        return round(percentile(values, q), 3)
+
+    def is_measured(self, tool: str) -> bool:
+        with self._lock:
+            entry = self.tools.get(tool)
+            return entry is not None and len(entry['durations']) >= self.min_samples
+
+    # ---------------------------------------------
+    # Persistance
+    # ---------------------------------------------
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        for tool, saved in data.get('tools', {}).items():
+            entry = self._tool(tool)
+            entry['durations'].extend(saved.get('durations', []))
+            for field in ('failures', 'estimated_total', 'actual_total', 'compared'):
+                entry[field] = saved.get(field, entry[field])
+
+    def save(self):
+        """Écrit le modèle sur disque (écriture atomique)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'saved_at': time.time(),
+                'tools': {
+                    tool: {**entry, 'durations': list(entry['durations'])}
+                    for tool, entry in self.tools.items()
+                }
+            }
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.json.tmp')
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ [LATENCY] Sauvegarde impossible ({self.path}): {e}")
+
+    # ---------------------------------------------
+    # Rapport
+    # ---------------------------------------------
+
+    def report(self) -> Dict:
+        """Par outil: percentiles mesurés, échecs, durée réelle vs estimée au moment du plan"""
+        with self._lock:
+            tools = list(self.tools)
+        report = {}
+        for tool in sorted(tools):
+            stats = self.percentiles(tool)
+            with self._lock:
+                entry = self.tools[tool]
+                compared = entry['compared']
+                estimated_mean = entry['estimated_total'] / compared if compared else None
+                actual_mean = entry['actual_total'] / compared if compared else None
+                failures = entry['failures']
+            report[tool] = {
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()},
+                'failures': failures,
+                'measured': stats['samples'] >= self.min_samples,
+                'estimated_mean': round(estimated_mean, 3) if estimated_mean is not None else None,
+                'actual_mean': round(actual_mean, 3) if actual_mean is not None else None,
+                'estimate_error_pct': round((estimated_mean - actual_mean) / actual_mean * 100, 1)
+                if compared and actual_mean else None
+            }
+        return report
+
+
+# Modèle partagé par l'orchestrateur et l'executor du process
+latency_model = LatencyModel(Path(os.environ.get('KIBALI_LATENCY_MODEL', DEFAULT_PATH)))
+atexit.register(latency_model.save)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+⏱️ KIBALI LOADER - Démarrage différé et profilé
+================================================
+Charge les sous-systèmes lourds (torch, transformers, CodeLlama, LangChain...)
+au premier usage ou dans un thread de préchauffage, au lieu de tout importer
+avant que Flask ne serve /api/health.
+
+Chaque sous-système mesure son temps d'import et d'initialisation:
+le rapport de démarrage est exposé par kibali_api sur /api/startup-report.
+"""
+
+import importlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class Subsystem:
+    """Un sous-système chargé à la demande: import du module + initialisation"""
+
+    def __init__(self, name: str, module_name: str, init: Optional[Callable] = None):
+        self.name = name
+        self.module_name = module_name
+        self.init = init
+        self.status = 'pending'  # pending | loading | ready | failed
+        self.module = None
+        self.instance = None
+        self.error = None
+        self.import_time = None
+        self.init_time = None
+        self.loaded_by = None  # 'request' | 'warmup'
+        self._lock = threading.Lock()
+
+    def load(self, trigger: str = 'request'):
+        """Importe puis initialise le sous-système (une seule fois, thread-safe)"""
+        if self.status in ('ready', 'failed'):
+            return
+
+        with self._lock:
+            if self.status in ('ready', 'failed'):
+                return
+
+            self.status = 'loading'
+            self.loaded_by = trigger
+
+            try:
+                start = time.perf_counter()
+                self.module = importlib.import_module(self.module_name)
+                self.import_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                self.instance = self.init(self.module) if self.init else self.module
+                self.init_time = time.perf_counter() - start
+
+                self.status = 'ready'
+                print(f"✅ [LOADER] {self.name} prêt ({trigger}) - import {self.import_time:.2f}s, init {self.init_time:.2f}s")
+
+            except Exception as e:
+                self.error = str(e)
+                self.status = 'failed'
+                print(f"⚠️ [LOADER] {self.name} indisponible: {e}")
+
+    def get(self):
+        """Retourne l'instance initialisée (lève RuntimeError si indisponible)"""
+        self.load()
+        if self.status != 'ready':
+            raise RuntimeError(f"Sous-système '{self.name}' indisponible: {self.error}")
+        return self.instance
+
+    def get_module(self):
+        """Retourne le module importé, même si l'initialisation a échoué (mode dégradé)"""
+        self.load()
+        if self.module is None:
+            raise RuntimeError(f"Module '{self.module_name}' indisponible: {self.error}")
+        return self.module
+
+    def to_dict(self) -> Dict:
+        return {
+            'module': self.module_name,
+            'status': self.status,
+            'import_time': round(self.import_time, 3) if self.import_time is not None else None,
+            'init_time': round(self.init_time, 3) if self.init_time is not None else None,
+            'loaded_by': self.loaded_by,
+            'error': self.error
+        }
+
+
+class SubsystemLoader:
+    """Registre des sous-systèmes différés + rapport de démarrage"""
+
+    def __init__(self):
+        self.subsystems: Dict[str, Subsystem] = {}
+        self.stages: List[Dict] = []
+        self.process_start = time.time()
+        self.listening_at = None
+        self.warmup_thread = None
+        self.warmup_done_at = None
+
+    def register(self, name: str, module_name: str, init: Optional[Callable] = None) -> Subsystem:
+        """Déclare un sous-système sans le charger"""
+        subsystem = Subsystem(name, module_name, init)
+        self.subsystems[name] = subsystem
+        return subsystem
+
+    def get(self, name: str):
+        """Instance initialisée du sous-système (chargée au premier appel)"""
+        return self.subsystems[name].get()
+
+    def module(self, name: str):
+        """Module du sous-système (chargé au premier appel)"""
+        return self.subsystems[name].get_module()
+
+    def is_ready(self, name: str) -> bool:
+        return self.subsystems[name].status == 'ready'
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mesure une étape de démarrage exécutée immédiatement (imports obligatoires)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({'stage': name, 'duration': round(time.perf_counter() - start, 3)})
+
+    def warm_up(self, default: Optional[List[str]] = None) -> threading.Thread:
+        """
+        Préchauffe les sous-systèmes en arrière-plan (thread daemon)
+
+        La variable d'environnement KIBALI_WARMUP (liste séparée par des
+        virgules, "none" pour désactiver) remplace la liste `default`.
+        Sans l'une ni l'autre, tous les sous-systèmes sont préchauffés.
+        """
+        env = os.environ.get('KIBALI_WARMUP')
+        if env is not None:
+            names = [] if env.strip().lower() == 'none' else [n.strip() for n in env.split(',') if n.strip()]
+        elif default is not None:
+            names = list(default)
+        else:
+            names = list(self.subsystems)
+
+        names = [n for n in names if n in self.subsystems]
+
+        def _run():
+            for name in names:
+                self.subsystems[name].load(trigger='warmup')
+            self.warmup_done_at = time.time()
+            print(f"🔥 [LOADER] Préchauffage terminé ({len(names)} sous-systèmes)")
+
+        self.warmup_thread = threading.Thread(target=_run, name='kibali-warmup', daemon=True)
+        self.warmup_thread.start()
+        return self.warmup_thread
+
+    def mark_listening(self):
+        """Note le moment où le serveur est prêt à accepter des requêtes"""
+        self.listening_at = time.time()
+
+    def report(self) -> Dict:
+        """Rapport de démarrage: temps par étape et par sous-système"""
+        def _since_start(ts):
+            return round(ts - self.process_start, 3) if ts else None
+
+        return {
+            'stages': self.stages,
+            'subsystems': {name: s.to_dict() for name, s in self.subsystems.items()},
+            'listening_after': _since_start(self.listening_at),
+            'warmup_running': bool(self.warmup_thread and self.warmup_thread.is_alive()),
+            'warmup_done_after': _since_start(self.warmup_done_at),
+            'uptime': round(time.time() - self.process_start, 3)
+        }
+
+
+# Instance globale partagée par les services
+subsystems = SubsystemLoader()
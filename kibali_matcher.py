@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+🔎 KIBALI MATCHER - Reconnaissance multi-mots-clés précompilée
+===============================================================
+Automate Aho-Corasick construit une seule fois à partir des tables du
+dispatcher (patterns, indicateurs de complexité, commandes caméra): un seul
+passage sur le prompt retourne toutes les règles reconnues avec leur
+priorité, quel que soit le nombre de mots-clés.
+
+Sémantique identique aux anciens `kw in prompt_lower`: correspondance de
+sous-chaîne, sans frontière de mot. Avec fold=True, mots-clés et texte sont
+comparés sans accents ni majuscules ("scene" reconnaît "scène").
+
+Règles:
+- any  (défaut): au moins un des mots-clés est présent
+- all           : tous les mots-clés sont présents (ex: ('créé', 'court'))
+
+Micro-benchmark: python kibali_matcher.py
+"""
+
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+@lru_cache(maxsize=4096)
+def fold_text(text: str) -> str:
+    """Minuscules sans accents ("Scène Caméra" → "scene camera")"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class KeywordAutomaton:
+    """Automate Aho-Corasick sur des chaînes (transitions par caractère)"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]  # ids des mots-clés finissant à ce nœud
+        self.keywords: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.built = False
+
+    def add(self, keyword: str) -> int:
+        """Ajoute un mot-clé, retourne son id (un mot-clé déjà présent garde son id)"""
+        if keyword in self._index:
+            return self._index[keyword]
+        if not keyword:
+            raise ValueError("Mot-clé vide")
+
+        node = 0
+        for char in keyword:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = nxt
+            node = nxt
+
+        keyword_id = len(self.keywords)
+        self.keywords.append(keyword)
+        self._index[keyword] = keyword_id
+        self.output[node].append(keyword_id)
+        self.built = False
+        return keyword_id
+
+    def build(self):
+        """Calcule les liens d'échec (parcours en largeur)"""
+        queue = deque()
+        for child in self.goto[0].values():
+            self.fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+        self.built = True
+
+    def iter_matches(self, text: str):
+        """Génère (position de fin, id du mot-clé) pour chaque occurrence"""
+        if not self.built:
+            self.build()
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword_id in output[node]:
+                yield position, keyword_id
+
+    def find(self, text: str) -> Dict[int, int]:
+        """Mots-clés présents: {id: position de la première occurrence (début)}"""
+        found = {}
+        keywords = self.keywords
+        for end, keyword_id in self.iter_matches(text):
+            if keyword_id not in found:
+                found[keyword_id] = end - len(keywords[keyword_id]) + 1
+        return found
+
+
+class RuleMatch:
+    """Règle reconnue dans un texte"""
+
+    __slots__ = ('name', 'priority', 'data', 'order', 'keywords')
+
+    def __init__(self, name, priority, data, order, keywords):
+        self.name = name
+        self.priority = priority
+        self.data = data
+        self.order = order
+        self.keywords = keywords
+
+    def __repr__(self):
+        return f"RuleMatch({self.name!r}, priority={self.priority}, keywords={self.keywords})"
+
+
+class KeywordMatcher:
+    """Table de règles (any/all de mots-clés) compilée en un automate unique"""
+
+    def __init__(self, fold: bool = False):
+        self.fold = fold
+        self.automaton = KeywordAutomaton()
+        self.rules: List[Tuple[str, int, Any, Tuple[int, ...], bool]] = []
+        self._rules_by_keyword: Dict[int, List[int]] = {}
+
+    def add_rule(self, name: str, keywords: Iterable[str], priority: int = 0,
+                 data: Any = None, require_all: bool = False) -> 'KeywordMatcher':
+        """Ajoute une règle; l'ordre d'ajout départage les priorités égales"""
+        if self.fold:
+            keywords = [fold_text(kw) for kw in keywords]
+        keyword_ids = tuple(dict.fromkeys(self.automaton.add(kw) for kw in keywords))
+        rule_index = len(self.rules)
+        self.rules.append((name, priority, data, keyword_ids, require_all))
+        for keyword_id in keyword_ids:
+            self._rules_by_keyword.setdefault(keyword_id, []).append(rule_index)
+        return self
+
+    def compile(self) -> 'KeywordMatcher':
+        self.automaton.build()
+        return self
+
+    def match(self, text: str) -> List[RuleMatch]:
+        """
+        Toutes les règles reconnues en un passage, triées par priorité
+        décroissante puis ordre d'ajout
+        """
+        found = self.automaton.find(fold_text(text) if self.fold else text)
+        if not found:
+            return []
+
+        candidates = set()
+        for keyword_id in found:
+            candidates.update(self._rules_by_keyword.get(keyword_id, ()))
+
+        keywords = self.automaton.keywords
+        matches = []
+        for rule_index in candidates:
+            name, priority, data, keyword_ids, require_all = self.rules[rule_index]
+            if require_all and not all(k in found for k in keyword_ids):
+                continue
+            matched = [keywords[k] for k in keyword_ids if k in found]
+            matches.append(RuleMatch(name, priority, data, rule_index, matched))
+
+        matches.sort(key=lambda m: (-m.priority, m.order))
+        return matches
+
+    def first(self, text: str) -> Optional[RuleMatch]:
+        """Règle gagnante (priorité la plus haute, puis première ajoutée)"""
+        matches = self.match(text)
+        return matches[0] if matches else None
+
+    def matches_any(self, text: str) -> bool:
+        return bool(self.match(text))
+
+
+# ============================================
+# MICRO-BENCHMARK
+# ============================================
+
+def benchmark(sizes=(10, 100, 1000, 5000), iterations: int = 2000, seed: int = 0) -> List[Dict]:
+    """
+    Compare le scan naïf (any(kw in texte) pour chaque pattern) à l'automate
+    pour des tables de `sizes` patterns de 4 mots-clés synthétiques
+    """
+    import random
+    import string
+    import time
+
+    rng = random.Random(seed)
+    prompt = "crée un personnage héroïque qui court autour d'un terrain de foot avec caméra orbite 360".lower()
+
+    def word():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10)))
+
+    results = []
+    for size in sizes:
+        patterns = [{'keywords': [word() for _ in range(4)], 'priority': rng.randint(1, 10)} for _ in range(size)]
+        patterns[size // 2]['keywords'].append('terrain')  # au moins une correspondance
+
+        matcher = KeywordMatcher()
+        for i, pattern in enumerate(patterns):
+            matcher.add_rule(f'p{i}', pattern['keywords'], pattern['priority'])
+        matcher.compile()
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            naive = [p for p in patterns if any(kw in prompt for kw in p['keywords'])]
+            naive.sort(key=lambda p: p['priority'], reverse=True)
+        naive_us = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            compiled = matcher.match(prompt)
+        compiled_us = (time.perf_counter() - start) / iterations * 1e6
+
+        assert len(naive) == len(compiled)
+        results.append({'patterns': size, 'naive_us': round(naive_us, 2), 'automaton_us': round(compiled_us, 2)})
+    return results
+
+
+if __name__ == "__main__":
+    print("🔎 KIBALI MATCHER - Micro-benchmark (µs par dispatch)")
+    print("=" * 60)
+    print(f"{'patterns':>10} {'naïf':>12} {'automate':>12}")
+    for row in benchmark():
+        print(f"{row['patterns']:>10} {row['naive_us']:>12} {row['automaton_us']:>12}")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+📈 KIBALI METRICS - Instrumentation Prometheus des services Flask
+==================================================================
+Middleware partagé par tous les services (kibali_api, MiDaS, Blender,
+Grease Pencil, app): nombre de requêtes, requêtes en cours et histogrammes
+de latence par route et statut, plus les temps d'inférence des modèles.
+
+Chaque service instrumenté expose GET /metrics au format texte Prometheus.
+Implémentation sans dépendance (pas besoin de prometheus_client).
+
+Usage:
+    from kibali_metrics import instrument_app, observe_inference
+    instrument_app(app, 'kibali-api')
+
+    with observe_inference('codellama', 'generate'):
+        outputs = model.generate(...)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+# Buckets (secondes): des endpoints caméra (ms) aux reconstructions (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+INFERENCE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self):
+        return []
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values: Dict[Tuple, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, dict(s, counts=list(s['counts']))) for key, s in self._values.items()]
+
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble des métriques d'un process, rendu au format texte Prometheus"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self.metrics[name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# Registre global du process
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    'kibali_http_requests_total', 'Requêtes HTTP traitées',
+    ('service', 'route', 'method', 'status'))
+HTTP_IN_FLIGHT = registry.gauge(
+    'kibali_http_requests_in_flight', 'Requêtes HTTP en cours',
+    ('service',))
+HTTP_LATENCY = registry.histogram(
+    'kibali_http_request_duration_seconds', 'Latence des requêtes HTTP',
+    ('service', 'route', 'method', 'status'))
+INFERENCE_LATENCY = registry.histogram(
+    'kibali_model_inference_seconds', "Durée des appels d'inférence des modèles",
+    ('service', 'model', 'operation', 'outcome'), buckets=INFERENCE_BUCKETS)
+
+# Service par défaut pour observe_inference (défini par instrument_app)
+_service_name = 'kibali'
+
+
+@contextmanager
+def observe_inference(model: str, operation: str = 'generate', service: Optional[str] = None):
+    """Chronomètre un appel de modèle (outcome=ok|error)"""
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        INFERENCE_LATENCY.observe(time.perf_counter() - start, service=service or _service_name,
+                                  model=model, operation=operation, outcome=outcome)
+
+
+def instrument_app(app, service_name: str, metrics_path: str = '/metrics'):
+    """
+    Ajoute le middleware de métriques à une app Flask et expose `metrics_path`
+
+    La route est le motif Flask (/api/jobs/<job_id>), pas l'URL brute,
+    pour garder une cardinalité bornée.
+    """
+    from flask import g, request, Response
+
+    global _service_name
+    _service_name = service_name
+
+    def _route():
+        rule = request.url_rule
+        return rule.rule if rule is not None else 'unmatched'
+
+    def _finish(status):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return
+        labels = dict(service=service_name, route=_route(), method=request.method, status=str(status))
+        HTTP_IN_FLIGHT.dec(service=service_name)
+        HTTP_REQUESTS.inc(**labels)
+        HTTP_LATENCY.observe(time.perf_counter() - start, **labels)
+
+    @app.before_request
+    def _metrics_before():
+        if request.path == metrics_path:
+            return
+        g._metrics_start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(service=service_name)
+
+    @app.after_request
+    def _metrics_after(response):
+        _finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        # Exception non gérée: after_request n'a pas été appelé
+        _finish(500)
+
+    @app.route(metrics_path, methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+🧠 KIBALI MODELS - Registre des modèles partagé par le process
+===============================================================
+CodeLlama-7b était chargé deux fois (ai_procedural_3d et
+hybrid_ai_generator), Stable Diffusion 1.5 deux fois (realistic_generator
+et simple_3d_generator), SDXL deux fois (grease pencil): un même process
+pouvait garder les mêmes poids en double.
+
+Le registre charge chaque modèle une seule fois par clé (modèle + device):
+
+- get(key, loader)      : modèle résident (chargé au premier appel)
+- use(key, loader)      : idem, épinglé pendant le bloc `with`
+- acquire / release     : épinglage explicite (compteur de références)
+
+Quand la taille résidente dépasse le budget (KIBALI_MODEL_BUDGET_MB,
+défaut 60 % de la RAM physique), les modèles non épinglés les moins
+récemment utilisés sont libérés; ils seront rechargés au prochain usage.
+Les appelants ne gardent donc pas de référence durable au modèle: ils le
+redemandent au registre à chaque utilisation.
+
+report() donne la taille résidente de chaque modèle (paramètres + buffers
+torch, poids int8 empaquetés, composants des pipelines diffusers),
+GET /api/models l'expose.
+
+Inférence CPU quantifiée: KIBALI_CPU_INT8 (ex: "codellama,qwen" ou "all")
+charge les LLM de code nommés avec leurs couches Linear en int8 dynamique
+quand ils tournent sur CPU (clé de registre distincte, suffixe ":int8").
+Comparaison tokens/s, latence du premier token et RSS:
+
+    python kibali_models.py <chemin_du_modele> [--modes float32,int8] [--tokens 64]
+"""
+
+import gc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from kibali_metrics import registry
+
+MB = 1024 * 1024
+
+
+def _physical_ram() -> Optional[int]:
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _default_budget() -> Optional[int]:
+    configured = os.environ.get('KIBALI_MODEL_BUDGET_MB')
+    if configured:
+        return int(float(configured) * MB) or None
+    ram = _physical_ram()
+    return int(ram * 0.6) if ram else None
+
+
+MODEL_RESIDENT_BYTES = registry.gauge(
+    'kibali_model_resident_bytes', 'Taille résidente estimée par modèle', ('model',))
+MODEL_LOADS = registry.counter(
+    'kibali_model_loads_total', 'Chargements de modèles (un rechargement après éviction compte)', ('model',))
+MODEL_EVICTIONS = registry.counter(
+    'kibali_model_evictions_total', 'Modèles libérés pour tenir le budget mémoire', ('model',))
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Octets des tenseurs d'un modèle torch, d'un pipeline diffusers ou d'un dict/tuple de ceux-ci"""
+    seen = _seen if _seen is not None else set()
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    # nn.Module: paramètres + buffers (poids partagés comptés une fois)
+    if callable(getattr(obj, 'parameters', None)) and callable(getattr(obj, 'buffers', None)):
+        total = 0
+        for tensor in list(obj.parameters()) + list(obj.buffers()):
+            key = ('tensor', tensor.data_ptr()) if hasattr(tensor, 'data_ptr') else id(tensor)
+            if key in seen:
+                continue
+            seen.add(key)
+            total += tensor.numel() * tensor.element_size()
+        # Linear int8 dynamiques: poids empaquetés hors parameters()
+        for module in obj.modules() if callable(getattr(obj, 'modules', None)) else ():
+            packed = getattr(module, '_packed_params', None)
+            if not callable(getattr(packed, '_weight_bias', None)):
+                continue
+            for tensor in packed._weight_bias():
+                if tensor is not None:
+                    total += tensor.numel() * tensor.element_size()
+        return total
+
+    # Pipeline diffusers: unet, vae, text_encoder...
+    components = getattr(obj, 'components', None)
+    if isinstance(components, dict):
+        return sum(estimate_size(component, seen) for component in components.values())
+
+    if isinstance(obj, dict):
+        return sum(estimate_size(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size(value, seen) for value in obj)
+    return 0
+
+
+def _release_memory():
+    """Rend la mémoire des modèles libérés (GC + cache CUDA si torch est chargé)"""
+    gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class ModelRegistry:
+    """Modèles chargés une fois par clé, comptés en références, évincés en LRU sous budget"""
+
+    def __init__(self, budget_bytes: Optional[int] = None):
+        self.budget_bytes = budget_bytes
+        self.models: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._loads: Dict[str, int] = {}
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._loading.setdefault(key, threading.Lock())
+
+    # ---------------------------------------------
+    # Chargement et références
+    # ---------------------------------------------
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Dict:
+        with self._lock:
+            entry = self.models.get(key)
+            if entry is not None:
+                return entry
+
+        # Un seul chargement par clé, les autres appelants attendent
+        with self._key_lock(key):
+            with self._lock:
+                entry = self.models.get(key)
+                if entry is not None:
+                    return entry
+
+            print(f"📦 [MODELS] Chargement de {key}...")
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            size = estimate_size(model)
+
+            with self._lock:
+                entry = self.models[key] = {
+                    'model': model,
+                    'size_bytes': size,
+                    'refs': 0,
+                    'loads': self._loads.get(key, 0) + 1,
+                    'loaded_at': time.time(),
+                    'last_used': time.time(),
+                    'load_seconds': round(load_seconds, 2)
+                }
+                self._loads[key] = entry['loads']
+            MODEL_LOADS.inc(model=key)
+            MODEL_RESIDENT_BYTES.set(size, model=key)
+            print(f"✅ [MODELS] {key} chargé ({size / MB:.0f} Mo, {load_seconds:.1f}s)")
+
+        self.enforce_budget(protect=key)
+        return entry
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Modèle résident (chargé si absent), sans l'épingler"""
+        entry = self._load(key, loader)
+        with self._lock:
+            entry['last_used'] = time.time()
+        return entry['model']
+
+    def peek(self, key: Optional[str]) -> Any:
+        """Modèle s'il est résident, sinon None (ne charge jamais)"""
+        with self._lock:
+            entry = self.models.get(key) if key else None
+            return entry['model'] if entry else None
+
+    def acquire(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Modèle épinglé: jamais évincé avant le release() correspondant"""
+        while True:
+            entry = self._load(key, loader)
+            with self._lock:
+                # Évincé entre le chargement et l'épinglage: on recharge
+                if self.models.get(key) is entry:
+                    entry['refs'] += 1
+                    entry['last_used'] = time.time()
+                    return entry['model']
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self.models.get(key)
+            if entry is None:
+                return
+            entry['refs'] = max(entry['refs'] - 1, 0)
+            entry['last_used'] = time.time()
+        self.enforce_budget()
+
+    @contextmanager
+    def use(self, key: str, loader: Callable[[], Any]):
+        """with registry.use(key, loader) as model: ... (épinglé pendant le bloc)"""
+        model = self.acquire(key, loader)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    # ---------------------------------------------
+    # Budget mémoire
+    # ---------------------------------------------
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry['size_bytes'] for entry in self.models.values())
+
+    def evict(self, key: str) -> bool:
+        """Libère un modèle non épinglé"""
+        with self._lock:
+            entry = self.models.get(key)
+            if entry is None or entry['refs'] > 0:
+                return False
+            del self.models[key]
+        MODEL_EVICTIONS.inc(model=key)
+        MODEL_RESIDENT_BYTES.set(0, model=key)
+        print(f"♻️ [MODELS] {key} libéré ({entry['size_bytes'] / MB:.0f} Mo)")
+        del entry
+        _release_memory()
+        return True
+
+    def enforce_budget(self, protect: Optional[str] = None):
+        """Évince les modèles non épinglés les moins récemment utilisés jusqu'à tenir le budget"""
+        if not self.budget_bytes:
+            return
+        while self.resident_bytes() > self.budget_bytes:
+            with self._lock:
+                candidates = sorted(
+                    (entry['last_used'], key) for key, entry in self.models.items()
+                    if entry['refs'] == 0 and key != protect
+                )
+            if not candidates:
+                print(f"⚠️ [MODELS] Budget dépassé ({self.resident_bytes() / MB:.0f} Mo > "
+                      f"{self.budget_bytes / MB:.0f} Mo), tous les modèles restants sont utilisés")
+                return
+            self.evict(candidates[0][1])
+
+    def configure(self, budget_bytes: Optional[int]):
+        self.budget_bytes = budget_bytes
+        self.enforce_budget()
+
+    # ---------------------------------------------
+    # Rapport
+    # ---------------------------------------------
+
+    def report(self) -> Dict:
+        """Taille résidente, références et dernier usage de chaque modèle"""
+        now = time.time()
+        with self._lock:
+            models = {
+                key: {
+                    'size_mb': round(entry['size_bytes'] / MB, 1),
+                    'refs': entry['refs'],
+                    'loads': entry['loads'],
+                    'load_seconds': entry['load_seconds'],
+                    'idle_seconds': round(now - entry['last_used'], 1)
+                }
+                for key, entry in self.models.items()
+            }
+        return {
+            'budget_mb': round(self.budget_bytes / MB, 1) if self.budget_bytes else None,
+            'resident_mb': round(self.resident_bytes() / MB, 1),
+            'models': models
+        }
+
+
+# ============================================
+# MODÈLES PARTAGÉS ENTRE GÉNÉRATEURS
+# ============================================
+
+# Modèles (codellama, qwen...) servis en int8 dynamique sur CPU
+CPU_INT8_MODELS = {
+    name.strip().lower() for name in os.environ.get('KIBALI_CPU_INT8', '').split(',') if name.strip()
+}
+
+
+def cpu_quantization(name: str, device: str) -> Optional[str]:
+    """'int8' si le modèle `name` est configuré pour l'inférence quantifiée et tourne sur CPU"""
+    if device != "cpu":
+        return None
+    if CPU_INT8_MODELS & {'all', '*', name.lower()}:
+        return 'int8'
+    return None
+
+
+def quantize_dynamic_int8(model):
+    """Couches Linear en int8 dynamique (poids int8, activations quantifiées à la volée), CPU uniquement"""
+    import torch
+    try:
+        from torch.ao.quantization import quantize_dynamic
+    except ImportError:
+        from torch.quantization import quantize_dynamic
+
+    # quantize_dynamic part de poids float32 (Qwen est stocké en float16)
+    return quantize_dynamic(model.float(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def causal_lm_key(path, device: str, quantize: Optional[str] = None) -> str:
+    key = f"causal-lm:{path}:{device}"
+    return f"{key}:{quantize}" if quantize else key
+
+
+def load_causal_lm(path, device: str, quantize: Optional[str] = None, dtype=None) -> Dict:
+    """
+    Tokenizer + modèle causal local (CodeLlama, Qwen...), en eval sur `device`.
+    quantize='int8': Linear en int8 dynamique (CPU); `dtype` force la
+    précision de chargement (défaut float16 sur CUDA, float32 sur CPU)
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    if quantize and device != "cpu":
+        raise ValueError(f"Quantification {quantize} disponible uniquement sur CPU (device={device})")
+    if dtype is None:
+        dtype = torch.float16 if device == "cuda" else torch.float32
+
+    tokenizer = AutoTokenizer.from_pretrained(str(path), trust_remote_code=True, local_files_only=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        str(path),
+        trust_remote_code=True,
+        local_files_only=True,
+        torch_dtype=dtype,
+        device_map="auto" if device == "cuda" else None,
+        low_cpu_mem_usage=True
+    )
+    if device == "cpu":
+        model = model.to(device)
+    model.eval()
+    if quantize == 'int8':
+        model = quantize_dynamic_int8(model)
+    elif quantize:
+        raise ValueError(f"Quantification inconnue: {quantize}")
+    return {'tokenizer': tokenizer, 'model': model}
+
+
+STABLE_DIFFUSION_15 = "runwayml/stable-diffusion-v1-5"
+
+
+def stable_diffusion_key(device: str, model_id: str = STABLE_DIFFUSION_15) -> str:
+    return f"stable-diffusion:{model_id}:{device}"
+
+
+def load_stable_diffusion(device: str, model_id: str = STABLE_DIFFUSION_15):
+    import torch
+    from diffusers import StableDiffusionPipeline
+
+    return StableDiffusionPipeline.from_pretrained(
+        model_id,
+        torch_dtype=torch.float16 if device == "cuda" else torch.float32,
+    ).to(device)
+
+
+def sdxl_key(device: str) -> str:
+    return f"sdxl-base-1.0:{device}"
+
+
+# Registre du process
+model_registry = ModelRegistry(_default_budget())
+
+
+# ============================================
+# BENCHMARK INFÉRENCE CPU
+# ============================================
+
+# Mode → (quantize, dtype) de load_causal_lm
+BENCHMARK_MODES = {
+    'float32': (None, 'float32'),   # chemin actuel de CodeLlama sur CPU
+    'float16': (None, 'float16'),   # chemin actuel de Qwen (grease pencil)
+    'int8': ('int8', None)
+}
+
+BENCHMARK_PROMPT = "// Three.js: create a low poly tree with a trunk and leaves\nconst tree = new THREE.Group();\n"
+
+
+def _rss_bytes() -> Optional[int]:
+    """RSS courant du process (Linux, /proc/self/statm)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _TokenTimer:
+    """Streamer generate(): horodate le premier token et compte les tokens produits"""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+        self.first_token_at = None
+
+    def put(self, value):
+        # Premier appel: le prompt; ensuite un token par pas de décodage
+        self.calls += 1
+        if self.calls == 1:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += value.numel()
+
+    def end(self):
+        pass
+
+
+def _benchmark_mode(path, mode: str, prompt: str, max_new_tokens: int, threads: Optional[int]) -> Dict:
+    """Une mesure dans un process neuf: RSS sans les poids des autres modes"""
+    import resource
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    quantize, dtype = BENCHMARK_MODES[mode]
+    rss_before = _rss_bytes()
+
+    start = time.perf_counter()
+    loaded = load_causal_lm(path, "cpu", quantize=quantize, dtype=getattr(torch, dtype) if dtype else None)
+    load_seconds = time.perf_counter() - start
+    tokenizer, model = loaded['tokenizer'], loaded['model']
+
+    inputs = tokenizer([prompt], return_tensors="pt")
+    settings = dict(do_sample=False, pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id)
+    with torch.no_grad():
+        # Préchauffage (allocations, noyaux) hors mesure
+        model.generate(**inputs, max_new_tokens=2, **settings)
+
+        timer = _TokenTimer()
+        start = time.perf_counter()
+        model.generate(**inputs, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens,
+                       streamer=timer, **settings)
+        total = time.perf_counter() - start
+
+    first_token = (timer.first_token_at - start) if timer.first_token_at else total
+    decode = total - first_token
+    rss = _rss_bytes()
+    return {
+        'mode': mode,
+        'load_s': round(load_seconds, 1),
+        'size_mb': round(estimate_size(model) / MB),
+        'first_token_ms': round(first_token * 1000),
+        'tokens': timer.tokens,
+        'tokens_per_s': round(timer.tokens / total, 2) if total else None,
+        'decode_tokens_per_s': round((timer.tokens - 1) / decode, 2) if decode > 0 and timer.tokens > 1 else None,
+        'rss_mb': round((rss - rss_before) / MB) if rss and rss_before else None,
+        # ru_maxrss: Ko sous Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    }
+
+
+def benchmark_causal_lm(path, modes=('float32', 'int8'), prompt: str = BENCHMARK_PROMPT,
+                        max_new_tokens: int = 64, threads: Optional[int] = None) -> List[Dict]:
+    """
+    Compare les modes d'inférence CPU d'un LLM local (chaque mode dans un
+    process séparé): temps de chargement, latence du premier token (prompt
+    compris), tokens/s (total et décodage seul), RSS ajoutée par le modèle
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for mode in modes:
+        if mode not in BENCHMARK_MODES:
+            raise ValueError(f"Mode inconnu: {mode} (modes: {', '.join(BENCHMARK_MODES)})")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.append(pool.submit(_benchmark_mode, str(path), mode, prompt, max_new_tokens, threads).result())
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark inférence CPU d'un LLM de code local")
+    parser.add_argument('model_path')
+    parser.add_argument('--modes', default='float32,int8', help=f"parmi {','.join(BENCHMARK_MODES)}")
+    parser.add_argument('--tokens', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"🧠 KIBALI MODELS - Benchmark CPU ({args.tokens} tokens, glouton)")
+    print("=" * 96)
+    print(f"{'mode':>8} {'charg. s':>9} {'poids Mo':>9} {'1er token ms':>13} {'tok/s':>8} "
+          f"{'décodage tok/s':>15} {'RSS Mo':>8} {'pic RSS Mo':>11}")
+    for row in benchmark_causal_lm(args.model_path, args.modes.split(','), max_new_tokens=args.tokens,
+                                   threads=args.threads):
+        print(f"{row['mode']:>8} {row['load_s']:>9} {row['size_mb']:>9} {row['first_token_ms']:>13} "
+              f"{row['tokens_per_s']:>8} {str(row['decode_tokens_per_s']):>15} {str(row['rss_mb']):>8} "
+              f"{row['peak_rss_mb']:>11}")
@@ -9,12 +9,126 @@ Comme un réalisateur de film qui coordonne tous les départements
 import re
 from typing import List, Dict, Optional
 from kibali_tools_registry import ALL_TOOLS_DEFINITIONS
+from kibali_matcher import fold_text
+from kibali_plan_cache import PROMPT_SLOT, PlanCache, plan_key, rebind_prompt, tables_fingerprint
+from kibali_latency import LatencyModel, latency_model
+from kibali_plan_optimizer import optimize_plan
+
+# Mots-clés par intention (comparés sans accents ni majuscules)
+INTENT_KEYWORDS = {
+    'character': ['personnage', 'character', 'humain', 'héros'],
+    'environment': ['terrain', 'environnement', 'scène', 'forêt', 'ville'],
+    'walk': ['marche', 'walk', 'court', 'run', 'bouge'],
+    'jump': ['saut', 'saute', 'jump'],
+    'orbit': ['orbite', '360', 'tourne autour', 'film'],
+    'view': ['vue de face', 'vue de haut', 'isométrique'],
+    'optimize': ['optimise', 'optimize', 'allège'],
+    'export': ['export', 'sauvegarde', 'save']
+}
+
+# Nombres à garder tels quels dans la clé de cache (ex: '360')
+NUMERIC_KEYWORDS = frozenset(
+    digits for keywords in INTENT_KEYWORDS.values() for kw in keywords for digits in re.findall(r'\d+', kw)
+)
+
+# Étapes de production: une étape dépend des étapes du stade précédent le
+# plus proche. Les outils caméra (absents de la table) sont indépendants.
+STEP_STAGES = {
+    'MeshyGenerate': 0,
+    'RealisticGenerate': 0,
+    'ProceduralGenerate': 0,
+    'AdvancedGenerate': 1,      # rigging
+    'OrganicMovement': 2,
+    'GenerateAnimation': 2,
+    'KeyframesCreate': 2,
+    'TextureGenerate': 3,
+    'OptimizeMesh': 3,
+    'ExportGLTF': 4,
+    'ExportOBJ': 4
+}
+
+
+def link_dependencies(steps: List[Dict]) -> None:
+    """
+    Renseigne step['depends_on'] (numéros d'étapes) selon STEP_STAGES
+    
+    Un outil inconnu dépend de toutes les étapes qui le précèdent.
+    """
+    for index, step in enumerate(steps):
+        previous = steps[:index]
+        tool = step['tool']
+        
+        if tool.startswith('Camera'):
+            step['depends_on'] = []
+            continue
+        
+        if tool not in STEP_STAGES:
+            step['depends_on'] = [s['step'] for s in previous]
+            continue
+        
+        stage = STEP_STAGES[tool]
+        lower = [STEP_STAGES[s['tool']] for s in previous if STEP_STAGES.get(s['tool'], stage) < stage]
+        nearest = max(lower, default=None)
+        step['depends_on'] = [s['step'] for s in previous if STEP_STAGES.get(s['tool']) == nearest] if lower else []
+
+
+def critical_path_time(steps: List[Dict]) -> float:
+    """Temps estimé du chemin critique (étapes indépendantes en parallèle)"""
+    finish = {}
+    for step in steps:
+        start = max((finish.get(dep, 0) for dep in step.get('depends_on', [])), default=0)
+        finish[step['step']] = start + step.get('estimated_time', 0)
+    return max(finish.values(), default=0)
+
+
+def schedule_order(steps: List[Dict]) -> List[int]:
+    """
+    Ordre de démarrage: à disponibilité égale, les étapes en tête des
+    chaînes les plus longues (durée restante jusqu'à la fin du plan) d'abord
+    """
+    dependents = {step['step']: [] for step in steps}
+    for step in steps:
+        for dep in step.get('depends_on', []):
+            dependents.setdefault(dep, []).append(step['step'])
+    
+    durations = {step['step']: step.get('estimated_time', 0) for step in steps}
+    tail = {}
+    for step in reversed(steps):
+        number = step['step']
+        tail[number] = durations[number] + max((tail.get(d, 0) for d in dependents[number]), default=0)
+    
+    return sorted(tail, key=lambda number: (-tail[number], number))
+
+
+def apply_latency_model(plan: Dict, model: LatencyModel = latency_model) -> Dict:
+    """Remplace les durées codées en dur par les durées mesurées et calcule l'ordre de démarrage"""
+    for step in plan['steps']:
+        measured = model.is_measured(step['tool'])
+        step['estimated_time'] = model.estimate(step['tool'], step['estimated_time'])
+        step['estimate_source'] = 'measured' if measured else 'default'
+    
+    plan['estimated_time'] = round(sum(step['estimated_time'] for step in plan['steps']), 3)
+    plan['critical_path_time'] = round(critical_path_time(plan['steps']), 3)
+    plan['schedule'] = schedule_order(plan['steps'])
+    return plan
+
+
+# Plans complets par forme de prompt (voir kibali_plan_cache)
+PLAN_CACHE = PlanCache('orchestrator', max_entries=512)
+
+
+def _has_intent(text: str, intent: str) -> bool:
+    """Le texte (déjà normalisé) contient un des mots-clés de l'intention"""
+    return any(fold_text(kw) in text for kw in INTENT_KEYWORDS[intent])
+
 
 class KibaliOrchestrator:
     """Orchestrateur intelligent qui utilise les 48 outils"""
     
     def __init__(self):
         self.tools = {tool['name']: tool for tool in ALL_TOOLS_DEFINITIONS}
+        self.plan_cache = PLAN_CACHE
+        self.plan_cache.ensure_version(tables_fingerprint(INTENT_KEYWORDS))
         print(f"🎭 Orchestrateur initialisé avec {len(self.tools)} outils")
     
     def analyze_and_orchestrate(self, prompt: str) -> Dict:
@@ -34,8 +148,24 @@ class KibaliOrchestrator:
                 },
                 'execution_log': []  # Rempli en temps réel
             }
+        
+        Chaque étape porte 'depends_on' (numéros des étapes à attendre) et le
+        plan son 'critical_path_time' et son 'schedule' (ordre de démarrage).
+        Les durées viennent du modèle de latence (kibali_latency) dès que
+        l'outil a été mesuré, sinon des valeurs par défaut ci-dessous.
+        
+        Le plan est mis en cache par forme de prompt (plan_key) et le prompt
+        réel est réinjecté dans une copie à chaque appel.
         """
-        prompt_lower = prompt.lower()
+        key = plan_key(prompt, NUMERIC_KEYWORDS)
+        cached = self.plan_cache.get_or_compute(key, lambda: self._build_plan(key))
+        result = rebind_prompt(cached, PROMPT_SLOT, prompt)
+        apply_latency_model(result['plan'])
+        return result
+    
+    def _build_plan(self, prompt_lower: str) -> Dict:
+        """Construit le plan pour un prompt normalisé (PROMPT_SLOT tient lieu de prompt)"""
+        prompt = PROMPT_SLOT
         
         # Détecte l'intention principale
         plan = {
@@ -45,7 +175,7 @@ class KibaliOrchestrator:
         }
         
         # CRÉATION DE PERSONNAGE
-        if any(kw in prompt_lower for kw in ['personnage', 'character', 'humain', 'héros']):
+        if _has_intent(prompt_lower, 'character'):
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
                 'tool': 'RealisticGenerate',
@@ -60,7 +190,7 @@ class KibaliOrchestrator:
             plan['estimated_time'] += 10
         
         # ENVIRONNEMENT
-        if any(kw in prompt_lower for kw in ['terrain', 'environnement', 'scène', 'forêt', 'ville']):
+        if _has_intent(prompt_lower, 'environment'):
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
                 'tool': 'RealisticGenerate',
@@ -75,7 +205,7 @@ class KibaliOrchestrator:
             plan['estimated_time'] += 8
         
         # ANIMATION - MARCHE
-        if any(kw in prompt_lower for kw in ['marche', 'walk', 'court', 'run', 'bouge']):
+        if _has_intent(prompt_lower, 'walk'):
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
                 'tool': 'OrganicMovement',
@@ -90,7 +220,7 @@ class KibaliOrchestrator:
             plan['estimated_time'] += 3
         
         # ANIMATION - SAUT
-        if any(kw in prompt_lower for kw in ['saut', 'saute', 'jump']):
+        if _has_intent(prompt_lower, 'jump'):
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
                 'tool': 'GenerateAnimation',
@@ -120,12 +250,12 @@ class KibaliOrchestrator:
             }
             # Insère avant les animations
             anim_index = next((i for i, s in enumerate(plan['steps']) if 'Animation' in s['tool'] or 'Movement' in s['tool']), None)
-            if anim_index:
+            if anim_index is not None:
                 plan['steps'].insert(anim_index, rigging_step)
                 plan['estimated_time'] += 5
         
         # CAMÉRA - Orbite
-        if any(kw in prompt_lower for kw in ['orbite', '360', 'tourne autour', 'film']):
+        if _has_intent(prompt_lower, 'orbit'):
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
                 'tool': 'CameraOrbit360',
@@ -140,7 +270,7 @@ class KibaliOrchestrator:
             plan['estimated_time'] += 1
         
         # CAMÉRA - Vue spécifique
-        if any(kw in prompt_lower for kw in ['vue de face', 'vue de haut', 'isométrique']):
+        if _has_intent(prompt_lower, 'view'):
             preset = 'iso' if 'iso' in prompt_lower else ('top' if 'haut' in prompt_lower else 'front')
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
@@ -152,7 +282,7 @@ class KibaliOrchestrator:
             plan['estimated_time'] += 1
         
         # OPTIMISATION
-        if any(kw in prompt_lower for kw in ['optimise', 'optimize', 'allège']):
+        if _has_intent(prompt_lower, 'optimize'):
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
                 'tool': 'OptimizeMesh',
@@ -166,7 +296,7 @@ class KibaliOrchestrator:
             plan['estimated_time'] += 2
         
         # EXPORT
-        if any(kw in prompt_lower for kw in ['export', 'sauvegarde', 'save']):
+        if _has_intent(prompt_lower, 'export'):
             format_type = 'gltf' if 'gltf' in prompt_lower or 'glb' in prompt_lower else 'obj'
             plan['steps'].append({
                 'step': len(plan['steps']) + 1,
@@ -183,6 +313,9 @@ class KibaliOrchestrator:
         for i, step in enumerate(plan['steps']):
             step['step'] = i + 1
         
+        # Dépendances entre étapes: l'executor lance les étapes indépendantes en parallèle
+        link_dependencies(plan['steps'])
+        
         # Détermine complexité
         if len(plan['steps']) > 5:
             plan['complexity'] = 'high'
@@ -208,11 +341,21 @@ class KibaliOrchestrator:
 # FONCTION PRINCIPALE POUR API
 # ============================================
 
+# Instance partagée (le cache de plans est par process)
+_shared_orchestrator: Optional[KibaliOrchestrator] = None
+
 def orchestrate_prompt(prompt: str) -> Dict:
     """Point d'entrée: analyse et crée le plan d'orchestration"""
-    orchestrator = KibaliOrchestrator()
+    global _shared_orchestrator
+    if _shared_orchestrator is None:
+        _shared_orchestrator = KibaliOrchestrator()
+    orchestrator = _shared_orchestrator
     result = orchestrator.analyze_and_orchestrate(prompt)
     
+    # Passe d'optimisation avant exécution (fusions caméra/génération, doublons)
+    optimize_plan(result['plan'])
+    apply_latency_model(result['plan'])
+    
     # Ajoute les descriptions des outils
     for step in result['plan']['steps']:
         step['tool_description'] = orchestrator.get_tool_description(step['tool'])
@@ -242,11 +385,12 @@ if __name__ == "__main__":
         
         if result['understood']:
             print(f"✅ Plan: {len(result['plan']['steps'])} étapes")
-            print(f"⏱️  Temps estimé: {result['plan']['estimated_time']}s")
+            print(f"⏱️  Temps estimé: {result['plan']['estimated_time']}s (chemin critique: {result['plan']['critical_path_time']}s)")
             print(f"🎯 Complexité: {result['plan']['complexity']}")
             print("\n📋 Étapes:")
             for step in result['plan']['steps']:
-                print(f"   {step['step']}. {step['tool']}: {step['reason']}")
+                deps = f" (après {step['depends_on']})" if step['depends_on'] else ""
+                print(f"   {step['step']}. {step['tool']}: {step['reason']}{deps}")
         else:
             print("❌ Prompt non compris")
     
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+🗂️ KIBALI PLAN CACHE - Cache LRU des plans du dispatcher et de l'orchestrateur
+===============================================================================
+Les mêmes prompts ("caméra orbite 360", "vide la scène", "crée 5 arbres")
+reviennent sans cesse: l'analyse par mots-clés est faite une fois par forme
+de prompt, puis servie depuis un cache LRU borné.
+
+Clé de cache (plan_key):
+- minuscules, accents retirés, espaces compactés
+- nombres remplacés par '#' ("crée 5 arbres" et "crée 12 arbres" partagent
+  la clé "cree # arbres"), sauf les nombres qui contiennent un mot-clé
+  numérique des tables (ex: '360')
+
+Les analyseurs reconnaissent les mots-clés SUR cette clé: la partie cachée
+du plan ne dépend que de la clé, et les nombres / le prompt d'origine sont
+réinjectés à chaque appel.
+
+Les plans sont construits avec PROMPT_SLOT à la place du prompt, puis
+rebind_prompt() y replace le prompt réel à chaque lecture.
+
+Invalidation: invalidate() vide le cache; ensure_version() le vide
+automatiquement si l'empreinte des tables de patterns a changé.
+"""
+
+import copy
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from kibali_matcher import fold_text
+
+_NUMBER_RE = re.compile(r'\d+')
+_SPACE_RE = re.compile(r'\s+')
+
+# Marqueur du prompt dans les plans mis en cache
+PROMPT_SLOT = '\x00prompt\x00'
+
+# Tous les caches du process (rapport / invalidation globale)
+_caches: Dict[str, 'PlanCache'] = {}
+
+
+def plan_key(prompt: str, keep_numbers: Iterable[str] = ()) -> str:
+    """Forme normalisée d'un prompt: sans accents, espaces compactés, nombres paramétrés"""
+    keep = set(keep_numbers)
+    text = _SPACE_RE.sub(' ', fold_text(prompt or '')).strip()
+    def parameterize(match):
+        digits = match.group(0)
+        return digits if any(k in digits for k in keep) else '#'
+
+    return _NUMBER_RE.sub(parameterize, text)
+
+
+def tables_fingerprint(*tables) -> str:
+    """Empreinte des tables de patterns (change dès qu'un mot-clé/priorité change)"""
+    payload = json.dumps(tables, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def rebind_prompt(value: Any, old_prompt: str, new_prompt: str) -> Any:
+    """Copie profonde où chaque chaîne égale à l'ancien prompt est remplacée par le nouveau"""
+    if old_prompt == new_prompt:
+        return copy.deepcopy(value)
+    if isinstance(value, dict):
+        return {k: rebind_prompt(v, old_prompt, new_prompt) for k, v in value.items()}
+    if isinstance(value, list):
+        return [rebind_prompt(v, old_prompt, new_prompt) for v in value]
+    if isinstance(value, str) and value == old_prompt:
+        return new_prompt
+    return copy.deepcopy(value)
+
+
+class PlanCache:
+    """Cache LRU borné, thread-safe, avec compteurs hit/miss"""
+
+    def __init__(self, name: str, max_entries: int = 512):
+        self.name = name
+        self.max_entries = max_entries
+        self.version = None
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        _caches[name] = self
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Retourne l'entrée de `key`, calculée par compute() au premier appel"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+            self.stats['misses'] += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return value
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Supprime une clé, ou tout le cache si key est None"""
+        with self._lock:
+            if key is not None:
+                removed = 1 if self._entries.pop(key, None) is not None else 0
+            else:
+                removed = len(self._entries)
+                self._entries.clear()
+            self.stats['invalidations'] += removed
+        return removed
+
+    def ensure_version(self, version: str):
+        """Vide le cache si les tables de patterns ont changé depuis le dernier appel"""
+        if version != self.version:
+            if self.version is not None:
+                print(f"🗂️ [PLAN CACHE] {self.name}: tables modifiées, cache invalidé")
+            self.invalidate()
+            self.version = version
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else None,
+                'version': self.version
+            }
+
+
+def report() -> Dict[str, Dict]:
+    """Stats de tous les caches de plans"""
+    return {name: cache.get_stats() for name, cache in _caches.items()}
+
+
+def invalidate_all() -> int:
+    """Vide tous les caches de plans, retourne le nombre d'entrées supprimées"""
+    return sum(cache.invalidate() for cache in list(_caches.values()))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+🧹 KIBALI PLAN OPTIMIZER - Passe d'optimisation des plans orchestrés
+=====================================================================
+Entre l'orchestration (analyze_and_orchestrate) et l'exécution, le plan
+est réécrit pour émettre moins d'appels HTTP:
+
+1. Déduplication: deux étapes identiques (même outil, mêmes paramètres)
+   n'en font qu'une, pour les seuls outils de génération idempotents
+   (DEDUPLICATED_TOOLS). Caméra, animation et modifications de scène sont
+   relatives à l'état courant: deux CameraZoom x2 font un zoom x4
+2. Génération groupée: les RealisticGenerate du même prompt (personnage +
+   environnement) deviennent un seul appel avec params['types']
+3. Séquences caméra: les étapes Camera* consécutives (une requête
+   /api/camera-control chacune) deviennent une étape CameraSequence
+   compilée en une timeline par /api/camera-batch
+4. Renumérotation: steps 1..n, depends_on réécrits vers les étapes
+   conservées
+
+Le plan optimisé garde le même format; plan['optimization'] résume les
+fusions et le nombre d'appels économisés, step['merged_from'] liste les
+numéros (plan d'origine) des étapes fusionnées.
+"""
+
+import json
+from typing import Dict, List
+
+# Outils caméra exécutés un par un sur /api/camera-control
+CAMERA_STEP_TOOLS = {
+    'CameraOrbit360', 'CameraMove', 'CameraRotate', 'CameraFlyTo', 'CameraLookAt',
+    'CameraZoom', 'CameraPan', 'CameraShake', 'CameraPreset', 'CameraStop', 'CameraAnimation'
+}
+
+# Outils idempotents: rejouer les mêmes paramètres redonne le même résultat
+DEDUPLICATED_TOOLS = {
+    'MeshyGenerate', 'RealisticGenerate', 'AdvancedGenerate', 'ProceduralGenerate', 'TextureGenerate'
+}
+
+QUALITY_ORDER = ['low', 'medium', 'high']
+
+
+def _invocation_key(step: Dict) -> str:
+    return json.dumps([step['tool'], step.get('params', {})], sort_keys=True, default=str)
+
+
+def _depends(step: Dict, other: Dict, steps_by_number: Dict[int, Dict]) -> bool:
+    """True si `step` dépend (transitivement) de `other`"""
+    pending = list(step.get('depends_on', []))
+    seen = set()
+    while pending:
+        number = pending.pop()
+        if number == other['step']:
+            return True
+        if number in seen or number not in steps_by_number:
+            continue
+        seen.add(number)
+        pending.extend(steps_by_number[number].get('depends_on', []))
+    return False
+
+
+def _absorb(target: Dict, step: Dict, aliases: Dict[int, int]):
+    """Fusionne `step` dans `target` (dépendances, durée estimée, traçabilité)"""
+    aliases[step['step']] = target['step']
+    target['depends_on'] = sorted(set(target.get('depends_on', [])) | set(step.get('depends_on', [])))
+    target['estimated_time'] = target.get('estimated_time', 0) + step.get('estimated_time', 0)
+    target.setdefault('merged_from', [target['step']]).append(step['step'])
+
+
+def deduplicate(steps: List[Dict], aliases: Dict[int, int], notes: List[str]) -> List[Dict]:
+    kept, seen = [], {}
+    for step in steps:
+        if step['tool'] not in DEDUPLICATED_TOOLS:
+            kept.append(step)
+            continue
+        key = _invocation_key(step)
+        if key in seen:
+            aliases[step['step']] = seen[key]['step']
+            notes.append(f"Étape {step['step']} ({step['tool']}) identique à l'étape {seen[key]['step']}: supprimée")
+            continue
+        seen[key] = step
+        kept.append(step)
+    return kept
+
+
+def merge_generations(steps: List[Dict], aliases: Dict[int, int], notes: List[str]) -> List[Dict]:
+    by_number = {step['step']: step for step in steps}
+    position = {step['step']: index for index, step in enumerate(steps)}
+    kept, groups = [], {}
+    for step in steps:
+        prompt = step.get('params', {}).get('prompt')
+        group = groups.get(prompt) if step['tool'] == 'RealisticGenerate' else None
+        # Fusion possible si l'étape ne dépend pas du groupe ni d'une étape placée après lui
+        if group is not None and not _depends(step, group, by_number) and all(
+                position.get(dep, 0) < position[group['step']] for dep in step.get('depends_on', [])):
+            params = group['params']
+            types = params.setdefault('types', [params.get('type', 'character')])
+            if step['params'].get('type', 'character') not in types:
+                types.append(step['params'].get('type', 'character'))
+            qualities = [params.get('quality', 'medium'), step['params'].get('quality', 'medium')]
+            params['quality'] = max(qualities, key=lambda q: QUALITY_ORDER.index(q) if q in QUALITY_ORDER else 0)
+            group['reason'] = f"{group['reason']} + {step['reason']}"
+            _absorb(group, step, aliases)
+            notes.append(f"Étape {step['step']} (RealisticGenerate {step['params'].get('type')}) groupée avec l'étape {group['step']}")
+            continue
+        if step['tool'] == 'RealisticGenerate':
+            groups.setdefault(prompt, step)
+        kept.append(step)
+    return kept
+
+
+def merge_camera_runs(steps: List[Dict], aliases: Dict[int, int], notes: List[str]) -> List[Dict]:
+    kept = []
+    for step in steps:
+        previous = kept[-1] if kept else None
+        if step['tool'] in CAMERA_STEP_TOOLS and previous is not None and (
+                previous['tool'] in CAMERA_STEP_TOOLS or previous.get('camera_sequence')):
+            if not previous.get('camera_sequence'):
+                # Première fusion: l'étape précédente devient la séquence
+                first = dict(previous)
+                previous.clear()
+                previous.update({
+                    'step': first['step'],
+                    'tool': 'CameraSequence',
+                    'params': {'commands': [{'tool': first['tool'], 'params': first.get('params', {})}]},
+                    'reason': f"Séquence caméra: {first['reason']}",
+                    'estimated_time': first.get('estimated_time', 0),
+                    'depends_on': first.get('depends_on', []),
+                    'camera_sequence': True
+                })
+            previous['params']['commands'].append({'tool': step['tool'], 'params': step.get('params', {})})
+            previous['reason'] += f" → {step['reason']}"
+            _absorb(previous, step, aliases)
+            notes.append(f"Étape {step['step']} ({step['tool']}) ajoutée à la séquence caméra de l'étape {previous['step']}")
+            continue
+        kept.append(step)
+    for step in kept:
+        step.pop('camera_sequence', None)
+    return kept
+
+
+def renumber(steps: List[Dict], aliases: Dict[int, int]) -> List[Dict]:
+    """Numéros 1..n et dépendances réécrites vers les étapes conservées"""
+    def resolve(number):
+        while number in aliases:
+            number = aliases[number]
+        return number
+
+    numbering = {step['step']: index + 1 for index, step in enumerate(steps)}
+    for step in steps:
+        old_number = step['step']
+        deps = {numbering[resolve(dep)] for dep in step.get('depends_on', []) if resolve(dep) in numbering}
+        deps.discard(numbering[old_number])
+        step['step'] = numbering[old_number]
+        if 'depends_on' in step:
+            step['depends_on'] = sorted(deps)
+        if 'merged_from' in step:
+            step['merged_from'] = sorted(set(step['merged_from']))
+    return steps
+
+
+def optimize_plan(plan: Dict) -> Dict:
+    """Réécrit plan['steps'] (en place) et renseigne plan['optimization']"""
+    original = len(plan['steps'])
+    aliases: Dict[int, int] = {}
+    notes: List[str] = []
+
+    steps = [dict(step, params=dict(step.get('params', {}))) for step in plan['steps']]
+    steps = deduplicate(steps, aliases, notes)
+    steps = merge_generations(steps, aliases, notes)
+    steps = merge_camera_runs(steps, aliases, notes)
+    plan['steps'] = renumber(steps, aliases)
+
+    plan['optimization'] = {
+        'original_steps': original,
+        'steps': len(plan['steps']),
+        'http_calls_saved': original - len(plan['steps']),
+        'changes': notes
+    }
+    return plan
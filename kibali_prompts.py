@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+🧾 KIBALI PROMPTS - Registre de templates de prompts précompilés
+=================================================================
+Les longs prompts (système du chat, analyse d'intention, analyse/génération
+hybride, auto-correction) sont enregistrés une seule fois au chargement du
+module: le template est découpé en segments littéraux / champs, la partie
+statique en tête (préfixe) est mesurée en tokens et identifiée par une
+empreinte SHA-256.
+
+- L'assemblage par appel se résume à un ''.join() des segments
+  (durée mesurée par template, voir report())
+- L'empreinte du préfixe permet aux backends avec cache de préfixe
+  (KV cache, prompt caching) de réutiliser le calcul du préfixe commun
+- Les templates placent le contenu variable (prompt, contexte) APRÈS les
+  instructions statiques pour maximiser ce préfixe
+
+Syntaxe: celle de str.format ({champ}, {{ et }} pour les accolades).
+"""
+
+import hashlib
+import re
+import threading
+import time
+from string import Formatter
+from typing import Callable, Dict, List, Optional
+
+# Approximation sans tokenizer: mots, nombres et ponctuation (≈ BPE sur du FR/EN)
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation rapide du nombre de tokens"""
+    return len(_TOKEN_RE.findall(text))
+
+
+class PromptTemplate:
+    """Template compilé: segments littéraux/champs + préfixe statique mesuré"""
+
+    def __init__(self, name: str, template: str, count_tokens: Callable[[str], int] = estimate_tokens):
+        self.name = name
+        self.template = template
+        self.segments: List[tuple] = []  # (littéral, champ | None)
+        self.fields: List[str] = []
+
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if field is not None and (spec or conversion):
+                raise ValueError(f"Template '{name}': format/conversion non supporté pour {{{field}}}")
+            if field == '' or (field is not None and not field.isidentifier()):
+                raise ValueError(f"Template '{name}': champ invalide {{{field}}}")
+            self.segments.append((literal, field))
+            if field is not None and field not in self.fields:
+                self.fields.append(field)
+
+        # Préfixe statique: tout le texte avant le premier champ
+        prefix = []
+        for literal, field in self.segments:
+            prefix.append(literal)
+            if field is not None:
+                break
+        self.static_prefix = ''.join(prefix)
+        self.static_text = ''.join(literal for literal, _ in self.segments)
+
+        self.prefix_fingerprint = hashlib.sha256(self.static_prefix.encode('utf-8')).hexdigest()[:16]
+        self.prefix_tokens = count_tokens(self.static_prefix)
+        self.static_tokens = count_tokens(self.static_text)
+
+        self.renders = 0
+        self.render_time = 0.0
+        self._lock = threading.Lock()
+
+    def render(self, **values) -> str:
+        """Assemble le prompt (KeyError si un champ manque)"""
+        start = time.perf_counter()
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        text = ''.join(parts)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.renders += 1
+            self.render_time += elapsed
+        return text
+
+    def to_dict(self) -> Dict:
+        return {
+            'fields': self.fields,
+            'prefix_fingerprint': self.prefix_fingerprint,
+            'prefix_chars': len(self.static_prefix),
+            'prefix_tokens': self.prefix_tokens,
+            'static_tokens': self.static_tokens,
+            'renders': self.renders,
+            'avg_render_us': round(self.render_time / self.renders * 1e6, 2) if self.renders else None
+        }
+
+
+class PromptRegistry:
+    """Registre global des templates de prompts"""
+
+    def __init__(self):
+        self.templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, template: str) -> PromptTemplate:
+        """Compile et enregistre un template (remplace un template de même nom)"""
+        compiled = PromptTemplate(name, template)
+        with self._lock:
+            self.templates[name] = compiled
+        return compiled
+
+    def get(self, name: str) -> PromptTemplate:
+        return self.templates[name]
+
+    def render(self, name: str, **values) -> str:
+        return self.templates[name].render(**values)
+
+    def fingerprint(self, name: str) -> str:
+        """Empreinte du préfixe statique (clé de cache de préfixe côté backend)"""
+        return self.templates[name].prefix_fingerprint
+
+    def report(self, names: Optional[List[str]] = None) -> Dict:
+        with self._lock:
+            templates = dict(self.templates)
+        return {name: t.to_dict() for name, t in templates.items() if names is None or name in names}
+
+
+# Registre partagé par les modules (kibali_api, hybrid_ai_generator...)
+prompts = PromptRegistry()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+🗄️ KIBALI RECON CACHE - Cache des reconstructions MiDaS
+========================================================
+Une reconstruction (démo château, photos uploadées) est identifiée par le
+contenu de ses photos: clé = SHA-256 des images (dans l'ordre) + preset +
+nombre de photos. Relancer la démo ou ré-uploader le même lot de photos
+retourne immédiatement le mesh et ses stats, sans repasser par
+reconstruct_batch.
+
+Chaque entrée garde sa propre copie du mesh (<clé>.obj) et un manifeste
+(<clé>.json): un mesh de sortie réécrit par une autre reconstruction (ex:
+outputs/chateau_demo.obj) n'invalide pas le cache.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+CHUNK_SIZE = 1024 * 1024
+_KEY_RE = re.compile(r'[0-9a-f]{64}')
+
+
+def is_valid_key(key) -> bool:
+    """Les clés sont des SHA-256 hexadécimaux (jamais un chemin)"""
+    return isinstance(key, str) and _KEY_RE.fullmatch(key) is not None
+
+
+def hash_file(path) -> str:
+    """SHA-256 du contenu d'un fichier (lu par blocs)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reconstruction_key(image_paths: Iterable, preset: str, num_photos: int) -> str:
+    """Clé de cache: hashes des images + preset + nombre de photos"""
+    digest = hashlib.sha256()
+    digest.update(f"preset={preset};num_photos={num_photos}".encode())
+    for path in image_paths:
+        digest.update(hash_file(path).encode())
+    return digest.hexdigest()
+
+
+class ReconstructionCache:
+    """Cache disque des meshes reconstruits, adressé par contenu"""
+
+    def __init__(self, cache_dir: Path, max_entries: int = 50):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+
+    def _paths(self, key: str):
+        if not is_valid_key(key):
+            raise ValueError(f"Clé de cache invalide: {key!r}")
+        root = self.cache_dir.resolve()
+        mesh_path = (root / f"{key}.obj").resolve()
+        manifest_path = (root / f"{key}.json").resolve()
+        # Garde-fou (actif même sous python -O): les fichiers d'une entrée restent dans cache_dir
+        if mesh_path.parent != root or manifest_path.parent != root:
+            raise ValueError(f"Clé de cache hors du répertoire: {key!r}")
+        return mesh_path, manifest_path
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Retourne l'entrée (manifeste + mesh_path) ou None"""
+        mesh_path, manifest_path = self._paths(key)
+        with self._lock:
+            if not (mesh_path.exists() and manifest_path.exists()):
+                self.stats['misses'] += 1
+                return None
+
+            try:
+                entry = json.loads(manifest_path.read_text())
+            except (OSError, ValueError):
+                self.stats['misses'] += 1
+                return None
+
+            entry['hits'] = entry.get('hits', 0) + 1
+            entry['last_used'] = time.time()
+            manifest_path.write_text(json.dumps(entry))
+            self.stats['hits'] += 1
+
+        entry['mesh_path'] = str(mesh_path)
+        return entry
+
+    def put(self, key: str, mesh_path, stats: Dict, **metadata) -> Dict:
+        """Copie le mesh dans le cache et écrit son manifeste"""
+        cached_mesh, manifest_path = self._paths(key)
+        entry = {
+            'key': key,
+            'stats': stats,
+            'created_at': time.time(),
+            'last_used': time.time(),
+            'hits': 0,
+            **metadata
+        }
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Copie atomique: un lecteur concurrent ne voit jamais un .obj partiel
+            tmp_mesh = cached_mesh.with_suffix('.obj.tmp')
+            shutil.copyfile(mesh_path, tmp_mesh)
+            os.replace(tmp_mesh, cached_mesh)
+            manifest_path.write_text(json.dumps(entry))
+            self.stats['stores'] += 1
+            self._evict()
+
+        entry['mesh_path'] = str(cached_mesh)
+        return entry
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Supprime une entrée (ou tout le cache si key est None), retourne le nombre supprimé"""
+        with self._lock:
+            keys = [key] if key else [p.stem for p in self.cache_dir.glob('*.json') if is_valid_key(p.stem)]
+            removed = 0
+            for k in keys:
+                mesh_path, manifest_path = self._paths(k)
+                if manifest_path.exists():
+                    removed += 1
+                mesh_path.unlink(missing_ok=True)
+                manifest_path.unlink(missing_ok=True)
+            self.stats['invalidations'] += removed
+        return removed
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_entries"""
+        entries = self._entries()
+        for entry in entries[self.max_entries:]:
+            if not is_valid_key(entry.get('key')):
+                continue
+            mesh_path, manifest_path = self._paths(entry['key'])
+            mesh_path.unlink(missing_ok=True)
+            manifest_path.unlink(missing_ok=True)
+
+    def _entries(self) -> List[Dict]:
+        entries = []
+        for manifest_path in self.cache_dir.glob('*.json'):
+            try:
+                entries.append(json.loads(manifest_path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return sorted(entries, key=lambda e: e.get('last_used', 0), reverse=True)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return self._entries() if self.cache_dir.exists() else []
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'cache_dir': str(self.cache_dir)}
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+🧭 KIBALI SEMANTIC CACHE - Index de similarité des prompts déjà servis
+======================================================================
+Le cache exact (kibali_code_cache) rate "un arbre", "crée un arbre" et
+"a tree": mêmes demandes, clés différentes. L'index sémantique garde un
+vecteur par prompt servi (matrice NumPy normalisée, une ligne par entrée)
+et retrouve le plus proche voisin par similarité cosinus, en un produit
+matrice-vecteur.
+
+Encodeurs (KIBALI_SEMANTIC_ENCODER, défaut "auto"):
+- sentence-transformers: petit encodeur local multilingue
+  (KIBALI_SEMANTIC_MODEL), chargé via le registre kibali_models
+- clip: tour texte du CLIP déjà chargé par l'analyseur d'images
+- hashing: n-grammes de caractères + mots hachés, sans dépendance
+  (FR/FR et EN/EN uniquement, pas de traduction)
+"auto" prend sentence-transformers s'il est installé, sinon hashing.
+
+Le hashing ne comprend pas les mots: "une cape rouge" et "une cape bleue"
+dépassent 0.8 dès que le prompt est long. Avec lui, un voisin n'est servi
+que si les mots de contenu (hors STOPWORDS, accents repliés) sont
+exactement les mêmes: il ne rattrape que "crée un arbre" / "un arbre".
+
+Chaque entrée appartient à un scope (générateur, type d'objet, empreinte
+de scène, nombres du prompt): un prompt n'est comparé qu'aux prompts du
+même scope, "5 arbres" ne sert jamais "12 arbres". Au-delà du seuil
+(KIBALI_SEMANTIC_THRESHOLD, propre à chaque encodeur par défaut) le
+résultat du voisin est servi.
+
+Réglage du seuil: précision / rappel / F1 par seuil sur un jeu de paires
+annotées (BENCHMARK_PAIRS ou fichier JSONL {"a", "b", "same"}):
+
+    python kibali_semantic_cache.py [--encoder hashing] [--pairs paires.jsonl]
+"""
+
+import os
+import re
+import threading
+import time
+import zlib
+from importlib.util import find_spec
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from kibali_matcher import fold_text
+from kibali_metrics import registry
+
+SEMANTIC_ENCODER = os.environ.get('KIBALI_SEMANTIC_ENCODER', 'auto')
+SEMANTIC_MODEL = os.environ.get('KIBALI_SEMANTIC_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+SEMANTIC_MAX_ENTRIES = int(os.environ.get('KIBALI_SEMANTIC_ENTRIES', '5000'))
+
+_WORD_RE = re.compile(r'\w+')
+_NUMBER_RE = re.compile(r'\d+')
+
+# Verbes d'instruction et articles: "crée un arbre" ≈ "un arbre"
+STOPWORDS = {
+    'cree', 'creer', 'crees', 'fais', 'fait', 'faire', 'genere', 'generer', 'ajoute', 'ajouter', 'mets',
+    'mettre', 'place', 'placer', 'dessine', 'dessiner', 'modelise', 'construis', 'montre', 'moi', 'stp',
+    'svp', 'un', 'une', 'le', 'la', 'les', 'l', 'de', 'du', 'd', 'j', 'veux', 'voudrais',
+    'create', 'make', 'generate', 'add', 'draw', 'build', 'model', 'show', 'me', 'please', 'a', 'an',
+    'the', 'i', 'want', 'some'
+}
+
+SEMANTIC_LOOKUPS = registry.counter(
+    'kibali_semantic_cache_total', 'Recherches dans l\'index sémantique par namespace et issue (hit, miss, stale)',
+    ('namespace', 'outcome'))
+
+
+class EncoderUnavailable(RuntimeError):
+    """Encodeur momentanément indisponible (ex: CLIP pas encore chargé): recherche ignorée"""
+
+
+def prompt_numbers(prompt: str) -> str:
+    """Nombres du prompt (font partie du scope: jamais de voisin avec d'autres quantités)"""
+    return ','.join(_NUMBER_RE.findall(prompt or ''))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+# ============================================
+# ENCODEURS
+# ============================================
+
+class HashingEncoder:
+    """Mots + trigrammes de caractères hachés (signés) dans un vecteur de `dim` composantes"""
+
+    name = 'hashing'
+    threshold = 0.95
+
+    def __init__(self, dim: int = 1024, trigram_weight: float = 0.5):
+        self.dim = dim
+        self.trigram_weight = trigram_weight
+
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        return [word for word in _WORD_RE.findall(fold_text(text or '')) if word not in STOPWORDS]
+
+    def content_words(self, text: str) -> str:
+        """Mots de contenu triés: un voisin n'est servi qu'avec exactement les mêmes"""
+        return ' '.join(sorted(set(self._words(text))))
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words = self._words(text)
+        features = [(f"w:{word}", 1.0) for word in words]
+        for word in words:
+            padded = f" {word} "
+            features.extend((f"t:{padded[i:i + 3]}", self.trigram_weight) for i in range(len(padded) - 2))
+        return features
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = zlib.crc32(feature.encode('utf-8'))
+                # Bit de poids fort = signe: les collisions s'annulent en moyenne
+                matrix[row, digest % self.dim] += weight if digest & 0x80000000 else -weight
+        return _normalize_rows(matrix)
+
+
+class SentenceTransformerEncoder:
+    """Petit encodeur de phrases local (sentence-transformers), partagé via le registre de modèles"""
+
+    name = 'sentence-transformers'
+    threshold = 0.85
+
+    def __init__(self, model_name: str = SEMANTIC_MODEL, device: str = 'cpu'):
+        self.model_name = model_name
+        self.device = device
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name, device=self.device)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        from kibali_models import model_registry
+        with model_registry.use(f"sentence-encoder:{self.model_name}:{self.device}", self._load) as model:
+            vectors = model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return _normalize_rows(vectors)
+
+
+class ClipTextEncoder:
+    """Tour texte d'un CLIP déjà chargé: get_clip() → (model, processor) ou None"""
+
+    name = 'clip'
+    threshold = 0.9
+
+    def __init__(self, get_clip: Callable[[], Optional[Tuple]]):
+        self.get_clip = get_clip
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        import torch
+
+        clip = self.get_clip()
+        if clip is None or clip[0] is None:
+            raise EncoderUnavailable("CLIP non chargé")
+        model, processor = clip
+        inputs = processor(text=list(texts), return_tensors='pt', padding=True, truncation=True)
+        inputs = {name: tensor.to(model.device) for name, tensor in inputs.items()}
+        with torch.no_grad():
+            features = model.get_text_features(**inputs)
+        return _normalize_rows(features.float().cpu().numpy())
+
+
+def default_encoder(kind: str = SEMANTIC_ENCODER, get_clip: Optional[Callable] = None):
+    """Encodeur configuré ('auto', 'sentence-transformers', 'clip', 'hashing')"""
+    if kind == 'clip' and get_clip is not None:
+        return ClipTextEncoder(get_clip)
+    if kind == 'sentence-transformers' or (kind == 'auto' and find_spec('sentence_transformers') is not None):
+        return SentenceTransformerEncoder()
+    return HashingEncoder()
+
+
+# ============================================
+# INDEX
+# ============================================
+
+class SemanticIndex:
+    """
+    Plus proche voisin cosinus par namespace ('code', 'plan', 'mesh'...) et
+    scope. Matrice en anneau de `max_entries` lignes: la plus ancienne
+    entrée est remplacée quand l'index est plein
+    """
+
+    def __init__(self, encoder=None, threshold: Optional[float] = None,
+                 max_entries: int = SEMANTIC_MAX_ENTRIES):
+        self.encoder = encoder or default_encoder()
+        configured = os.environ.get('KIBALI_SEMANTIC_THRESHOLD')
+        self.threshold = threshold if threshold is not None else (
+            float(configured) if configured else self.encoder.threshold)
+        self.max_entries = max_entries
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._scopes = np.full(max_entries, -1, dtype=np.int64)
+        self._entries: List[Optional[Dict]] = [None] * max_entries
+        self._scope_ids: Dict[Tuple[str, str], int] = {}
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._next = 0
+        self._filled = 0
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'added': 0, 'errors': 0, 'encode_ms': 0.0}
+
+    def _encode(self, texts: Sequence[str]) -> Optional[np.ndarray]:
+        """Vecteurs normalisés, None si l'encodeur est indisponible (index désactivé)"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        try:
+            vectors = self.encoder.encode(texts)
+        except EncoderUnavailable:
+            return None
+        except Exception as e:
+            self.enabled = False
+            self.stats['errors'] += 1
+            print(f"⚠️ [SEMANTIC] Encodeur {self.encoder.name} indisponible, index désactivé: {e}")
+            return None
+        self.stats['encode_ms'] += (time.perf_counter() - start) * 1000
+        return vectors
+
+    def _scope_key(self, namespace: str, scope: str, prompt: str) -> Tuple[str, str]:
+        """(namespace, scope), resserré aux mêmes mots de contenu si l'encodeur l'exige (hashing)"""
+        content_words = getattr(self.encoder, 'content_words', None)
+        return (namespace, f"{scope}|{content_words(prompt)}" if content_words else scope)
+
+    def _scope_id(self, key: Tuple[str, str]) -> int:
+        return self._scope_ids.setdefault(key, len(self._scope_ids))
+
+    def add(self, namespace: str, scope: str, prompt: str, key: str, vector: Optional[np.ndarray] = None):
+        """Indexe `prompt` → `key` (la clé du résultat dans le cache exact)"""
+        if vector is None:
+            vectors = self._encode([prompt])
+            if vectors is None:
+                return
+            vector = vectors[0]
+        with self._lock:
+            slot = self._slots.get((namespace, key))
+            if slot is None:
+                slot = self._next
+                self._next = (self._next + 1) % self.max_entries
+                self._filled = max(self._filled, slot + 1)
+                previous = self._entries[slot]
+                if previous is not None:
+                    self._slots.pop((previous['namespace'], previous['key']), None)
+                self._slots[(namespace, key)] = slot
+            self._grow(slot + 1, vector.shape[0])
+            self._matrix[slot] = vector
+            self._scopes[slot] = self._scope_id(self._scope_key(namespace, scope, prompt))
+            self._entries[slot] = {'namespace': namespace, 'prompt': prompt, 'key': key}
+            self.stats['added'] += 1
+
+    def _grow(self, rows: int, dim: int):
+        """Matrice agrandie par doublement jusqu'à max_entries lignes (verrou tenu)"""
+        current = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= current:
+            return
+        matrix = np.zeros((min(max(rows, current * 2, 64), self.max_entries), dim), dtype=np.float32)
+        if current:
+            matrix[:current] = self._matrix
+        self._matrix = matrix
+
+    def add_many(self, namespace: str, items: Iterable[Tuple[str, str, str]]) -> int:
+        """Indexation par lot de (scope, prompt, key): un seul appel à l'encodeur"""
+        items = list(items)
+        vectors = self._encode([prompt for _, prompt, _ in items]) if items else None
+        if vectors is None:
+            return 0
+        for (scope, prompt, key), vector in zip(items, vectors):
+            self.add(namespace, scope, prompt, key, vector)
+        return len(items)
+
+    def set_encoder(self, encoder, threshold: Optional[float] = None):
+        """Change d'encodeur: les vecteurs existants ne sont plus comparables, l'index est vidé"""
+        configured = os.environ.get('KIBALI_SEMANTIC_THRESHOLD')
+        with self._lock:
+            self.encoder = encoder
+            self.threshold = threshold if threshold is not None else (
+                float(configured) if configured else encoder.threshold)
+            self.enabled = True
+            self._matrix = None
+            self._scopes[:] = -1
+            self._entries = [None] * self.max_entries
+            self._scope_ids.clear()
+            self._slots.clear()
+            self._next = self._filled = 0
+
+    def search(self, namespace: str, scope: str, prompt: str) -> Optional[Dict]:
+        """Voisin le plus proche du même scope: {'key', 'prompt', 'similarity'} ou None sous le seuil"""
+        with self._lock:
+            scope_id = self._scope_ids.get(self._scope_key(namespace, scope, prompt))
+        if scope_id is None or self._matrix is None:
+            self._count(namespace, 'miss')
+            return None
+        vectors = self._encode([prompt])
+        if vectors is None:
+            return None
+
+        with self._lock:
+            # Lignes remplies seulement (l'anneau se remplit dans l'ordre)
+            filled = self._filled
+            scores = self._matrix[:filled] @ vectors[0]
+            scores[self._scopes[:filled] != scope_id] = -np.inf
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            entry = self._entries[best]
+        if entry is None or similarity < self.threshold:
+            self._count(namespace, 'miss')
+            return None
+        self._count(namespace, 'hit')
+        return {**entry, 'similarity': round(similarity, 4)}
+
+    def discard(self, namespace: str, key: str, stale: bool = True):
+        """Retire une entrée dont le résultat n'est plus en cache"""
+        with self._lock:
+            slot = self._slots.pop((namespace, key), None)
+            if slot is None:
+                return
+            self._scopes[slot] = -1
+            self._entries[slot] = None
+        if stale:
+            self._count(namespace, 'stale')
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            for (entry_namespace, key), slot in list(self._slots.items()):
+                if namespace is None or entry_namespace == namespace:
+                    del self._slots[(entry_namespace, key)]
+                    self._scopes[slot] = -1
+                    self._entries[slot] = None
+
+    def _count(self, namespace: str, outcome: str):
+        key = {'hit': 'hits', 'miss': 'misses', 'stale': 'stale'}[outcome]
+        with self._lock:
+            self.stats[key] += 1
+        SEMANTIC_LOOKUPS.inc(namespace=namespace, outcome=outcome)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'encode_ms': round(self.stats['encode_ms'], 1),
+                'encoder': self.encoder.name,
+                'enabled': self.enabled,
+                'threshold': self.threshold,
+                'entries': len(self._slots),
+                'max_entries': self.max_entries,
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else None
+            }
+
+
+# ============================================
+# BENCHMARK DU SEUIL
+# ============================================
+
+# (prompt, prompt, même demande ?)
+BENCHMARK_PAIRS = [
+    ("un arbre", "crée un arbre", True),
+    ("un arbre", "génère un arbre", True),
+    ("une maison", "fais une maison", True),
+    ("crée un personnage héroïque avec cape", "personnage héroïque avec une cape", True),
+    ("dessine un dragon qui vole", "un dragon qui vole", True),
+    ("une voiture rouge", "crée une voiture rouge", True),
+    ("fais un château médiéval", "un chateau medieval", True),
+    ("une chaise en bois", "ajoute une chaise en bois", True),
+    ("génère un robot futuriste", "un robot futuriste stp", True),
+    ("crée un très grand arbre", "un grand arbre", True),
+    ("un personnage héroïque avec une cape", "un héros avec une cape", True),
+    ("Crée un Arbre", "crée un arbre", True),
+    ("a tree", "create a tree", True),
+    ("make a red car", "a red car", True),
+    ("un arbre", "a tree", True),
+    ("une maison", "a house", True),
+    ("un dragon qui vole", "a flying dragon", True),
+    ("un arbre", "une maison", False),
+    ("une voiture rouge", "une voiture bleue", False),
+    ("un chat", "un chien", False),
+    ("un dragon qui vole", "un dragon qui dort", False),
+    ("une épée", "un bouclier", False),
+    ("un personnage avec cape", "un personnage avec épée", False),
+    ("une maison en bois", "une maison en pierre", False),
+    ("un arbre", "un arbre mort", False),
+    ("a red car", "a blue car", False),
+    ("crée un robot", "crée un vaisseau spatial", False),
+    ("une table", "une lampe", False),
+    ("un château médiéval", "un château moderne", False),
+    # Prompts longs à un attribut près: les mots partagés tirent la similarité vers le haut
+    ("un guerrier avec une cape rouge et une épée", "un guerrier avec une cape bleue et une épée", False),
+    ("une maison en bois avec un toit rouge", "une maison en pierre avec un toit rouge", False),
+    ("a red sports car", "a sports car", False),
+    ("a medieval castle on a hill at night", "a medieval castle on a hill at sunset", False),
+    ("un grand arbre avec des feuilles vertes et un tronc épais", "un grand arbre avec des feuilles rouges et un tronc épais", False),
+    ("un robot futuriste avec deux bras et des yeux bleus", "un robot futuriste avec quatre bras et des yeux bleus", False),
+    ("a wooden table with four legs and a round top", "a wooden table with four legs and a square top", False),
+    ("crée un dragon qui vole au-dessus d'un lac", "crée un dragon qui dort au-dessus d'un lac", False),
+]
+
+
+def benchmark(encoder=None, pairs: Sequence[Tuple[str, str, bool]] = BENCHMARK_PAIRS,
+              thresholds: Optional[Iterable[float]] = None) -> List[Dict]:
+    """Précision / rappel / F1 du service par similarité pour chaque seuil"""
+    encoder = encoder or default_encoder()
+    left = encoder.encode([a for a, _, _ in pairs])
+    right = encoder.encode([b for _, b, _ in pairs])
+    similarities = np.sum(left * right, axis=1)
+    same = np.array([bool(label) for _, _, label in pairs])
+    # Même garde que SemanticIndex: mots de contenu identiques exigés (hashing)
+    content_words = getattr(encoder, 'content_words', None)
+    if content_words is not None:
+        similarities[[content_words(a) != content_words(b) for a, b, _ in pairs]] = -1.0
+
+    results = []
+    for threshold in thresholds if thresholds is not None else np.arange(0.5, 1.0, 0.05):
+        served = similarities >= threshold
+        tp = int(np.sum(served & same))
+        fp = int(np.sum(served & ~same))
+        fn = int(np.sum(~served & same))
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        results.append({'threshold': round(float(threshold), 2), 'precision': round(precision, 3),
+                        'recall': round(recall, 3), 'f1': round(f1, 3), 'tp': tp, 'fp': fp, 'fn': fn})
+    return results
+
+
+def benchmark_search(encoder=None, sizes=(100, 1000, 5000), iterations: int = 200) -> List[Dict]:
+    """Durée d'une recherche (encodage du prompt + produit matrice-vecteur) selon la taille de l'index"""
+    encoder = encoder or HashingEncoder()
+    results = []
+    for size in sizes:
+        index = SemanticIndex(encoder, threshold=0.99, max_entries=size)
+        prompts = [f"objet numéro {i} avec variante {i * 7 % 13}" for i in range(size)]
+        index.add_many('bench', [('scope', prompt, str(i)) for i, prompt in enumerate(prompts)])
+        start = time.perf_counter()
+        for i in range(iterations):
+            index.search('bench', 'scope', prompts[i % size])
+        results.append({'entries': size, 'search_us': round((time.perf_counter() - start) / iterations * 1e6, 1)})
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Réglage du seuil de l'index sémantique")
+    parser.add_argument('--encoder', default=SEMANTIC_ENCODER, help="auto, sentence-transformers, hashing")
+    parser.add_argument('--pairs', help='fichier JSONL de paires {"a": ..., "b": ..., "same": true}')
+    args = parser.parse_args()
+
+    pairs = BENCHMARK_PAIRS
+    if args.pairs:
+        with open(args.pairs) as f:
+            pairs = [(row['a'], row['b'], row['same']) for row in map(json.loads, f) if row]
+
+    encoder = default_encoder(args.encoder)
+    print(f"🧭 KIBALI SEMANTIC CACHE - Seuil ({encoder.name}, {len(pairs)} paires)")
+    print("=" * 60)
+    print(f"{'seuil':>6} {'précision':>10} {'rappel':>8} {'F1':>6} {'VP':>4} {'FP':>4} {'FN':>4}")
+    rows = benchmark(encoder, pairs)
+    for row in rows:
+        print(f"{row['threshold']:>6} {row['precision']:>10} {row['recall']:>8} {row['f1']:>6} "
+              f"{row['tp']:>4} {row['fp']:>4} {row['fn']:>4}")
+    # Seuil conseillé: meilleur F1 parmi les seuils sans faux positif, sinon meilleur F1;
+    # à F1 égal le seuil le plus haut (marge contre les paires absentes du jeu)
+    safe = [row for row in rows if row['fp'] == 0] or rows
+    best = max(safe, key=lambda row: (row['f1'], row['threshold']))
+    print(f"\n👉 KIBALI_SEMANTIC_THRESHOLD={best['threshold']} (encodeur {encoder.name})")
+
+    print(f"\n{'entrées':>8} {'recherche µs':>14}")
+    for row in benchmark_search(encoder if encoder.name == 'hashing' else None):
+        print(f"{row['entries']:>8} {row['search_us']:>14}")
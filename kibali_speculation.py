@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+🔮 KIBALI SPECULATION - Préchauffage et préchargement pendant la planification
+==============================================================================
+Pendant que l'orchestrateur construit le plan (ou que l'agent LLM analyse
+le prompt), rien ne s'exécute. Dès que les mots-clés désignent un outil
+probable, le travail lent de sa première étape démarre en parallèle:
+
+- backends (RealisticGenerate → Blender, MiDaS → MiDaS, ...): sondage
+  /api/health sur la session partagée, qui ouvre la connexion keep-alive
+  et met à jour le disjoncteur avant le premier appel
+- assets (FetchCompleteAsset): recherches Sketchfab / Poly Haven lancées
+  tout de suite; l'outil récupère le résultat (ou attend la recherche en
+  cours) au lieu de la relancer
+
+Le plan final confirme la spéculation: resolve(outils du plan) annule ce
+qu'il n'utilise pas (tâche pas encore démarrée annulée, recherche en cours
+interrompue entre deux phases, résultat jeté). Un préchargement jamais
+récupéré expire après KIBALI_SPECULATION_TTL secondes.
+
+Usage:
+    with speculator.speculate(prompt, allowed=ORCHESTRATOR_TOOLS) as speculation:
+        plan = orchestrate_prompt(prompt)['plan']
+        speculation.resolve(step['tool'] for step in plan['steps'])
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from kibali_breakers import CLOSED, BackendRegistry, backends
+from kibali_matcher import KeywordMatcher
+from kibali_metrics import registry
+
+SPECULATION_WORKERS = int(os.environ.get('KIBALI_SPECULATION_WORKERS', '4'))
+SPECULATION_TTL = float(os.environ.get('KIBALI_SPECULATION_TTL', '60'))
+# Backend sondé il y a moins de WARM_MAX_AGE secondes: connexion déjà chaude
+WARM_MAX_AGE = 2.0
+
+# Mots-clés (sans accents ni majuscules) → outil probable de la première étape
+SPECULATION_KEYWORDS = {
+    'RealisticGenerate': ['personnage', 'character', 'humain', 'héros', 'terrain', 'environnement',
+                          'scène', 'forêt', 'ville', 'réaliste', 'realistic'],
+    'FetchCompleteAsset': ['colonne', 'column', 'terrain', 'football', 'stade', 'bâtiment', 'building',
+                           'arbre', 'tree', 'maison', 'house', 'asset'],
+    'MiDaSReconstruct': ['photo', 'image', 'reconstruction', 'reconstruit', 'scan', 'photogrammétrie', 'midas'],
+    'MeshyGenerate': ['meshy', 'photoréaliste'],
+    'ProceduralGenerate': ['procédural', 'procedural']
+}
+
+# Outil → backend qui l'exécute (préchauffé par sondage)
+TOOL_BACKENDS = {
+    'RealisticGenerate': 'blender',
+    'AdvancedGenerate': 'blender',
+    'GenerateAnimation': 'blender',
+    'OrganicMovement': 'blender',
+    'KeyframesCreate': 'blender',
+    'MeshyGenerate': 'meshy',
+    'ProceduralGenerate': 'threejs',
+    'TransformMesh': 'threejs',
+    'MiDaSReconstruct': 'midas',
+    'MiDaSCreateSession': 'midas',
+    'MiDaSUploadImage': 'midas',
+    'MiDaSGenerateMesh': 'midas'
+}
+
+# Outils dont les assets sont préchargés
+ASSET_TOOLS = {'FetchCompleteAsset'}
+
+SPECULATION_TOTAL = registry.counter(
+    'kibali_speculation_total', 'Travaux spéculatifs par type et issue (started, used, cancelled, expired, hit)',
+    ('kind', 'outcome'))
+
+
+def asset_signature(prompt: str) -> Optional[str]:
+    """Clé des recherches d'assets d'un prompt ("mets une colonne" et "colonne grecque" → même clé)"""
+    try:
+        from asset_manager import analyze_asset_request
+    except ImportError:
+        return None
+    needed = analyze_asset_request(prompt)['assets_needed'][0]
+    return json.dumps([needed['model_query'], needed['texture_query'], needed['procedural_type']])
+
+
+class Speculation:
+    """Travaux lancés pour un prompt, en attente de confirmation par le plan final"""
+
+    def __init__(self, speculator: 'Speculator', prompt: str, tools: List[str]):
+        self.speculator = speculator
+        self.prompt = prompt
+        self.tools = tools
+        self.tasks: Dict[Tuple[str, str], Future] = {}
+        self.outcome: Dict[str, List[str]] = {}
+        self.resolved = False
+        self.started_at = time.time()
+
+    def resolve(self, plan_tools: Iterable[str]) -> Dict[str, List[str]]:
+        """Garde les travaux utiles au plan, annule les autres (idempotent)"""
+        if self.resolved:
+            return self.outcome
+        self.resolved = True
+
+        plan_tools = set(plan_tools)
+        used_backends = {TOOL_BACKENDS[tool] for tool in plan_tools if tool in TOOL_BACKENDS}
+        uses_assets = bool(plan_tools & ASSET_TOOLS)
+
+        self.outcome = {'used': [], 'cancelled': []}
+        for (kind, target), future in self.tasks.items():
+            used = target in used_backends if kind == 'warm' else uses_assets
+            if used:
+                self.outcome['used'].append(f"{kind}:{target}")
+                self.speculator.count(kind, 'used')
+                continue
+            if kind == 'warm':
+                future.cancel()
+            else:
+                self.speculator.release_assets(target)
+            self.outcome['cancelled'].append(f"{kind}:{target}")
+            self.speculator.count(kind, 'cancelled')
+        return self.outcome
+
+    def cancel(self):
+        """Aucun outil retenu (prompt non compris, erreur)"""
+        self.resolve(())
+
+    def __enter__(self) -> 'Speculation':
+        return self
+
+    def __exit__(self, *exc):
+        self.cancel()
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            'predicted_tools': self.tools,
+            'tasks': [f"{kind}:{target}" for kind, target in self.tasks],
+            **self.outcome
+        }
+
+
+class Speculator:
+    """Prédit les outils d'un prompt et lance leur travail lent en arrière-plan"""
+
+    def __init__(self, workers: int = SPECULATION_WORKERS, ttl: float = SPECULATION_TTL,
+                 backend_registry: BackendRegistry = backends):
+        self.workers = workers
+        self.ttl = ttl
+        self.backends = backend_registry
+        self.matcher = KeywordMatcher(fold=True)
+        for tool, keywords in SPECULATION_KEYWORDS.items():
+            self.matcher.add_rule(tool, keywords)
+        self.matcher.compile()
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._assets: Dict[str, Dict] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, kind: str, outcome: str):
+        with self._lock:
+            key = f"{kind}_{outcome}"
+            self._counts[key] = self._counts.get(key, 0) + 1
+        SPECULATION_TOTAL.inc(kind=kind, outcome=outcome)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='kibali-speculation')
+        return self._executor
+
+    def predict(self, prompt: str, allowed: Optional[Set[str]] = None) -> List[str]:
+        """Outils probables (dans `allowed` si fourni, ex: outils que l'orchestrateur sait planifier)"""
+        return [match.name for match in self.matcher.match(prompt)
+                if allowed is None or match.name in allowed]
+
+    def speculate(self, prompt: str, allowed: Optional[Set[str]] = None) -> Speculation:
+        """Lance le préchauffage des backends et le préchargement des assets probables"""
+        self._purge()
+        speculation = Speculation(self, prompt, self.predict(prompt, allowed))
+        for tool in speculation.tools:
+            backend = TOOL_BACKENDS.get(tool)
+            if backend in self.backends.backends and ('warm', backend) not in speculation.tasks:
+                speculation.tasks[('warm', backend)] = self.executor.submit(self._warm, backend)
+                self.count('warm', 'started')
+            if tool in ASSET_TOOLS:
+                signature = asset_signature(prompt)
+                if signature is not None and ('assets', signature) not in speculation.tasks:
+                    speculation.tasks[('assets', signature)] = self._prefetch_assets(signature, prompt)
+        if speculation.tasks:
+            print(f"🔮 [SPECULATION] {', '.join(speculation.tools)} → "
+                  f"{', '.join(f'{kind}:{target}' for kind, target in speculation.tasks)}")
+        return speculation
+
+    # ---------------------------------------------
+    # Préchauffage des backends
+    # ---------------------------------------------
+
+    def _warm(self, name: str) -> bool:
+        backend = self.backends.backends[name]
+        last_probe = backend['last_probe']
+        if backend['breaker'].state == CLOSED and last_probe and time.time() - last_probe < WARM_MAX_AGE:
+            return True
+        return self.backends.probe(name)
+
+    # ---------------------------------------------
+    # Préchargement des assets
+    # ---------------------------------------------
+
+    def _prefetch_assets(self, signature: str, prompt: str) -> Future:
+        """Recherche d'assets partagée par les spéculations de même signature"""
+        from asset_manager import fetch_asset_for_prompt
+        executor = self.executor
+        with self._lock:
+            entry = self._assets.get(signature)
+            if entry is not None and not entry['stop'].is_set():
+                entry['owners'] += 1
+                return entry['future']
+
+            stop = threading.Event()
+            future = executor.submit(fetch_asset_for_prompt, prompt, False, stop.is_set)
+            self._assets[signature] = {'future': future, 'stop': stop, 'owners': 1, 'created': time.time()}
+        self.count('assets', 'started')
+        return future
+
+    def release_assets(self, signature: str):
+        """Une spéculation n'utilise plus le préchargement: arrêté si plus personne n'en veut"""
+        with self._lock:
+            entry = self._assets.get(signature)
+            if entry is None:
+                return
+            entry['owners'] -= 1
+            if entry['owners'] > 0:
+                return
+            del self._assets[signature]
+        entry['stop'].set()
+        entry['future'].cancel()
+
+    def fetch_assets(self, prompt: str, prefer_procedural: bool = False) -> Dict:
+        """
+        fetch_asset_for_prompt servi par le préchargement si la même recherche
+        est prête ou en cours, sinon exécuté normalement
+        """
+        from asset_manager import fetch_asset_for_prompt
+
+        signature = asset_signature(prompt) if not prefer_procedural else None
+        with self._lock:
+            entry = self._assets.pop(signature, None) if signature else None
+        if entry is not None and not entry['stop'].is_set():
+            try:
+                result = entry['future'].result()
+            except Exception:
+                result = None
+            if result is not None and not result.get('cancelled'):
+                self.count('assets', 'hit')
+                return dict(result, prompt=prompt, prefetched=True)
+
+        return fetch_asset_for_prompt(prompt, prefer_procedural)
+
+    def _purge(self):
+        """Préchargements jamais récupérés au-delà du TTL"""
+        now = time.time()
+        with self._lock:
+            expired = [signature for signature, entry in self._assets.items()
+                       if now - entry['created'] > self.ttl]
+            entries = [self._assets.pop(signature) for signature in expired]
+        for entry in entries:
+            entry['stop'].set()
+            entry['future'].cancel()
+            self.count('assets', 'expired')
+
+    def get_stats(self) -> Dict:
+        self._purge()
+        with self._lock:
+            pending = {
+                signature: {
+                    'owners': entry['owners'],
+                    'age': round(time.time() - entry['created'], 1),
+                    'ready': entry['future'].done()
+                }
+                for signature, entry in self._assets.items()
+            }
+        return {
+            'workers': self.workers,
+            'ttl': self.ttl,
+            'prefetched_assets': pending,
+            'counts': dict(self._counts)
+        }
+
+
+# Spéculateur partagé par les handlers du process
+speculator = Speculator()
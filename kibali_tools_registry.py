@@ -17,29 +17,23 @@ CATÉGORIES:
 TOTAL: 33 outils pour remplacer Blender
 """
 
-import requests
+from kibali_http import http_client
 import json
 from typing import Dict, Any, List
 import sys
 from pathlib import Path
+from importlib.util import find_spec
 
 # Import des générateurs locaux
 sys.path.insert(0, str(Path(__file__).parent))
 
-try:
-    from advanced_3d_generator import generate_advanced_3d
-    ADVANCED_GEN_AVAILABLE = True
-except:
-    ADVANCED_GEN_AVAILABLE = False
-
-try:
-    from realistic_generator import generate_realistic_model
-    REALISTIC_GEN_AVAILABLE = True
-except:
-    REALISTIC_GEN_AVAILABLE = False
+# Générateurs lourds (torch, trimesh...): détectés ici, importés au premier appel d'outil
+# pour que l'import du registry (orchestrateur, dispatcher) reste instantané
+ADVANCED_GEN_AVAILABLE = find_spec('advanced_3d_generator') is not None
+REALISTIC_GEN_AVAILABLE = find_spec('realistic_generator') is not None
 
 try:
-    from asset_manager import fetch_asset_for_prompt, search_poly_haven_textures, search_sketchfab_models
+    from asset_manager import search_poly_haven_textures, search_sketchfab_models
     ASSET_MANAGER_AVAILABLE = True
 except:
     ASSET_MANAGER_AVAILABLE = False
@@ -55,7 +49,9 @@ def tool_procedural_generate(prompt: str, model_type: str = "character") -> str:
     """
     try:
         from ai_procedural_3d import generate_3d_by_ai
-        result = generate_3d_by_ai(prompt, model_type)
+        from kibali_code_cache import code_cache
+        result, _ = code_cache.generate(prompt, model_type, 'ai-procedural',
+                                        lambda: generate_3d_by_ai(prompt, model_type))
         if result.get('success'):
             code_length = len(result.get('code', ''))
             return f"✅ Code 3D généré: {code_length} caractères, type={model_type}"
@@ -73,7 +69,10 @@ def tool_advanced_generate(prompt: str, method: str = "auto") -> str:
         return "❌ Générateur avancé non disponible"
     
     try:
-        result = generate_advanced_3d(prompt, method)
+        from advanced_3d_generator import generate_advanced_3d
+        from kibali_code_cache import code_cache
+        result, _ = code_cache.generate(prompt, '', f'advanced-{method}',
+                                        lambda: generate_advanced_3d(prompt, method))
         if result.get('success'):
             return f"✅ Modèle avancé créé: {result.get('method_used')} - {result.get('complexity')} triangles"
         return f"⚠️ Génération échouée: {result.get('error', 'unknown')}"
@@ -89,6 +88,7 @@ def tool_realistic_generate(prompt: str, model_type: str = "character") -> str:
         return "❌ Générateur réaliste non disponible"
     
     try:
+        from realistic_generator import generate_realistic_model
         result = generate_realistic_model(prompt, model_type)
         if result.get('success'):
             return f"✅ Modèle réaliste créé: {result.get('output_path')}"
@@ -106,7 +106,7 @@ def tool_midas_create_session(name: str, description: str = "") -> str:
     Étape 1: Créer session, Étape 2: Upload images, Étape 3: Générer mesh.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             'http://localhost:11002/api/create_session',
             json={'name': name, 'description': description},
             timeout=10
@@ -125,7 +125,7 @@ def tool_midas_upload_image(session_id: str, image_data: str) -> str:
     Ajoute des vues pour reconstruction multi-angles.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             'http://localhost:11002/api/upload_scan',
             json={'session_id': session_id, 'image': image_data},
             timeout=30
@@ -142,7 +142,7 @@ def tool_midas_generate_mesh(session_id: str, quality: str = "high") -> str:
     Quality: low, medium, high.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             'http://localhost:11002/api/generate_mesh',
             json={'session_id': session_id, 'quality': quality},
             timeout=120
@@ -356,7 +356,7 @@ def tool_triposr_image_to_3d(image_path: str) -> str:
     Utilise pour: dessins, photos, concepts art → 3D.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             'http://localhost:11001/api/text-to-3d-triposr',
             json={'image_path': image_path},
             timeout=180
@@ -444,7 +444,7 @@ def tool_toggle_axis_widget(action: str = "toggle") -> str:
     Le widget affiche les axes X/Y/Z colorés dans le coin de l'écran.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/axis-widget",
             json={"action": action},
             timeout=5
@@ -465,7 +465,7 @@ def tool_camera_orbit_360(duration: int = 8, height: int = 5, radius: int = 8) -
     Parfait pour: présentation produit, showcase 3D, inspection complète.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-orbit",
             json={"duration": duration * 1000, "height": height, "radius": radius},
             timeout=2
@@ -483,7 +483,7 @@ def tool_camera_move(direction: str, distance: int = 2, duration: int = 1) -> st
     Exemples: "avance de 3 mètres", "monte de 5m", "va à gauche".
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-move",
             json={"direction": direction, "distance": distance, "duration": duration * 1000},
             timeout=2
@@ -501,7 +501,7 @@ def tool_camera_rotate(axis: str, degrees: int, duration: int = 1) -> str:
     Exemples: "tourne de 90°", "rotation 180 degrés", "pivote 45°".
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-rotate",
             json={"axis": axis, "degrees": degrees, "duration": duration * 1000},
             timeout=2
@@ -519,7 +519,7 @@ def tool_camera_fly_to(x: float, y: float, z: float, duration: int = 2) -> str:
     Exemples: "vole vers (0, 10, 5)", "va en position (3, 2, 8)".
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-flyto",
             json={"x": x, "y": y, "z": z, "duration": duration * 1000},
             timeout=2
@@ -537,7 +537,7 @@ def tool_camera_look_at(x: float, y: float, z: float) -> str:
     Exemples: "regarde l'origine", "focus sur (5, 0, 0)".
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-lookat",
             json={"x": x, "y": y, "z": z},
             timeout=2
@@ -555,7 +555,7 @@ def tool_camera_zoom(factor: float, duration: int = 1) -> str:
     Exemples: "zoom x2", "dézoom", "zoom arrière x0.5".
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-zoom",
             json={"factor": factor, "duration": duration * 1000},
             timeout=2
@@ -574,7 +574,7 @@ def tool_camera_pan(horizontal: float, vertical: float, duration: int = 1) -> st
     Vertical: négatif = bas, positif = haut.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-pan",
             json={"horizontal": horizontal, "vertical": vertical, "duration": duration * 1000},
             timeout=2
@@ -592,7 +592,7 @@ def tool_camera_shake(intensity: float = 0.3, duration: int = 1) -> str:
     Parfait pour: explosions, impacts, séismes, effets dramatiques.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-shake",
             json={"intensity": intensity, "duration": duration * 1000},
             timeout=2
@@ -610,7 +610,7 @@ def tool_camera_preset(preset: str) -> str:
     Exemples: "vue de face", "vue isométrique", "caméra en haut".
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-preset",
             json={"preset": preset},
             timeout=2
@@ -627,7 +627,7 @@ def tool_camera_stop() -> str:
     Utilise pour: stopper orbite, annuler mouvement, freeze caméra.
     """
     try:
-        response = requests.post(
+        response = http_client.post(
             "http://localhost:11000/api/camera-stop",
             timeout=2
         )
@@ -637,6 +637,25 @@ def tool_camera_stop() -> str:
     except Exception as e:
         return f"❌ Erreur: {str(e)}"
 
+def tool_camera_sequence(commands: str, fps: int = 30) -> str:
+    """
+    Enchaîne plusieurs mouvements caméra en une seule timeline (un seul appel).
+    commands: liste JSON, ex: '[{"command": "preset", "preset": "front"}, {"command": "orbit360", "duration": 8000}]'.
+    Parfait pour: travelling cinématique, plan-séquence, présentation en plusieurs étapes.
+    """
+    try:
+        response = http_client.post(
+            "http://localhost:11000/api/camera-batch",
+            json={"commands": json.loads(commands) if isinstance(commands, str) else commands, "fps": fps},
+            timeout=5
+        )
+        if response.status_code == 200:
+            timeline = response.json()['timeline']
+            return f"🎬 Séquence caméra: {len(timeline['segments'])} mouvements, {timeline['duration'] / 1000:.1f}s"
+        return f"❌ Erreur séquence caméra: {response.json().get('error', response.status_code)}"
+    except Exception as e:
+        return f"❌ Erreur: {str(e)}"
+
 # ============================================
 # CATÉGORIE 9: RECHERCHE ASSETS DYNAMIQUE
 # ============================================
@@ -697,7 +716,9 @@ def tool_fetch_complete_asset(prompt: str) -> str:
         return "❌ Asset Manager non disponible"
     
     try:
-        result = fetch_asset_for_prompt(prompt, prefer_procedural=False)
+        # Résultat préchargé pendant l'analyse du prompt s'il existe (kibali_speculation)
+        from kibali_speculation import speculator
+        result = speculator.fetch_assets(prompt, prefer_procedural=False)
         
         output = f"🎯 Analyse de '{prompt}':\n"
         
@@ -1004,7 +1025,7 @@ ALL_TOOLS_DEFINITIONS = [
         "description": "Active/désactive le widget d'orientation des axes 3D (X/Y/Z colorés). Actions: toggle, show, hide. Aide l'utilisateur à s'orienter dans l'espace 3D."
     },
     
-    # CONTRÔLE CAMÉRA EXPERT (10)
+    # CONTRÔLE CAMÉRA EXPERT (11)
     {
         "name": "CameraOrbit360",
         "func": tool_camera_orbit_360,
@@ -1055,6 +1076,11 @@ ALL_TOOLS_DEFINITIONS = [
         "func": tool_camera_stop,
         "description": "Arrête immédiatement toute animation de caméra. Pour: stopper orbite, annuler mouvement, freeze caméra."
     },
+    {
+        "name": "CameraSequence",
+        "func": tool_camera_sequence,
+        "description": "Enchaîne plusieurs mouvements caméra (preset, flyto, orbit360, zoom, pan, shake...) en une timeline compilée côté serveur. commands: liste JSON. Pour: plans-séquences cinématiques en un seul appel."
+    },
     
     # RECHERCHE ASSETS DYNAMIQUE (4)
     {
@@ -37,6 +37,15 @@ except ImportError as e:
 app = Flask(__name__)
 CORS(app)
 
+# 📈 Métriques Prometheus (GET /metrics)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from kibali_metrics import instrument_app, observe_inference
+instrument_app(app, 'midas-multiview')
+
+# ⏳ Échéance transmise par l'appelant (X-Kibali-Deadline-Ms)
+from kibali_deadline import install_deadline
+install_deadline(app)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -170,7 +179,7 @@ def upload_scan():
         img_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
         input_batch = transform(img_bgr).to(device)
         
-        with torch.no_grad():
+        with torch.no_grad(), observe_inference('midas', 'depth'):
             prediction = midas(input_batch)
             prediction = torch.nn.functional.interpolate(
                 prediction.unsqueeze(1),
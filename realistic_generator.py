@@ -20,6 +20,9 @@ MODELS_PATH = ISOL_PATH / "models"
 
 sys.path.insert(0, str(TRIPOSR_PATH))
 sys.path.insert(0, str(KIBALI_IA_PATH))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from kibali_models import model_registry, stable_diffusion_key, load_stable_diffusion
 
 class RealisticModelGenerator:
     """Génère de vrais modèles 3D réalistes"""
@@ -29,7 +32,8 @@ class RealisticModelGenerator:
         print(f"🎨 Générateur 3D sur: {self.device}")
         
         self.triposr_model = None
-        self.sd_pipeline = None
+        # Stable Diffusion: registre partagé (un seul pipeline SD 1.5 par process)
+        self.sd_key = stable_diffusion_key(self.device)
         self.lgm_model = None
         
     def init_triposr(self):
@@ -55,13 +59,8 @@ class RealisticModelGenerator:
     def init_stable_diffusion(self):
         """Initialise Stable Diffusion pour génération d'images"""
         try:
-            from diffusers import StableDiffusionPipeline
-            
             print("📥 Chargement de Stable Diffusion...")
-            self.sd_pipeline = StableDiffusionPipeline.from_pretrained(
-                "runwayml/stable-diffusion-v1-5",
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-            ).to(self.device)
+            model_registry.get(self.sd_key, self._sd_loader)
             
             print("✅ Stable Diffusion chargé !")
             return True
@@ -69,21 +68,28 @@ class RealisticModelGenerator:
             print(f"❌ Erreur Stable Diffusion: {e}")
             return False
     
+    def _sd_loader(self):
+        return load_stable_diffusion(self.device)
+    
+    @property
+    def sd_pipeline(self):
+        """Pipeline SD s'il est résident (le registre peut l'avoir libéré)"""
+        return model_registry.peek(self.sd_key)
+    
     def text_to_image(self, prompt, negative_prompt="low quality, blurry"):
         """Génère une image depuis un prompt texte"""
-        if not self.sd_pipeline:
-            self.init_stable_diffusion()
-        
         print(f"🎨 Génération image: {prompt}")
         
-        image = self.sd_pipeline(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            num_inference_steps=30,
-            guidance_scale=7.5,
-            height=512,
-            width=512
-        ).images[0]
+        # Chargé au besoin, épinglé pendant l'inférence
+        with model_registry.use(self.sd_key, self._sd_loader) as sd_pipeline:
+            image = sd_pipeline(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                num_inference_steps=30,
+                guidance_scale=7.5,
+                height=512,
+                width=512
+            ).images[0]
         
         return image
     
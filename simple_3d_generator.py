@@ -15,6 +15,9 @@ import trimesh
 # Paths centralisés dans Isol
 ISOL_PATH = Path("/home/belikan/Isol")
 sys.path.insert(0, str(ISOL_PATH / "kibali-IA"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from kibali_models import model_registry, stable_diffusion_key, load_stable_diffusion
 
 class Simple3DGenerator:
     """Génère de vrais modèles 3D avec Shap-E ou Stable Diffusion"""
@@ -23,19 +26,15 @@ class Simple3DGenerator:
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"🎨 Générateur 3D Simple sur: {self.device}")
         
-        self.sd_pipeline = None
+        # Stable Diffusion: registre partagé (un seul pipeline SD 1.5 par process)
+        self.sd_key = stable_diffusion_key(self.device)
         self.shap_e_model = None
         
     def init_stable_diffusion(self):
         """Initialise Stable Diffusion pour génération d'images"""
         try:
-            from diffusers import StableDiffusionPipeline
-            
             print("📥 Chargement de Stable Diffusion...")
-            self.sd_pipeline = StableDiffusionPipeline.from_pretrained(
-                "runwayml/stable-diffusion-v1-5",
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-            ).to(self.device)
+            model_registry.get(self.sd_key, self._sd_loader)
             
             print("✅ Stable Diffusion chargé !")
             return True
@@ -64,21 +63,28 @@ class Simple3DGenerator:
             print("💡 Fallback vers génération procédurale avancée")
             return False
     
+    def _sd_loader(self):
+        return load_stable_diffusion(self.device)
+    
+    @property
+    def sd_pipeline(self):
+        """Pipeline SD s'il est résident (le registre peut l'avoir libéré)"""
+        return model_registry.peek(self.sd_key)
+    
     def text_to_image(self, prompt, negative_prompt="low quality, blurry"):
         """Génère une image depuis un prompt texte"""
-        if not self.sd_pipeline:
-            self.init_stable_diffusion()
-        
         print(f"🎨 Génération image: {prompt}")
         
-        image = self.sd_pipeline(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            num_inference_steps=30,
-            guidance_scale=7.5,
-            height=512,
-            width=512
-        ).images[0]
+        # Chargé au besoin, épinglé pendant l'inférence
+        with model_registry.use(self.sd_key, self._sd_loader) as sd_pipeline:
+            image = sd_pipeline(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                num_inference_steps=30,
+                guidance_scale=7.5,
+                height=512,
+                width=512
+            ).images[0]
         
         return image
     